@@ -0,0 +1 @@
+"""Générateur d'instances et benchmarks (scripts, hors API)."""
@@ -0,0 +1,222 @@
+"""
+Benchmark et non-régression de l'analyse (PlanningAnalyzer) et des exports.
+
+Sur des plannings remplis synthétiques de taille croissante, chaque méthode de
+l'analyseur, le détail d'un groupe et les deux exports (CSV, Excel) sont :
+- chronométrés (médiane sur --repeat exécutions) ;
+- mesurés en mémoire crête (tracemalloc, exécution séparée) ;
+- comparés aux sorties de référence (backend/bench/golden/analyzer.json).
+
+Les sorties sont comparées sous la forme reçue par le frontend (JSON encodé
+par FastAPI) : « identical » (mêmes octets), « equivalent » (mêmes données,
+ordre des clés différent) ou « different ». L'Excel est comparé sur le
+contenu de l'archive hors métadonnées (date de création).
+
+Usage:
+    python -m backend.bench.analyzer_bench                      # code de sortie 1 si sortie différente
+    python -m backend.bench.analyzer_bench --sizes small --dump /tmp/avant
+    python -m backend.bench.analyzer_bench --update-golden      # après un changement de sortie voulu
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+import zipfile
+
+from backend.bench.instances import InstanceSpec, generate_instance
+from backend.planning_codec import parse_planning_csv, planning_rows_to_csv, week_column_indexes
+
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), "golden", "analyzer.json")
+
+# Plannings remplis: instance synthétique + affectation aléatoire (graine) des groupes,
+# conflits compris pour exercer les chemins d'erreur de l'analyse
+SIZES = {
+    "small": (InstanceSpec(groups=6, weeks=8, seed=11), 0.7),
+    "medium": (InstanceSpec(groups=15, weeks=16, seed=12), 0.8),
+    "large": (InstanceSpec(groups=15, weeks=32, tightness=0.5, seed=13), 0.8),
+}
+DEFAULT_SIZES = ("small", "medium", "large")
+# Fichier binaire régénéré à chaque export: date de création
+XLSX_VOLATILE = {"docProps/core.xml"}
+
+
+def filled_planning(spec: InstanceSpec, fill: float) -> str:
+    """CSV d'un planning rempli: chaque créneau travaillé reçoit un groupe avec la probabilité `fill`."""
+    header, rows = generate_instance(spec)
+    rng = random.Random(spec.seed)
+    for j in week_column_indexes(header):
+        even = int(header[j]) % 2 == 0
+        for row in rows:
+            works = row[6] if even else row[7]
+            if works == 'Oui' and rng.random() < fill:
+                row[j] = str(rng.randint(1, spec.groups))
+    return planning_rows_to_csv(header, rows)
+
+
+def operations(csv_content):
+    """[(nom, fonction sans argument, type de sortie)] couvrant l'analyse et les exports."""
+    import pandas as pd
+    from backend.main import (
+        PlanningAnalyzer, export_excel_with_style, group_details, planning_dataframe, summarize_planning,
+    )
+    analyzer = PlanningAnalyzer(csv_content)
+    header, rows = parse_planning_csv(csv_content)
+    groups = sorted({1, max(analyzer.groups)})
+
+    def excel_from_csv():
+        return export_excel_with_style(pd.read_csv(io.StringIO(csv_content), sep=';')).getvalue()
+
+    def excel_from_rows():
+        return export_excel_with_style(planning_dataframe(header, rows)).getvalue()
+
+    return [
+        ("load", lambda: PlanningAnalyzer(csv_content).weeks, "json"),
+        ("stats_groupes", analyzer.stats_groupes, "json"),
+        ("stats_matieres", analyzer.stats_matieres, "json"),
+        ("stats_profs", analyzer.stats_profs, "json"),
+        ("charge_hebdo", analyzer.charge_hebdo, "json"),
+        ("statistiques_globales", analyzer.statistiques_globales, "json"),
+        ("verifier_contraintes_globales", analyzer.verifier_contraintes_globales, "json"),
+        ("verifier_contraintes_groupe", lambda: {g: analyzer.verifier_contraintes_groupe(g) for g in analyzer.groups}, "json"),
+        ("verifier_colles_consecutives", analyzer.verifier_colles_consecutives, "json"),
+        ("verifier_compatibilites_profs", analyzer.verifier_compatibilites_profs, "json"),
+        ("contraintes", analyzer.contraintes, "json"),
+        ("summarize_planning", lambda: summarize_planning(csv_content), "json"),
+        ("group_details", lambda: {g: group_details(g, csv_content) for g in groups}, "json"),
+        ("export_csv", lambda: planning_rows_to_csv(header, rows).encode("utf-8"), "bytes"),
+        ("export_excel", excel_from_csv, "xlsx"),
+        ("export_excel_saved", excel_from_rows, "xlsx"),
+    ]
+
+
+# -----------------------
+# Empreintes des sorties
+# -----------------------
+def canonical(output, kind):
+    """-> (octets exacts, octets à ordre de clés normalisé)."""
+    if kind == "json":
+        from fastapi.encoders import jsonable_encoder
+        data = jsonable_encoder(output)
+        exact = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        return exact.encode("utf-8"), json.dumps(data, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    if kind == "xlsx":
+        with zipfile.ZipFile(io.BytesIO(output)) as z:
+            parts = [name.encode("utf-8") + b"\0" + z.read(name)
+                     for name in sorted(z.namelist()) if name not in XLSX_VOLATILE]
+        content = b"\0\0".join(parts)
+        return content, content
+    return output, output
+
+
+def digests(output, kind) -> dict:
+    exact, semantic = canonical(output, kind)
+    return {"exact": hashlib.sha256(exact).hexdigest(), "semantic": hashlib.sha256(semantic).hexdigest()}
+
+
+def verdict(current: dict, golden: dict) -> str:
+    if golden is None:
+        return "missing"
+    if current["exact"] == golden["exact"]:
+        return "identical"
+    if current["semantic"] == golden["semantic"]:
+        return "equivalent"
+    return "different"
+
+
+# -----------------------
+# Mesures
+# -----------------------
+def measure(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = fn()
+        times.append(time.perf_counter() - start)
+    # Mémoire: exécution séparée, tracemalloc ralentit fortement le code Python
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return output, statistics.median(times), peak
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, repeat=1, golden=None, dump=None, log=print):
+    golden = golden or {}
+    results = []
+    for size in sizes:
+        spec, fill = SIZES[size]
+        csv_content = filled_planning(spec, fill)
+        for name, fn, kind in operations(csv_content):
+            output, seconds, peak = measure(fn, repeat)
+            current = digests(output, kind)
+            status = verdict(current, golden.get(size, {}).get(name))
+            if dump:
+                os.makedirs(os.path.join(dump, size), exist_ok=True)
+                ext = "json" if kind == "json" else kind if kind == "xlsx" else "csv"
+                with open(os.path.join(dump, size, f"{name}.{ext}"), "wb") as f:
+                    f.write(canonical(output, kind)[0] if kind == "json" else output)
+            log(f"{size:>7} {name:<30} {seconds:9.4f}s  {peak / 2**20:8.1f} Mo  {status}")
+            results.append({
+                "size": size, "operation": name, "seconds": round(seconds, 6),
+                "peak_mb": round(peak / 2**20, 2), "output": status, "digest": current,
+            })
+    return {"repeat": repeat, "sizes": {s: {"spec": SIZES[s][0].label(), "fill": SIZES[s][1]} for s in sizes},
+            "results": results}
+
+
+def golden_from_report(report, previous=None) -> dict:
+    golden = dict(previous or {})
+    for r in report["results"]:
+        golden.setdefault(r["size"], {})[r["operation"]] = r["digest"]
+    return golden
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark et sorties de référence de l'analyse et des exports.")
+    parser.add_argument("--sizes", default=",".join(DEFAULT_SIZES), help=f"parmi {', '.join(SIZES)}")
+    parser.add_argument("--repeat", type=int, default=1, help="répétitions par mesure de temps (médiane)")
+    parser.add_argument("--golden", default=GOLDEN_PATH, help="fichier des empreintes de référence")
+    parser.add_argument("--update-golden", action="store_true", help="réécrit les références avec les sorties actuelles")
+    parser.add_argument("--strict", action="store_true", help="« equivalent » (ordre des clés) compte comme différent")
+    parser.add_argument("--dump", help="répertoire où écrire les sorties (pour diff entre deux versions)")
+    parser.add_argument("--out", help="rapport JSON")
+    args = parser.parse_args(argv)
+
+    sizes = [s for s in args.sizes.split(",") if s]
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        parser.error(f"tailles inconnues: {', '.join(unknown)}")
+
+    golden = {}
+    if os.path.exists(args.golden):
+        with open(args.golden, encoding="utf-8") as f:
+            golden = json.load(f)
+    report = run_benchmark(sizes, args.repeat, golden, args.dump, log=lambda line: print(line, file=sys.stderr))
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.update_golden:
+        os.makedirs(os.path.dirname(args.golden), exist_ok=True)
+        with open(args.golden, "w", encoding="utf-8") as f:
+            json.dump(golden_from_report(report, golden), f, indent=2, sort_keys=True)
+            f.write("\n")
+        return 0
+
+    failing = {"different", "missing"} | ({"equivalent"} if args.strict else set())
+    failures = [r for r in report["results"] if r["output"] in failing]
+    for r in failures:
+        print(f"SORTIE {r['output'].upper()} {r['size']}/{r['operation']}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+Générateur d'instances de colles synthétiques (CSV au format de l'upload).
+
+Reproductible (graine) et paramétrable :
+- nombre de groupes et de semaines (numérotation scolaire: 52 -> 1)
+- matières et nombre de profs par matière
+- disponibilité pair/impair des profs
+- densité horaire (créneaux par case jour × heure)
+- tension: demande / capacité, 1.0 = juste assez de créneaux pour le mode strict
+
+Usage:
+    python -m backend.bench.instances --groups 12 --weeks 16 --seed 3 > instance.csv
+"""
+import argparse
+import math
+import random
+import sys
+from dataclasses import asdict, dataclass, field
+
+from backend.planning_codec import planning_rows_to_csv
+
+BASE_COLUMNS = [
+    'Matière', 'Prof', 'Jour', 'Heure',
+    'Groupes possibles semaine paire', 'Groupes possibles semaine impaire',
+    'Travaille les semaines paires', 'Travaille les semaines impaires',
+]
+DAYS = ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi']
+HOURS = ['13h-14h', '14h-15h', '15h-16h', '16h-17h', '17h-18h', '18h-19h']
+
+# Colles par groupe et par semaine, selon les fréquences imposées par le solveur
+# (1 par quinzaine, 1 par 4 semaines, 1 par 8 semaines)
+MATIERE_RATES = {
+    'Mathématiques': 1 / 2, 'Physique': 1 / 2, 'Anglais': 1 / 2,
+    'Chimie': 1 / 4, 'S.I': 1 / 4, 'Français': 1 / 8,
+}
+DEFAULT_PROFS = {'Mathématiques': 2, 'Physique': 2, 'Anglais': 2, 'Chimie': 1, 'S.I': 1, 'Français': 1}
+
+
+@dataclass
+class InstanceSpec:
+    groups: int = 12
+    weeks: int = 16
+    first_week: int = 38
+    profs_per_matiere: dict = field(default_factory=lambda: dict(DEFAULT_PROFS))
+    # Probabilité qu'un prof travaille les deux parités (sinon une seule, tirée au hasard)
+    both_parities: float = 1.0
+    # Créneaux par case jour × heure en moyenne (plus dense = plus de conflits horaires)
+    slot_density: float = 1.0
+    # Demande / capacité hebdomadaire par matière (1.0 = serré, 0.5 = deux fois plus de créneaux)
+    tightness: float = 0.8
+    seed: int = 0
+
+    def label(self) -> str:
+        return f"g{self.groups}-w{self.weeks}-t{self.tightness:g}-d{self.slot_density:g}-s{self.seed}"
+
+
+def week_labels(first_week: int, count: int):
+    """Semaines consécutives de l'année scolaire: 38, 39, ..., 52, 1, 2..."""
+    return [str((first_week - 1 + i) % 52 + 1) for i in range(count)]
+
+
+def generate_instance(spec: InstanceSpec):
+    """-> (header, rows) en chaînes, colonnes semaines vides."""
+    rng = random.Random(spec.seed)
+    weeks = week_labels(spec.first_week, spec.weeks)
+    group_range = f"1 à {spec.groups}" if spec.groups > 1 else "1"
+
+    # Créneaux nécessaires par matière: capacité hebdo (1 colle par créneau travaillé) >= demande / tension
+    slots = []
+    for matiere, rate in MATIERE_RATES.items():
+        n_profs = spec.profs_per_matiere.get(matiere, 0)
+        if n_profs <= 0:
+            continue
+        demand = spec.groups * rate
+        parities = []
+        for p in range(n_profs):
+            if rng.random() < spec.both_parities:
+                parities.append((True, True))
+            else:
+                parities.append((True, False) if rng.random() < 0.5 else (False, True))
+        capacity, i = 0.0, 0
+        while capacity < demand / max(spec.tightness, 1e-6) or i < n_profs:
+            p = i % n_profs
+            works_even, works_odd = parities[p]
+            slots.append((matiere, f"{matiere[:3]}-{p + 1}", works_even, works_odd))
+            capacity += (works_even + works_odd) / 2
+            i += 1
+
+    # Cases horaires: ~slot_density créneaux par case, sans double réservation d'un prof
+    grid = [(d, h) for d in DAYS for h in HOURS]
+    n_cells = min(len(grid), max(1, math.ceil(len(slots) / max(spec.slot_density, 1e-6))))
+    cells = rng.sample(grid, n_cells)
+    busy = set()
+    rows = []
+    for matiere, prof, works_even, works_odd in slots:
+        free = [c for c in cells if (prof, c) not in busy] or [c for c in grid if (prof, c) not in busy]
+        day, hour = rng.choice(free)
+        busy.add((prof, (day, hour)))
+        rows.append([
+            matiere, prof, day, hour, group_range, group_range,
+            'Oui' if works_even else 'Non', 'Oui' if works_odd else 'Non',
+        ] + [''] * len(weeks))
+    # Ordre stable et lisible: par matière puis prof
+    order = list(MATIERE_RATES)
+    rows.sort(key=lambda r: (order.index(r[0]), r[1], DAYS.index(r[2]), HOURS.index(r[3])))
+    return BASE_COLUMNS + weeks, rows
+
+
+def generate_csv(spec: InstanceSpec) -> str:
+    return planning_rows_to_csv(*generate_instance(spec))
+
+
+def spec_dict(spec: InstanceSpec) -> dict:
+    return asdict(spec)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Génère une instance de colles synthétique (CSV ';').")
+    parser.add_argument("--groups", type=int, default=12)
+    parser.add_argument("--weeks", type=int, default=16)
+    parser.add_argument("--first-week", type=int, default=38)
+    parser.add_argument("--both-parities", type=float, default=1.0)
+    parser.add_argument("--slot-density", type=float, default=1.0)
+    parser.add_argument("--tightness", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    spec = InstanceSpec(
+        groups=args.groups, weeks=args.weeks, first_week=args.first_week,
+        both_parities=args.both_parities, slot_density=args.slot_density,
+        tightness=args.tightness, seed=args.seed,
+    )
+    sys.stdout.write(generate_csv(spec))
+
+
+if __name__ == "__main__":
+    main()
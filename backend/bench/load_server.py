@@ -0,0 +1,36 @@
+"""
+API lancée sur une base MongoDB simulée en mémoire (mongomock-motor), pour les
+tests de charge hors ligne (backend/bench/load_test.py). Un seul process :
+la base simulée n'est pas partagée entre workers uvicorn.
+
+Usage:
+    python -m backend.bench.load_server --port 8765
+"""
+import argparse
+
+
+def install_mock_db():
+    """Remplace la base de backend.db / repository / main par une base mongomock (avant le démarrage)."""
+    import mongomock_motor
+    import backend.db
+    import backend.main
+    import backend.repository
+    db = mongomock_motor.AsyncMongoMockClient()["planning_colles_bench"]
+    backend.db.db = db
+    backend.repository.db = db
+    backend.main.db = db
+    return backend.main.app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API sur base MongoDB simulée (tests de charge).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    uvicorn.run(install_mock_db(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+"""
+Test de charge de bout en bout de l'API (hors ligne, une machine Linux).
+
+1. Démarre l'API dans un sous-process :
+   - par défaut sur une base simulée en mémoire (backend/bench/load_server.py, 1 process) ;
+   - avec --mongodb-uri, via uvicorn --workers N sur un mongod local (sessions en MongoDB).
+2. Crée des utilisateurs répartis sur plusieurs lycées et quelques plannings enregistrés par lycée.
+3. Lance --concurrency utilisateurs virtuels pendant --duration secondes ; chacun enchaîne des
+   scénarios tirés selon --mix :
+   - consultation : connexion, profil, liste, planning (complet puis filtré), export Excel ;
+   - generation : connexion, upload, génération, analyse, enregistrement, export CSV ;
+   - analyse : connexion, analyse d'un fichier uploadé.
+4. Rapporte débit et latences p50 / p95 / p99 par route, erreurs, et le retard de la boucle
+   d'événements côté serveur (histogramme event_loop_lag_seconds de /metrics) et côté injecteur
+   (si l'injecteur sature, les latences mesurées ne sont plus fiables).
+
+Dépendances supplémentaires: httpx, mongomock-motor (mode base simulée).
+
+Usage:
+    python -m backend.bench.load_test --concurrency 20 --duration 60 --out load.json
+    python -m backend.bench.load_test --mongodb-uri mongodb://localhost:27017 --workers 4 --concurrency 50
+    python -m backend.bench.load_test --base-url http://localhost:8000 --no-seed   # API déjà lancée
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import httpx
+
+from backend.bench.analyzer_bench import SIZES as FILLED_SIZES, filled_planning
+from backend.bench.instances import InstanceSpec, generate_csv
+
+DEFAULT_MIX = "consultation=6,generation=1,analyse=2"
+PASSWORD = "bench-password"
+READY_TIMEOUT_SECONDS = 120
+# Instance résolue en moins d'une seconde: la génération pèse sans monopoliser le test
+GENERATION_SPEC = InstanceSpec(groups=6, weeks=8, seed=21)
+
+
+# -----------------------
+# Serveur
+# -----------------------
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, mongodb_uri=None, workers=1, env_overrides=None, quiet=True):
+    """Lance l'API (sous-process) et renvoie (process, répertoire des métriques multiprocess ou None)."""
+    env = {**os.environ, "SECRET_KEY": os.getenv("SECRET_KEY", "bench-secret"), **(env_overrides or {})}
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env["PYTHONPATH"] = root + os.pathsep + env.get("PYTHONPATH", "")
+    metrics_dir = None
+    if mongodb_uri:
+        env.update({"MONGODB_URI": mongodb_uri, "MONGODB_DB": env.get("MONGODB_DB", "planning_colles_bench")})
+        # Plusieurs workers: l'espace de travail doit être partagé
+        env.setdefault("SESSION_BACKEND", "mongodb")
+        if workers > 1:
+            metrics_dir = tempfile.mkdtemp(prefix="prom-")
+            env["PROMETHEUS_MULTIPROC_DIR"] = metrics_dir
+        cmd = [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1",
+               "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    else:
+        env.pop("MONGODB_URI", None)
+        cmd = [sys.executable, "-m", "backend.bench.load_server", "--port", str(port)]
+    # Logs JSON des générations: muets par défaut, ils noieraient le rapport
+    stdout = subprocess.DEVNULL if quiet else None
+    return subprocess.Popen(cmd, cwd=root, env=env, stdout=stdout), metrics_dir
+
+
+async def wait_ready(client, proc=None):
+    deadline = time.monotonic() + READY_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"L'API s'est arrêtée au démarrage (code {proc.returncode})")
+        try:
+            if (await client.get("/api/health/ready")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError("L'API n'est pas prête (/api/health/ready)")
+
+
+# -----------------------
+# Client instrumenté
+# -----------------------
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)   # route -> [secondes]
+        self.errors = defaultdict(int)     # route -> réponses >= 400 ou erreurs de transport
+        self.recording = False
+
+    async def call(self, client, method, route, url=None, expected=(200, 304), **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url or route, **kwargs)
+        except httpx.HTTPError:
+            if self.recording:
+                self.errors[route] += 1
+            return None
+        elapsed = time.perf_counter() - start
+        if self.recording:
+            self.samples[route].append(elapsed)
+            if response.status_code not in expected:
+                self.errors[route] += 1
+        return response if response.status_code in expected else None
+
+
+def email(lycee: int, user: int) -> str:
+    return f"bench-{lycee}-{user}@bench.local"
+
+
+def lycee_name(lycee: int) -> str:
+    return f"Lycée de charge {lycee}"
+
+
+async def login(rec, client, user_email):
+    r = await rec.call(client, "POST", "/api/auth/login", data={"username": user_email, "password": PASSWORD})
+    return {"Authorization": f"Bearer {r.json()['access_token']}"} if r is not None else None
+
+
+# -----------------------
+# Scénarios
+# -----------------------
+async def scenario_consultation(rec, client, user_email, ctx):
+    auth = await login(rec, client, user_email)
+    if auth is None:
+        return
+    await rec.call(client, "GET", "/api/users/me", headers=auth)
+    r = await rec.call(client, "GET", "/api/plannings", headers=auth)
+    items = r.json()["items"] if r is not None else []
+    if not items:
+        return
+    pid = random.choice(items)["id"]
+    await rec.call(client, "GET", "/api/plannings/{planning_id}", f"/api/plannings/{pid}", headers=auth)
+    await rec.call(client, "GET", "/api/plannings/{planning_id}?group", f"/api/plannings/{pid}",
+                   params={"group": random.randint(1, GENERATION_SPEC.groups)}, headers=auth)
+    await rec.call(client, "GET", "/api/plannings/{planning_id}/download", f"/api/plannings/{pid}/download",
+                   params={"format": "excel"}, headers=auth)
+
+
+async def scenario_generation(rec, client, user_email, ctx):
+    auth = await login(rec, client, user_email)
+    if auth is None:
+        return
+    files = {"file": ("instance.csv", ctx["instance_csv"].encode("utf-8"), "text/csv")}
+    if await rec.call(client, "POST", "/api/upload_csv", files=files, headers=auth) is None:
+        return
+    if await rec.call(client, "POST", "/api/generate_planning", headers=auth) is None:
+        return
+    await rec.call(client, "GET", "/api/analyse_planning_generated", headers=auth)
+    await rec.call(client, "POST", "/api/plannings/save", params={"name": "Charge"}, headers=auth)
+    await rec.call(client, "GET", "/api/download_planning", params={"format": "csv"}, headers=auth)
+
+
+async def scenario_analyse(rec, client, user_email, ctx):
+    auth = await login(rec, client, user_email)
+    if auth is None:
+        return
+    files = {"file": ("planning.csv", ctx["filled_csv"].encode("utf-8"), "text/csv")}
+    await rec.call(client, "POST", "/api/analyse_planning", files=files, headers=auth)
+
+
+SCENARIOS = {
+    "consultation": scenario_consultation,
+    "generation": scenario_generation,
+    "analyse": scenario_analyse,
+}
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise ValueError(f"scénario inconnu: {name.strip()}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+# -----------------------
+# Jeu de données
+# -----------------------
+async def seed(client, lycees, users_per_lycee, plannings_per_lycee, ctx, log):
+    """Comptes (un lycée, une classe commune par lycée) et plannings enregistrés via l'API."""
+    rec = Recorder()
+    for lycee in range(lycees):
+        for user in range(users_per_lycee):
+            r = await client.post("/api/auth/signup", json={
+                "email": email(lycee, user), "password": PASSWORD, "nom": f"Colleur {lycee}-{user}",
+                "role": "professeur" if user == 0 else "utilisateur",
+                "lycee": lycee_name(lycee), "classes": ["MPSI 1", f"PCSI {user % 2 + 1}"],
+            })
+            if r.status_code not in (200, 400):   # 400: compte déjà créé (base réutilisée)
+                raise RuntimeError(f"Inscription échouée: {r.status_code} {r.text}")
+        for _ in range(plannings_per_lycee):
+            await scenario_generation(rec, client, email(lycee, 0), ctx)
+        log(f"lycée {lycee}: {users_per_lycee} comptes, {plannings_per_lycee} plannings")
+
+
+# -----------------------
+# Mesures
+# -----------------------
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, round(q / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[k]
+
+
+def summarize_latencies(values, duration):
+    values = sorted(values)
+    ms = lambda v: round(v * 1000, 2) if v is not None else None  # noqa: E731
+    return {
+        "count": len(values),
+        "rps": round(len(values) / duration, 2) if duration else None,
+        "p50_ms": ms(percentile(values, 50)),
+        "p95_ms": ms(percentile(values, 95)),
+        "p99_ms": ms(percentile(values, 99)),
+        "max_ms": ms(values[-1] if values else None),
+    }
+
+
+async def scrape_loop_lag(client):
+    """(compte, somme, {borne: compte cumulé}) de event_loop_lag_seconds sur /metrics."""
+    from prometheus_client.parser import text_string_to_metric_families
+    r = await client.get("/metrics")
+    count, total, buckets = 0, 0.0, defaultdict(float)
+    for family in text_string_to_metric_families(r.text):
+        if family.name != "event_loop_lag_seconds":
+            continue
+        for s in family.samples:
+            if s.name.endswith("_count"):
+                count += s.value
+            elif s.name.endswith("_sum"):
+                total += s.value
+            elif s.name.endswith("_bucket"):
+                buckets[float(s.labels["le"])] += s.value
+    return count, total, buckets
+
+
+def loop_lag_delta(before, after):
+    """Retard sur la période mesurée; quantiles bornés par les seaux de l'histogramme."""
+    count = after[0] - before[0]
+    if count <= 0:
+        return {"samples": 0}
+    buckets = sorted((le, after[2][le] - before[2].get(le, 0)) for le in after[2])
+
+    def upper_bound_ms(q):
+        for le, cumulated in buckets:
+            if cumulated >= q * count:
+                return "+Inf" if le == float("inf") else le * 1000
+        return None
+
+    return {
+        "samples": int(count),
+        "mean_ms": round((after[1] - before[1]) / count * 1000, 2),
+        "p50_ms_le": upper_bound_ms(0.5),
+        "p99_ms_le": upper_bound_ms(0.99),
+    }
+
+
+async def client_loop_lag(samples, interval=0.05):
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.perf_counter() - start - interval))
+
+
+# -----------------------
+# Exécution
+# -----------------------
+async def virtual_user(rec, client, users, mix, ctx, deadline, think):
+    names, weights = list(mix), list(mix.values())
+    while time.monotonic() < deadline:
+        scenario = random.choices(names, weights)[0]
+        await SCENARIOS[scenario](rec, client, random.choice(users), ctx)
+        if think:
+            await asyncio.sleep(random.expovariate(1 / think))
+
+
+async def run_load(args, log):
+    ctx = {
+        "instance_csv": generate_csv(GENERATION_SPEC),
+        "filled_csv": filled_planning(*FILLED_SIZES["medium"]),
+    }
+    proc, metrics_dir = None, None
+    base_url = args.base_url
+    if not base_url:
+        port = free_port()
+        proc, metrics_dir = start_server(port, args.mongodb_uri, args.workers, quiet=not args.server_logs)
+        base_url = f"http://127.0.0.1:{port}"
+    limits = httpx.Limits(max_connections=args.concurrency + 10, max_keepalive_connections=args.concurrency + 10)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            await wait_ready(client, proc)
+            if not args.no_seed:
+                await seed(client, args.lycees, args.users_per_lycee, args.plannings_per_lycee, ctx, log)
+            users = [email(l, u) for l in range(args.lycees) for u in range(args.users_per_lycee)]
+            mix = parse_mix(args.mix)
+
+            rec = Recorder()
+            lag_before = await scrape_loop_lag(client)
+            injector_lag = []
+            injector_monitor = asyncio.create_task(client_loop_lag(injector_lag))
+            rec.recording = True
+            start = time.monotonic()
+            deadline = start + args.duration
+            log(f"charge: {args.concurrency} utilisateurs virtuels pendant {args.duration}s ({args.mix})")
+            await asyncio.gather(*(
+                virtual_user(rec, client, users, mix, ctx, deadline, args.think) for _ in range(args.concurrency)
+            ))
+            elapsed = time.monotonic() - start
+            rec.recording = False
+            injector_monitor.cancel()
+            lag_after = await scrape_loop_lag(client)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    routes = {route: {**summarize_latencies(values, elapsed), "errors": rec.errors.get(route, 0)}
+              for route, values in sorted(rec.samples.items())}
+    for route, errors in rec.errors.items():
+        routes.setdefault(route, {"count": 0, "errors": errors})
+    all_values = [v for values in rec.samples.values() for v in values]
+    injector_lag.sort()
+    return {
+        "config": {
+            "base_url": args.base_url, "mongodb": "uri" if args.mongodb_uri else "mock",
+            "workers": args.workers if args.mongodb_uri else 1, "concurrency": args.concurrency,
+            "duration_s": round(elapsed, 2), "mix": args.mix, "think_s": args.think,
+            "lycees": args.lycees, "users_per_lycee": args.users_per_lycee,
+            "solver_workers": os.getenv("SOLVER_WORKERS", "0"),
+            "multiprocess_metrics": bool(metrics_dir),
+        },
+        "total": {**summarize_latencies(all_values, elapsed), "errors": sum(rec.errors.values())},
+        "routes": routes,
+        "server_event_loop_lag": loop_lag_delta(lag_before, lag_after),
+        "injector_event_loop_lag": {
+            "p99_ms": round(percentile(injector_lag, 99) * 1000, 2) if injector_lag else None,
+            "max_ms": round(injector_lag[-1] * 1000, 2) if injector_lag else None,
+        },
+    }
+
+
+def print_report(report, out=sys.stderr):
+    print(f"\n{'route':<48} {'n':>6} {'err':>5} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9}", file=out)
+    for route, r in list(report["routes"].items()) + [("TOTAL", report["total"])]:
+        print(f"{route:<48} {r['count']:>6} {r['errors']:>5} {r.get('rps') or 0:>8.1f} "
+              f"{r.get('p50_ms') or 0:>7.1f}ms {r.get('p95_ms') or 0:>7.1f}ms {r.get('p99_ms') or 0:>7.1f}ms", file=out)
+    print(f"boucle d'événements API: {report['server_event_loop_lag']}", file=out)
+    print(f"boucle d'événements injecteur: {report['injector_event_loop_lag']}", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Test de charge de bout en bout de l'API.")
+    parser.add_argument("--base-url", help="API déjà lancée (sinon démarrée par le script)")
+    parser.add_argument("--mongodb-uri", help="mongod local (sinon base simulée en mémoire, 1 worker)")
+    parser.add_argument("--workers", type=int, default=1, help="workers uvicorn (avec --mongodb-uri)")
+    parser.add_argument("--concurrency", type=int, default=20, help="utilisateurs virtuels simultanés")
+    parser.add_argument("--duration", type=float, default=30.0, help="secondes de charge mesurée")
+    parser.add_argument("--think", type=float, default=0.0, help="pause moyenne entre scénarios (s)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="poids des scénarios")
+    parser.add_argument("--lycees", type=int, default=3)
+    parser.add_argument("--users-per-lycee", type=int, default=10)
+    parser.add_argument("--plannings-per-lycee", type=int, default=2)
+    parser.add_argument("--no-seed", action="store_true", help="ne crée ni comptes ni plannings")
+    parser.add_argument("--timeout", type=float, default=120.0, help="délai max d'une requête (s)")
+    parser.add_argument("--server-logs", action="store_true", help="affiche la sortie standard de l'API")
+    parser.add_argument("--seed", type=int, default=0, help="graine du tirage des scénarios")
+    parser.add_argument("--out", help="rapport JSON")
+    args = parser.parse_args(argv)
+    if args.mongodb_uri is None and args.workers != 1 and not args.base_url:
+        parser.error("--workers > 1 demande --mongodb-uri (la base simulée n'est pas partagée entre process)")
+    try:
+        parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    random.seed(args.seed)
+    report = asyncio.run(run_load(args, log=lambda line: print(line, file=sys.stderr)))
+    print_report(report)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 1 if report["total"]["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Vérification de la file de résolutions (backend/solver_queue.py) : baux,
+reprises et idempotence, sur les deux serveurs, sans worker ni solveur.
+
+- MongoDB simulée en mémoire (mongomock-motor), ou vraie base avec --mongodb-uri
+- Redis simulé (fakeredis[lua]), ou vrai serveur avec --redis-url
+
+Scénarios :
+- stale_worker_fail : un worker dont le bail a été repris signale une
+  exception ; le job reste au nouveau worker, et son bail (toujours en place)
+  permet de le reprendre si ce worker meurt à son tour.
+- duplicate_complete : le premier résultat écrit l'emporte, un second est ignoré.
+- retries_exhausted : exception à chaque prise, le job finit en échec après
+  SOLVER_QUEUE_MAX_ATTEMPTS prises.
+
+Usage:
+    python -m backend.bench.queue_check
+    python -m backend.bench.queue_check --redis-url redis://localhost:6379/15
+Code de sortie 1 si un scénario échoue.
+"""
+import argparse
+import asyncio
+import sys
+import uuid
+
+from backend.solver_queue import DONE, FAILED, QUEUED, RUNNING, MongoJobQueue, RedisJobQueue
+
+LEASE = 0.3
+MAX_ATTEMPTS = 3
+
+
+class CheckFailed(AssertionError):
+    pass
+
+
+def expect(condition, message):
+    if not condition:
+        raise CheckFailed(message)
+
+
+async def expire_lease():
+    await asyncio.sleep(LEASE * 1.5)
+
+
+async def new_job(queue):
+    job_id = uuid.uuid4().hex
+    await queue.submit(job_id, b"payload")
+    return job_id
+
+
+async def claim(queue, worker_id, job_id):
+    job = await queue.claim(worker_id)
+    expect(job is not None and job.id == job_id, f"{worker_id}: job {job_id} non pris")
+    return job
+
+
+async def status_of(queue, job_id):
+    state = await queue.result(job_id)
+    return state[0] if state else None
+
+
+async def stale_worker_fail(queue):
+    job_id = await new_job(queue)
+    job_w1 = await claim(queue, "w1", job_id)
+    await expire_lease()
+    job_w2 = await claim(queue, "w2", job_id)
+    expect(job_w2.attempts == 2, f"2e prise attendue, {job_w2.attempts}")
+    await queue.fail(job_w1, "w1", "erreur tardive de w1")
+    expect(await status_of(queue, job_id) == RUNNING, "le job doit rester à w2")
+    # w2 meurt sans battement de cœur: son bail (intact) expire et le job est repris
+    await expire_lease()
+    job_w3 = await claim(queue, "w3", job_id)
+    expect(job_w3.attempts == 3, f"3e prise attendue, {job_w3.attempts}")
+    expect(await queue.complete(job_w3, "w3", b"ok"), "résultat de w3 refusé")
+
+
+async def duplicate_complete(queue):
+    job_id = await new_job(queue)
+    job_w1 = await claim(queue, "w1", job_id)
+    await expire_lease()
+    job_w2 = await claim(queue, "w2", job_id)
+    expect(await queue.complete(job_w2, "w2", b"w2"), "premier résultat refusé")
+    expect(not await queue.complete(job_w1, "w1", b"w1"), "second résultat accepté")
+    state = await queue.result(job_id)
+    expect(state[0] == DONE and state[1] == b"w2", f"résultat attendu de w2, {state[:2]}")
+
+
+async def retries_exhausted(queue):
+    job_id = await new_job(queue)
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        job = await claim(queue, f"w{attempt}", job_id)
+        await queue.fail(job, f"w{attempt}", f"erreur {attempt}")
+        expected = QUEUED if attempt < MAX_ATTEMPTS else FAILED
+        expect(await status_of(queue, job_id) == expected, f"prise {attempt}: statut {expected} attendu")
+    expect(await queue.claim("w-extra") is None, "job en échec repris")
+
+
+SCENARIOS = [stale_worker_fail, duplicate_complete, retries_exhausted]
+
+
+def mongo_queue(uri):
+    if uri:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        database = AsyncIOMotorClient(uri)[f"queue_check_{uuid.uuid4().hex[:8]}"]
+    else:
+        import mongomock_motor
+        database = mongomock_motor.AsyncMongoMockClient()["queue_check"]
+    return MongoJobQueue(database, lease=LEASE, max_attempts=MAX_ATTEMPTS)
+
+
+def redis_queue(url):
+    if url:
+        import redis.asyncio as aioredis
+        client = aioredis.from_url(url)
+    else:
+        import fakeredis
+        client = fakeredis.FakeAsyncRedis()
+    return RedisJobQueue(lease=LEASE, max_attempts=MAX_ATTEMPTS, client=client)
+
+
+async def run_checks(backends):
+    failures = 0
+    for name, make in backends:
+        for scenario in SCENARIOS:
+            # File neuve par scénario: aucun job d'un scénario précédent à prendre
+            try:
+                queue = make()
+                await queue.init()
+                await scenario(queue)
+                outcome = "ok"
+            except ImportError as e:
+                outcome = f"ignoré ({e.name} non installé)"
+            except CheckFailed as e:
+                failures += 1
+                outcome = f"ÉCHEC: {e}"
+            print(f"  {name:8s} {scenario.__name__:22s} {outcome}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vérification des baux et reprises de la file de résolutions.")
+    parser.add_argument("--mongodb-uri", help="vraie base MongoDB (défaut: mongomock-motor)")
+    parser.add_argument("--redis-url", help="vrai serveur Redis (défaut: fakeredis)")
+    args = parser.parse_args(argv)
+
+    backends = [
+        ("mongodb", lambda: mongo_queue(args.mongodb_uri)),
+        ("redis", lambda: redis_queue(args.redis_url)),
+    ]
+    failures = asyncio.run(run_checks(backends))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
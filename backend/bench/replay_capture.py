@@ -0,0 +1,140 @@
+"""
+Rejoue une capture du solveur (backend/solver_capture.py) avec d'autres
+paramètres et compare les temps à la résolution d'origine.
+
+Chaque variante (nombre de workers × répétitions) résout le modèle capturé
+tel quel ; --rebuild reconstruit en plus le modèle depuis l'entrée normalisée
+avec le code actuel de solve_slots (effet d'un changement de modélisation).
+
+Usage:
+    python -m backend.bench.replay_capture CAPTURE_DIR
+    python -m backend.bench.replay_capture CAPTURE_DIR --workers 1,4,8 --time-limit 120 --repeat 3
+    python -m backend.bench.replay_capture CAPTURE_DIR --param "search_branching: FIXED_SEARCH" --rebuild
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+
+from backend.solver_capture import load_capture
+
+
+def solver_parameters(base_text, workers=None, time_limit=None, extra=()):
+    """SatParameters d'origine, surchargés (extra: lignes au format texte protobuf `nom: valeur`)."""
+    from google.protobuf import text_format
+    from ortools.sat import sat_parameters_pb2
+    params = sat_parameters_pb2.SatParameters()
+    text_format.Parse(base_text, params)
+    if workers is not None:
+        params.num_workers = workers
+    if time_limit is not None:
+        params.max_time_in_seconds = time_limit
+    for line in extra:
+        text_format.Merge(line, params)
+    return params
+
+
+def solve_capture(model_bytes, params):
+    from ortools.sat.python import cp_model
+    model = cp_model.CpModel()
+    model.Proto().ParseFromString(model_bytes)
+    solver = cp_model.CpSolver()
+    solver.parameters.CopyFrom(params)
+    start = time.perf_counter()
+    status = solver.Solve(model)
+    wall = time.perf_counter() - start
+    result = {
+        "status": solver.StatusName(status),
+        "wall_s": round(wall, 6),
+        "conflicts": solver.NumConflicts(),
+        "branches": solver.NumBranches(),
+    }
+    if model.Proto().HasField("objective") and status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        result["objective"] = solver.ObjectiveValue()
+        result["best_bound"] = solver.BestObjectiveBound()
+    return result
+
+
+def rebuild(inputs):
+    """Reconstruit et résout le modèle avec le code actuel (paramètres de solve_slots)."""
+    from backend.solver import solve_classes_with_telemetry, solve_slots_with_telemetry
+    if "classes" in inputs:   # génération conjointe de plusieurs classes
+        _, telemetry = solve_classes_with_telemetry(inputs["classes"], inputs["mode"])
+    else:
+        _, telemetry = solve_slots_with_telemetry(
+            inputs["slots"], inputs["groups"], inputs["weeks_str"], inputs["weeks_int"], inputs["mode"],
+            busy=inputs.get("busy"), rules=inputs.get("rules"),
+        )
+    return {
+        "status": telemetry["solver"].get("status"),
+        "wall_s": telemetry["phases"].get("solve"),
+        "build_s": round(sum(v for k, v in telemetry["phases"].items() if k != "solve"), 6),
+        "variables": telemetry["model"].get("variables"),
+        "constraints": telemetry["model"].get("constraints"),
+    }
+
+
+def replay(path, workers_list=(None,), time_limit=None, extra=(), repeat=1, with_rebuild=False, log=print):
+    capture = load_capture(path)
+    original = capture["response"]["telemetry"]
+    report = {
+        "capture": path,
+        "reason": capture["response"].get("reason"),
+        "original": {
+            "status": original["solver"].get("status"),
+            "wall_s": original["phases"].get("solve"),
+            "objective": original["solver"].get("objective"),
+            "variables": original["model"].get("variables"),
+            "constraints": original["model"].get("constraints"),
+        },
+        "variants": [],
+    }
+    log(f"origine: {report['original']['status']} en {report['original']['wall_s']}s ({report['reason']})")
+    base_wall = report["original"]["wall_s"] or None
+    for workers in workers_list:
+        params = solver_parameters(capture["params"], workers, time_limit, extra)
+        runs = [solve_capture(capture["model"], params) for _ in range(repeat)]
+        wall = statistics.median(r["wall_s"] for r in runs)
+        variant = {
+            "num_workers": params.num_workers,
+            "max_time_in_seconds": params.max_time_in_seconds,
+            "extra": list(extra),
+            "wall_s": round(wall, 6),
+            "speedup": round(base_wall / wall, 3) if base_wall and wall else None,
+            "runs": runs,
+        }
+        log(f"workers={params.num_workers or 'défaut':>6}  {wall:9.3f}s  x{variant['speedup']}  "
+            f"{', '.join(sorted({r['status'] for r in runs}))}")
+        report["variants"].append(variant)
+    if with_rebuild:
+        report["rebuild"] = rebuild(capture["input"])
+        log(f"reconstruit (code actuel): {report['rebuild']}")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rejoue une capture du solveur CP-SAT.")
+    parser.add_argument("capture", help="répertoire de capture")
+    parser.add_argument("--workers", help="liste de num_workers à comparer (ex: 1,4,8 ; défaut: paramètres capturés)")
+    parser.add_argument("--time-limit", type=float, help="max_time_in_seconds")
+    parser.add_argument("--param", action="append", default=[], help="paramètre SatParameters `nom: valeur` (répétable)")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--rebuild", action="store_true", help="reconstruit le modèle avec le code actuel")
+    parser.add_argument("--out", help="rapport JSON")
+    args = parser.parse_args(argv)
+
+    workers_list = [int(w) for w in args.workers.split(",")] if args.workers else [None]
+    report = replay(args.capture, workers_list, args.time_limit, args.param, args.repeat, args.rebuild,
+                    log=lambda line: print(line, file=sys.stderr))
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
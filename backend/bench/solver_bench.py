@@ -0,0 +1,195 @@
+"""
+Benchmark du solveur : `generate_planning_with_ortools` pour chaque mode sur
+une matrice fixe d'instances synthétiques (backend/bench/instances.py).
+
+Chaque cas tourne dans un processus neuf (mémoire crête mesurée sans
+interférence, OR-Tools compris) et produit : temps de construction du modèle,
+temps de résolution, mémoire crête, statut, objectif, taille du modèle.
+Le rapport JSON peut être comparé à une baseline enregistrée.
+
+Usage:
+    python -m backend.bench.solver_bench --out report.json
+    python -m backend.bench.solver_bench --sizes small,medium --save-baseline baseline.json
+    python -m backend.bench.solver_bench --baseline baseline.json   # code de sortie 1 si régression
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+from backend.bench.instances import InstanceSpec, generate_csv, spec_dict
+
+MODES = ("strict", "relaxed", "maximize")
+
+# Matrice fixe: mêmes instances (graines) d'une exécution à l'autre
+MATRIX = {
+    "small": InstanceSpec(groups=6, weeks=8, seed=1),
+    "medium": InstanceSpec(groups=12, weeks=16, seed=2),
+    "tight": InstanceSpec(groups=12, weeks=16, tightness=1.0, slot_density=2.0, seed=3),
+    "large": InstanceSpec(groups=16, weeks=24, seed=4),
+    "xlarge": InstanceSpec(groups=24, weeks=32, seed=5),
+}
+DEFAULT_SIZES = ("small", "medium", "tight")  # large, xlarge: jusqu'à 30 s par résolution
+
+# Phases hors résolution: construction (parse + modèle + lecture de la solution)
+SOLVE_PHASE = "solve"
+
+
+def _peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: kilo-octets, macOS: octets
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _run_case(csv_content, mode, queue):
+    """Exécuté dans un processus neuf."""
+    from backend.solver import generate_planning_with_ortools
+    rss_before = _peak_rss_mb()
+    start = time.perf_counter()
+    df, _, telemetry = generate_planning_with_ortools(csv_content, mode)
+    wall = time.perf_counter() - start
+    queue.put({
+        "wall_s": wall,
+        "telemetry": telemetry,
+        "feasible": df is not None,
+        "rss_before_mb": rss_before,
+        "peak_rss_mb": _peak_rss_mb(),
+    })
+
+
+def run_case(csv_content, mode):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run_case, args=(csv_content, mode, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def summarize(instance, spec, mode, runs):
+    telemetries = [r["telemetry"] for r in runs]
+    solve = [t["phases"].get(SOLVE_PHASE, 0.0) for t in telemetries]
+    build = [sum(v for k, v in t["phases"].items() if k != SOLVE_PHASE) for t in telemetries]
+    last = telemetries[-1]
+    solver = last.get("solver", {})
+    return {
+        "instance": instance,
+        "mode": mode,
+        "spec": spec_dict(spec),
+        "repeat": len(runs),
+        "build_s": round(statistics.median(build), 6),
+        "solve_s": round(statistics.median(solve), 6),
+        "wall_s": round(statistics.median(r["wall_s"] for r in runs), 6),
+        "peak_rss_mb": round(max(r["peak_rss_mb"] for r in runs), 1),
+        "rss_delta_mb": round(max(r["peak_rss_mb"] - r["rss_before_mb"] for r in runs), 1),
+        "status": solver.get("status"),
+        "feasible": runs[-1]["feasible"],
+        "objective": solver.get("objective"),
+        "best_bound": solver.get("best_bound"),
+        "conflicts": solver.get("conflicts"),
+        "branches": solver.get("branches"),
+        "variables": last["model"].get("variables"),
+        "constraints": last["model"].get("constraints"),
+    }
+
+
+def environment() -> dict:
+    try:
+        from importlib.metadata import version
+        ortools_version = version("ortools")
+    except Exception:
+        ortools_version = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "ortools": ortools_version,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, modes=MODES, repeat=1, log=print):
+    results = []
+    for instance in sizes:
+        spec = MATRIX[instance]
+        csv_content = generate_csv(spec)
+        for mode in modes:
+            runs = [run_case(csv_content, mode) for _ in range(repeat)]
+            row = summarize(instance, spec, mode, runs)
+            log(f"{instance:>7} {mode:>8}  build {row['build_s']:8.3f}s  solve {row['solve_s']:8.3f}s  "
+                f"rss {row['peak_rss_mb']:7.1f} Mo  {row['status']}")
+            results.append(row)
+    return {"environment": environment(), "results": results}
+
+
+def compare(report, baseline, threshold=1.2, min_seconds=0.05):
+    """
+    Régressions par rapport à la baseline: temps > threshold × baseline (au-delà de min_seconds
+    pour ignorer le bruit des très petits temps), ou cas devenu infaisable.
+    """
+    base = {(r["instance"], r["mode"]): r for r in baseline.get("results", [])}
+    rows, regressions = [], []
+    for r in report["results"]:
+        b = base.get((r["instance"], r["mode"]))
+        if b is None:
+            continue
+        row = {"instance": r["instance"], "mode": r["mode"]}
+        for metric in ("build_s", "solve_s", "peak_rss_mb"):
+            row[metric] = {"baseline": b[metric], "current": r[metric],
+                           "ratio": round(r[metric] / b[metric], 3) if b[metric] else None}
+            if metric != "peak_rss_mb" and r[metric] > min_seconds and b[metric] \
+                    and r[metric] > threshold * b[metric]:
+                regressions.append(f"{r['instance']}/{r['mode']}: {metric} {b[metric]:.3f}s -> {r[metric]:.3f}s")
+        if b.get("feasible") and not r.get("feasible"):
+            regressions.append(f"{r['instance']}/{r['mode']}: devenu infaisable ({r['status']})")
+        rows.append(row)
+    return {"threshold": threshold, "comparisons": rows, "regressions": regressions}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark du solveur CP-SAT sur instances synthétiques.")
+    parser.add_argument("--sizes", default=",".join(DEFAULT_SIZES), help=f"parmi {', '.join(MATRIX)}")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--repeat", type=int, default=1, help="répétitions par cas (médiane)")
+    parser.add_argument("--out", help="rapport JSON (défaut: sortie standard)")
+    parser.add_argument("--baseline", help="baseline JSON à comparer")
+    parser.add_argument("--save-baseline", help="enregistre le rapport comme baseline")
+    parser.add_argument("--threshold", type=float, default=1.2, help="ratio de temps considéré comme régression")
+    args = parser.parse_args(argv)
+
+    sizes = [s for s in args.sizes.split(",") if s]
+    unknown = [s for s in sizes if s not in MATRIX]
+    if unknown:
+        parser.error(f"tailles inconnues: {', '.join(unknown)}")
+    report = run_benchmark(sizes, [m for m in args.modes.split(",") if m], args.repeat,
+                           log=lambda line: print(line, file=sys.stderr))
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["comparison"] = compare(report, json.load(f), args.threshold)
+        for line in report["comparison"]["regressions"]:
+            print(f"RÉGRESSION {line}", file=sys.stderr)
+        exit_code = 1 if report["comparison"]["regressions"] else 0
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            f.write(text)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
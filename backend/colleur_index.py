@@ -0,0 +1,90 @@
+"""
+Index des créneaux de colleurs à l'échelle du lycée.
+
+L'unicité des profs (règle 1bis, verifier_contraintes_globales) n'est vérifiée
+qu'à l'intérieur d'un planning. La collection `colleur_slots` garde, pour la
+dernière version de chaque lignée enregistrée, une entrée par colle placée :
+
+    {lycee, prof, week, day, hour, lineage_id, planning_id, name, classes, row, matiere, group}
+
+(index {lycee, prof, week, day, hour}). Elle est tenue à jour à l'enregistrement
+et à la suppression d'un planning (backend.repository) ; l'analyse des conflits
+entre classes et l'exclusion des créneaux occupés à la génération n'ont ainsi
+plus besoin de relire les autres plannings.
+"""
+import numpy as np
+
+
+def slot_key(prof, week, day, hour):
+    """Clé normalisée (mêmes normalisations que le solveur: prof/jour sans espaces autour, heure sans espaces)."""
+    return (str(prof).strip(), str(week).strip(), str(day).strip(), str(hour).replace(" ", "").strip())
+
+
+def colleur_cells(meta, matrix):
+    """
+    Colles placées d'un planning (meta, matrice de backend.planning_codec) :
+    [{"prof", "week", "day", "hour", "matiere", "row", "group"}], sans relire le CSV.
+    """
+    header = meta["header"]
+    position = {header[j]: k for k, j in enumerate(meta["meta_columns"])}
+    if not all(c in position for c in ("Prof", "Jour", "Heure")):
+        return []
+    weeks = [header[j] for j in meta["matrix_columns"]]
+    cells = []
+    rows, cols = np.nonzero(matrix)
+    for i, k in zip(rows.tolist(), cols.tolist()):
+        values = meta["meta"][i]
+        prof, week, day, hour = slot_key(
+            values[position["Prof"]], weeks[k], values[position["Jour"]], values[position["Heure"]]
+        )
+        if not prof:
+            continue
+        cells.append({
+            "prof": prof, "week": week, "day": day, "hour": hour,
+            "matiere": values[position["Matière"]] if "Matière" in position else "",
+            "row": i, "group": int(matrix[i, k]),
+        })
+    return cells
+
+
+def planning_profs(meta):
+    """Profs (normalisés) d'un planning, pour restreindre la lecture de l'index."""
+    header = meta["header"]
+    if "Prof" not in header:
+        return []
+    k = [header[j] for j in meta["meta_columns"]].index("Prof")
+    return sorted({str(values[k]).strip() for values in meta["meta"] if str(values[k]).strip()})
+
+
+def find_conflicts(cells, entries):
+    """
+    Colles de `cells` dont le colleur est déjà placé au même créneau dans un autre
+    planning (`entries`: documents de colleur_slots, hors lignée courante).
+    """
+    taken = {}
+    for e in entries:
+        taken.setdefault(slot_key(e["prof"], e["week"], e["day"], e["hour"]), []).append(e)
+    conflicts = []
+    for cell in cells:
+        others = taken.get((cell["prof"], cell["week"], cell["day"], cell["hour"]))
+        if not others:
+            continue
+        conflicts.append({
+            **cell,
+            "avec": [
+                {
+                    "planning_id": str(e["planning_id"]),
+                    "name": e.get("name"),
+                    "classes": e.get("classes", []),
+                    "matiere": e.get("matiere", ""),
+                    "group": e.get("group"),
+                }
+                for e in others
+            ],
+        })
+    return conflicts
+
+
+def busy_slots(entries):
+    """Clés (prof, semaine, jour, heure) occupées dans d'autres plannings, pour le solveur."""
+    return sorted({slot_key(e["prof"], e["week"], e["day"], e["hour"]) for e in entries})
@@ -0,0 +1,74 @@
+"""
+Tableau de bord du lycée : agrégats matérialisés des plannings enregistrés.
+
+Un document par lycée dans `lycee_dashboard` ({_id: lycée, lineages: {lignée: entrée}}),
+mis à jour à l'enregistrement et à la suppression d'un planning (backend.repository).
+Chaque entrée résume la dernière version d'une lignée : charge hebdomadaire par prof
+(colles par semaine), utilisation des créneaux et compteurs de violations, repris du
+résumé calculé à l'enregistrement. La route /api/dashboard lit ce seul document et
+ne fait que sommer ces entrées.
+"""
+
+
+def lineage_entry(doc: dict, cells: list) -> dict:
+    """Entrée d'une lignée à partir de sa dernière version et de ses colles (backend.colleur_index)."""
+    profs = {}
+    for cell in cells:
+        p = profs.setdefault(cell["prof"], {"prof": cell["prof"], "matieres": [], "semaines": {}})
+        if cell["matiere"] and cell["matiere"] not in p["matieres"]:
+            p["matieres"].append(cell["matiere"])
+        p["semaines"][cell["week"]] = p["semaines"].get(cell["week"], 0) + 1
+    summary = doc.get("summary") or {}
+    resume = summary.get("resume") or {}
+    return {
+        "planning_id": doc["_id"],
+        "name": doc.get("name"),
+        "user": doc.get("user"),
+        "created_at": doc.get("created_at"),
+        "version": doc.get("version", 1),
+        "classes": doc.get("classes", []),
+        "colles": len(cells),
+        # Noms de profs en valeurs (et non en clés: MongoDB refuse les '.' dans les clés)
+        "charge_profs": list(profs.values()),
+        "utilisation": summary.get("globales"),
+        "erreurs": {k: v for k, v in resume.items() if k == "total_erreurs" or k.startswith("erreurs_")},
+    }
+
+
+def dashboard_view(doc) -> dict:
+    """Vue du tableau de bord: charge par prof toutes classes confondues, utilisation et erreurs par classe."""
+    entries = list(((doc or {}).get("lineages") or {}).values())
+    profs = {}
+    classes = {}
+    for e in entries:
+        planning = {"id": str(e["planning_id"]), "name": e.get("name"), "version": e.get("version", 1)}
+        for p in e.get("charge_profs", []):
+            agg = profs.setdefault(p["prof"], {"prof": p["prof"], "matieres": [], "classes": [], "semaines": {}})
+            agg["matieres"] += [m for m in p["matieres"] if m not in agg["matieres"]]
+            agg["classes"] += [c for c in e.get("classes", []) if c not in agg["classes"]]
+            for week, n in p["semaines"].items():
+                agg["semaines"][week] = agg["semaines"].get(week, 0) + n
+        for classe in e.get("classes", []):
+            c = classes.setdefault(classe, {
+                "classe": classe, "plannings": [], "colles": 0,
+                "total_creneaux": 0, "creneaux_utilises": 0, "erreurs": {},
+            })
+            c["plannings"].append(planning)
+            c["colles"] += e.get("colles", 0)
+            utilisation = e.get("utilisation") or {}
+            c["total_creneaux"] += utilisation.get("total_creneaux", 0)
+            c["creneaux_utilises"] += utilisation.get("creneaux_utilises", 0)
+            for k, n in (e.get("erreurs") or {}).items():
+                c["erreurs"][k] = c["erreurs"].get(k, 0) + n
+
+    for p in profs.values():
+        p["total"] = sum(p["semaines"].values())
+        p["max_hebdo"] = max(p["semaines"].values(), default=0)
+    for c in classes.values():
+        c["taux_utilisation"] = round(c["creneaux_utilises"] / c["total_creneaux"] * 100, 1) if c["total_creneaux"] else 0
+    return {
+        "plannings": len(entries),
+        "updated_at": doc.get("updated_at").isoformat() if doc and doc.get("updated_at") else None,
+        "profs": sorted(profs.values(), key=lambda p: (-p["total"], p["prof"])),
+        "classes": sorted(classes.values(), key=lambda c: c["classe"]),
+    }
@@ -2,39 +2,147 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import os
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReadPreference
+from backend.metrics import MongoCommandMetrics
 from datetime import datetime, timezone
 
 MONGODB_URI = os.getenv("MONGODB_URI")
 MONGODB_DB = os.getenv("MONGODB_DB")
 
-mongo_client = MongoClient(MONGODB_URI) if MONGODB_URI else None
+# Réglages du pool de connexions (motor / pymongo)
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+MONGODB_MAX_IDLE_TIME_MS = int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", "60000"))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "5000"))
+MONGODB_SOCKET_TIMEOUT_MS = int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", "20000"))
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+# primary | primaryPreferred | secondary | secondaryPreferred | nearest
+MONGODB_READ_PREFERENCE = os.getenv("MONGODB_READ_PREFERENCE", "primary")
+
+_READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primarypreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondarypreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+def create_client(uri=MONGODB_URI):
+    if not uri:
+        return None
+    return AsyncIOMotorClient(
+        uri,
+        maxPoolSize=MONGODB_MAX_POOL_SIZE,
+        minPoolSize=MONGODB_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGODB_MAX_IDLE_TIME_MS,
+        serverSelectionTimeoutMS=MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        connectTimeoutMS=MONGODB_CONNECT_TIMEOUT_MS,
+        socketTimeoutMS=MONGODB_SOCKET_TIMEOUT_MS,
+        waitQueueTimeoutMS=MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        read_preference=_READ_PREFERENCES.get(MONGODB_READ_PREFERENCE.lower(), ReadPreference.PRIMARY),
+        # Durée de chaque commande -> mongodb_command_duration_seconds (/metrics)
+        event_listeners=[MongoCommandMetrics()],
+    )
+
+mongo_client = create_client()
 db = mongo_client[MONGODB_DB] if mongo_client and MONGODB_DB else None
 
-def ensure_demo_users(get_password_hash):
-    """Ensure demo users and indexes exist. get_password_hash should be passed from main to avoid import cycle."""
+async def ensure_indexes():
+    """Index utilisés par les routes (profil, listing paginé des plannings)."""
+    if db is None:
+        return
+    await db.users.create_index("email", unique=True)
+    await db.users.create_index([("lycee", 1), ("classes", 1)])
+    # Listing par périmètre + pagination par clé (created_at, _id)
+    await db.plannings.create_index([("lycee", 1), ("classes", 1), ("created_at", -1), ("_id", -1)])
+    await db.plannings.create_index([("user", 1), ("created_at", -1)])
+    # Historique des versions d'une lignée ; unique: deux enregistrements concurrents n'ont pas le même numéro
+    await unique_lineage_versions()
+    await db.plannings.create_index([("lineage_id", 1), ("version", -1)], unique=True)
+    # Lignées dont l'index des colleurs / le tableau de bord restent à mettre à jour (démarrage)
+    await db.plannings.create_index("lineage_views", partialFilterExpression={"lineage_views": False})
+    # Versions delta qui s'appuient sur un planning (refus de suppression)
+    await db.plannings.create_index("delta_chain", sparse=True)
+    # Index des colleurs du lycée: conflits entre plannings, créneaux occupés
+    await db.colleur_slots.create_index([("lycee", 1), ("prof", 1), ("week", 1), ("day", 1), ("hour", 1)])
+    await db.colleur_slots.create_index([("lineage_id", 1), ("version", 1)])
+    await db.colleur_slots.create_index("planning_id")
+    # Règles de fréquence: une spécification par classe
+    await db.class_rules.create_index([("lycee", 1), ("classe", 1)], unique=True)
+
+async def unique_lineage_versions():
+    """
+    Passage de l'ancien index (lineage_id, version) non unique à l'index unique (une seule fois) :
+    les versions en double, laissées par des enregistrements concurrents, sont renumérotées à la
+    suite de leur lignée (par date d'enregistrement) puis l'ancien index est supprimé.
+    """
+    index = (await db.plannings.index_information()).get("lineage_id_1_version_-1")
+    if index is None or index.get("unique"):
+        return
+    duplicates = db.plannings.aggregate([
+        {"$group": {"_id": {"lineage_id": "$lineage_id", "version": "$version"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ])
+    async for group in duplicates:
+        lineage_id = group["_id"]["lineage_id"]
+        last = await db.plannings.find_one({"lineage_id": lineage_id}, {"version": 1}, sort=[("version", -1)])
+        version = last["version"]
+        extra = db.plannings.find(group["_id"], {"_id": 1}).sort([("created_at", 1), ("_id", 1)]).skip(1)
+        async for d in extra:
+            version += 1
+            # lineage_views: index des colleurs et tableau de bord recalculés au démarrage
+            await db.plannings.update_one({"_id": d["_id"]}, {"$set": {"version": version, "lineage_views": False}})
+    await db.plannings.drop_index("lineage_id_1_version_-1")
+
+async def migrate_plannings():
+    """
+    Met à niveau les plannings enregistrés avant les évolutions du schéma
+    (une seule fois, ensuite no-op) :
+    - périmètre: recopie lycée/classes de l'auteur sur le planning
+    - versions: chaque ancien planning devient la version 1 de sa propre lignée
+    """
+    if db is None:
+        return
+    async for d in db.plannings.find({"lineage_id": {"$exists": False}}, {"_id": 1}):
+        await db.plannings.update_one(
+            {"_id": d["_id"]},
+            {"$set": {"lineage_id": d["_id"], "version": 1, "parent_id": None, "storage": "snapshot"}},
+        )
+    owners = {}
+    async for d in db.plannings.find({"lycee": {"$exists": False}}, {"user": 1}):
+        email = d.get("user")
+        if email not in owners:
+            owners[email] = await db.users.find_one({"email": email}, {"lycee": 1, "classes": 1})
+        owner = owners[email] or {}
+        await db.plannings.update_one(
+            {"_id": d["_id"]},
+            {"$set": {"lycee": owner.get("lycee", ""), "classes": owner.get("classes", [])}},
+        )
+
+async def ensure_demo_users(get_password_hash):
+    """Ensure demo users exist. get_password_hash (async) should be passed from main to avoid import cycle."""
     if db is None:
         return
-    db.users.create_index("email", unique=True)
     now = datetime.now(timezone.utc)
-    if db.users.count_documents({"email": "admin@demo.fr"}) == 0:
-        db.users.insert_one({
+    if await db.users.count_documents({"email": "admin@demo.fr"}) == 0:
+        await db.users.insert_one({
             "email": "admin@demo.fr",
             "nom": "Admin",
             "role": "professeur",
-            "hashed_password": get_password_hash("admin"),
+            "hashed_password": await get_password_hash("admin"),
             "created_at": now,
             "classes": ['PSIE'],
             'lycee': 'Lycée Camille Guérin'
         })
-    if db.users.count_documents({"email": "user@demo.fr"}) == 0:
-        db.users.insert_one({
+    if await db.users.count_documents({"email": "user@demo.fr"}) == 0:
+        await db.users.insert_one({
             "email": "user@demo.fr",
             "nom": "Utilisateur",
             "role": "utilisateur",
-            "hashed_password": get_password_hash("user"),
+            "hashed_password": await get_password_hash("user"),
             "created_at": now,
             "classes": ['PSIE'],
             'lycee': 'Lycée Camille Guérin'
         })
-
@@ -0,0 +1,213 @@
+"""
+Règles de fréquence des colles, déclaratives et compilées une fois pour le
+solveur (backend/solver.py) et l'analyse (PlanningAnalyzer).
+
+Une spécification (dict JSON, stockée par classe) :
+
+    {"frequences": [
+        {"matiere": "Mathématiques", "fenetre": 2, "nombre": 1, "type": "exact", "rotation": 2},
+        {"matiere": "Français", "alias": ["Francais"], "fenetre": 8, "nombre": 1, "type": "exact",
+         "periode_courte": true},
+        ...],
+     "max_par_jour": 1, "min_par_semaine": 1, "max_par_semaine": 4}
+
+- fenetre : semaines par fenêtre (non chevauchantes, dans l'ordre du CSV ; la
+  dernière, incomplète, est ignorée). type exact / min / max appliqué à `nombre`
+  colles de la matière par groupe et par fenêtre (exact devient min en mode relaxed).
+- rotation : sur `rotation` fenêtres consécutives, un même prof interroge un
+  groupe au plus une fois (solveur).
+- periode_courte : sans aucune fenêtre complète, au plus `nombre` colles sur
+  toute la période (analyse).
+- max_par_jour / min_par_semaine / max_par_semaine : bornes par groupe (null: pas de borne).
+  La charge hebdomadaire n'est imposée que par le solveur, comme auparavant.
+
+rules_error signale une spécification incohérente (refusée par PUT /api/classes/{classe}/rules) :
+min_par_semaine > max_par_semaine, ou `nombre` exact / min qui ne tient pas dans sa fenêtre.
+
+La compilation (CompiledRules) calcule une fois les créneaux concernés par
+chaque règle et ses fenêtres (positions de semaines) ; les contraintes CP-SAT
+et le contrôle vectorisé d'un planning (numpy) en découlent sans rebalayer
+créneaux et semaines.
+"""
+import numpy as np
+
+DEFAULT_RULES = {
+    "frequences": [
+        {"matiere": "Mathématiques", "fenetre": 2, "nombre": 1, "type": "exact", "rotation": 2},
+        {"matiere": "Physique", "fenetre": 2, "nombre": 1, "type": "exact", "rotation": 2},
+        {"matiere": "Anglais", "fenetre": 2, "nombre": 1, "type": "exact", "rotation": 2},
+        {"matiere": "Chimie", "fenetre": 4, "nombre": 1, "type": "exact"},
+        {"matiere": "S.I", "fenetre": 4, "nombre": 1, "type": "exact"},
+        {"matiere": "Français", "alias": ["Francais"], "fenetre": 8, "nombre": 1, "type": "exact",
+         "periode_courte": True},
+    ],
+    "max_par_jour": 1,
+    "min_par_semaine": 1,
+    "max_par_semaine": 4,
+}
+
+
+def normalize_matiere(value) -> str:
+    return str(value).strip().lower()
+
+
+def rules_error(rules):
+    """
+    Incohérence d'une spécification qui rendrait strict et relaxed infaisables pour toute la
+    classe (la génération tomberait en maximize sans le dire) ; None si aucune.
+    """
+    names = [normalize_matiere(n) for r in rules["frequences"] for n in [r["matiere"], *r.get("alias", [])]]
+    if len(set(names)) != len(names):
+        return "Matière présente dans plusieurs règles"
+    low, high = rules.get("min_par_semaine"), rules.get("max_par_semaine")
+    if low is not None and high is not None and low > high:
+        return f"min_par_semaine ({low}) supérieur à max_par_semaine ({high})"
+    for r in rules["frequences"]:
+        # Plus d'une colle de la matière par semaine en moyenne: fenêtre incompatible
+        if r.get("type", "exact") in ("exact", "min") and r.get("nombre", 1) > r["fenetre"]:
+            return (f"{r['matiere']}: {r['nombre']} colles ne tiennent pas dans une fenêtre de "
+                    f"{r['fenetre']} semaine(s)")
+    return None
+
+
+def windows_of(n_weeks, size):
+    """Fenêtres non chevauchantes (positions de semaines) ; la dernière, incomplète, est ignorée."""
+    return [tuple(range(i, i + size)) for i in range(0, n_weeks - size + 1, size)]
+
+
+def window_label(size) -> str:
+    return "Quinzaine" if size == 2 else "Bloc"
+
+
+class CompiledRule:
+    def __init__(self, spec, slot_matieres, slot_profs, n_weeks):
+        self.matiere = spec["matiere"]
+        self.size = int(spec["fenetre"])
+        self.nombre = int(spec.get("nombre", 1))
+        self.type = spec.get("type", "exact")
+        self.rotation = spec.get("rotation")
+        self.short_period = bool(spec.get("periode_courte", False))
+        names = {normalize_matiere(self.matiere), *(normalize_matiere(a) for a in spec.get("alias", []))}
+        # Incidence créneaux × règle, et positions des semaines de chaque fenêtre
+        self.incidence = np.array([normalize_matiere(m) in names for m in slot_matieres], dtype=bool)
+        self.slots = np.flatnonzero(self.incidence).tolist()
+        self.windows = windows_of(n_weeks, self.size)
+        self.membership = np.zeros((n_weeks, len(self.windows)), dtype=np.int32)  # semaines × fenêtres
+        for k, window in enumerate(self.windows):
+            self.membership[list(window), k] = 1
+        self.slots_by_prof = {}
+        for s in self.slots:
+            self.slots_by_prof.setdefault(slot_profs[s], []).append(s)
+
+    def violated(self, counts):
+        """Masque des comptes (tableau numpy) qui enfreignent la règle."""
+        if self.type == "min":
+            return counts < self.nombre
+        if self.type == "max":
+            return counts > self.nombre
+        return counts != self.nombre
+
+    def expected(self) -> str:
+        return {"exact": "attendu", "min": "minimum", "max": "maximum"}[self.type] + f": {self.nombre}"
+
+
+class CompiledRules:
+    """Règles d'une classe compilées pour un jeu de créneaux (matière, prof) et de semaines."""
+
+    def __init__(self, rules, slot_matieres, slot_profs, n_weeks):
+        rules = rules or DEFAULT_RULES
+        self.n_weeks = n_weeks
+        self.frequencies = [CompiledRule(r, slot_matieres, slot_profs, n_weeks) for r in rules.get("frequences", [])]
+        self.max_per_day = rules.get("max_par_jour")
+        self.min_per_week = rules.get("min_par_semaine")
+        self.max_per_week = rules.get("max_par_semaine")
+
+    # -------------------- SOLVEUR --------------------
+    def add_frequency_constraints(self, model, X, groups, weeks_str, mode):
+        """Fréquences par matière et fenêtre (hors maximize). exact: == en strict, >= en relaxed."""
+        if mode == "maximize":
+            return
+        for g in groups:
+            for rule in self.frequencies:
+                for window in rule.windows:
+                    total = sum(X.get((s, weeks_str[w], g), 0) for s in rule.slots for w in window)
+                    if rule.type == "max":
+                        model.Add(total <= rule.nombre)
+                    elif rule.type == "min" or mode != "strict":
+                        model.Add(total >= rule.nombre)
+                    else:
+                        model.Add(total == rule.nombre)
+
+    def add_rotation_constraints(self, model, X, groups, weeks_str, mode):
+        """Un même prof au plus une fois sur `rotation` fenêtres consécutives (hors maximize)."""
+        if mode == "maximize":
+            return
+        for g in groups:
+            for rule in self.frequencies:
+                span = rule.rotation
+                if not span or len(rule.windows) < span:
+                    continue
+                for prof in sorted(rule.slots_by_prof):
+                    slots = rule.slots_by_prof[prof]
+                    for i in range(len(rule.windows) - span + 1):
+                        model.Add(
+                            sum(
+                                X.get((s, weeks_str[w], g), 0)
+                                for window in rule.windows[i:i + span]
+                                for s in slots
+                                for w in window
+                            ) <= 1
+                        )
+
+    # -------------------- CONTRÔLE D'UN PLANNING --------------------
+    def check_groups(self, matrix, groups, weeks, slot_days):
+        """
+        Violations par groupe d'un planning: matrice créneaux × semaines des groupes (0 = vide),
+        `weeks` libellés des semaines, `slot_days` jour de chaque créneau. -> {groupe: [messages]}.
+        """
+        groups_arr = np.asarray(groups)
+        # Présence groupe × créneau × semaine
+        present = matrix[None, :, :] == groups_arr[:, None, None]
+        errors = {g: [] for g in groups}
+
+        if self.frequencies:
+            incidence = np.array([r.incidence for r in self.frequencies], dtype=np.int32)
+            by_week = np.einsum("rs,gsw->grw", incidence, present.astype(np.int32))
+        for r, rule in enumerate(self.frequencies):
+            if rule.windows:
+                counts = by_week[:, r, :] @ rule.membership  # groupes × fenêtres
+                bad = rule.violated(counts)
+                for gi, g in enumerate(groups):
+                    for k in np.flatnonzero(bad[gi]):
+                        window = tuple(weeks[w] for w in rule.windows[k])
+                        errors[g].append(
+                            f"{rule.matiere} - {window_label(rule.size)} {window}: {counts[gi, k]} colles ({rule.expected()})"
+                        )
+            elif rule.short_period:
+                totals = by_week[:, r, :].sum(axis=1)
+                for gi, g in enumerate(groups):
+                    if totals[gi] > rule.nombre:
+                        errors[g].append(
+                            f"{rule.matiere} - Période complète {tuple(weeks)}: {totals[gi]} colles "
+                            f"(max {rule.nombre} autorisée sur {len(weeks)} semaines)"
+                        )
+
+        if self.max_per_day is not None:
+            days = list(dict.fromkeys(slot_days))
+            day_index = np.array([days.index(d) for d in slot_days], dtype=np.int64)
+            day_incidence = np.zeros((len(days), len(slot_days)), dtype=np.int32)
+            day_incidence[day_index, np.arange(len(slot_days))] = 1
+            by_day = np.einsum("ds,gsw->gdw", day_incidence, present.astype(np.int32))
+            for gi, g in enumerate(groups):
+                over = np.argwhere(by_day[gi] > self.max_per_day)
+                # Ordre d'affichage: semaine, puis premier créneau du groupe dans le jour
+                first_slot = {
+                    (d, w): int(np.flatnonzero(present[gi, :, w] & (day_index == d))[0]) for d, w in over.tolist()
+                }
+                for d, w in sorted(first_slot, key=lambda dw: (dw[1], first_slot[dw])):
+                    errors[g].append(
+                        f"Groupe {g}, Semaine {weeks[w]}, Jour {days[d]}: {by_day[gi, d, w]} colles "
+                        f"(max {self.max_per_day} autorisée)"
+                    )
+        return errors
+
@@ -0,0 +1,59 @@
+"""
+Cache HTTP des plannings : ETag forts, requêtes conditionnelles (If-None-Match -> 304)
+et compression des réponses volumineuses.
+
+Configuration (.env) :
+    COMPRESSION_MIN_BYTES=1024   (taille minimale avant compression gzip/brotli)
+"""
+import hashlib
+import os
+from typing import Optional
+
+from fastapi import Response
+from starlette.middleware.gzip import GZipMiddleware
+
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+
+# Plannings enregistrés: jamais modifiés (une modification crée une nouvelle version)
+CACHE_CONTROL_IMMUTABLE = "private, max-age=31536000, immutable"
+# Données de session (dernier planning généré): revalidation à chaque usage
+CACHE_CONTROL_REVALIDATE = "private, no-cache"
+
+
+def content_hash(data) -> str:
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_etag(digest: str, variant: str = "") -> str:
+    """ETag fort: empreinte du contenu + représentation (json, csv, xlsx...)."""
+    return f'"{digest[:32]}{"-" + variant if variant else ""}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    if "*" in candidates:
+        return True
+    # Comparaison faible (RFC 9110 §13.1.2): on ignore le préfixe W/ ajouté par certains proxys
+    return any(c.removeprefix("W/") == etag for c in candidates)
+
+
+def cache_headers(etag: str, cache_control: str) -> dict:
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag, cache_control))
+
+
+def add_compression(app):
+    """brotli si `brotli-asgi` est installé (repli gzip intégré), sinon gzip de Starlette."""
+    try:
+        from brotli_asgi import BrotliMiddleware
+    except ImportError:
+        app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_BYTES)
+    else:
+        app.add_middleware(BrotliMiddleware, minimum_size=COMPRESSION_MIN_BYTES, gzip_fallback=True)
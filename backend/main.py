@@ -1,31 +1,83 @@
-from fastapi import FastAPI, UploadFile, File, Query
+from fastapi import FastAPI, UploadFile, File, Form, Query, Header, Response
 from contextlib import asynccontextmanager
 from fastapi import Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse, JSONResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+import asyncio
 import csv
 import io
-import pandas as pd
-from ortools.sat.python import cp_model
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from collections import defaultdict
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Literal
-from pydantic import BaseModel
+from typing import Optional, Literal, List
+from pydantic import BaseModel, Field
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 import os
 from dotenv import load_dotenv
 from bson import ObjectId
-from backend.db import db, ensure_demo_users
+from pymongo.errors import DuplicateKeyError
+from backend.db import db, mongo_client, ensure_indexes, migrate_plannings, ensure_demo_users
+from backend import repository
+from backend.planning_codec import (
+    build_matrix, encode_planning, decode_matrix, encode_delta, parse_planning_csv, planning_rows_to_csv,
+    rows_from_matrix, same_structure, week_column_indexes
+)
+from backend.http_cache import (
+    CACHE_CONTROL_IMMUTABLE, CACHE_CONTROL_REVALIDATE, add_compression, cache_headers,
+    content_hash, etag_matches, make_etag, not_modified
+)
+from backend.sessions import create_session_store, LRUCache, UserSession
+from backend.planning_response import negotiated_format, planning_response
+from backend.planning_index import get_planning_index, index_cache
+from backend.colleur_index import busy_slots, colleur_cells, find_conflicts, planning_profs
+from backend.dashboard import dashboard_view
+from backend.frequency_rules import DEFAULT_RULES, CompiledRules, rules_error
+from backend.scenarios import PatchError, apply_patches, colle_counts
+from backend.solver import MODE_MESSAGES, class_components, parse_hhmm_range_to_minutes, slot_input_from_rows
+from backend.solver_pool import SolverPool
+from backend.solver_queue import create_job_queue
+from backend.telemetry import generation_telemetry, log_json
+from backend.metrics import (
+    EVENT_LOOP_LAG_INTERVAL_SECONDS, MetricsMiddleware, metrics_payload, monitor_event_loop_lag, register_cache, timed,
+)
 
 
+async def run_startup_tasks(app):
+    """Index, migration, comptes de démo, sessions (db is initialized in db.py)."""
+    try:
+        await ensure_indexes()
+        await migrate_plannings()
+        await repository.backfill_lineage_views()
+        await ensure_demo_users(get_password_hash_async)
+        await session_store.init()
+        await solver_pool.init()
+        app.state.startup_done = True
+    except Exception as e:
+        app.state.startup_error = str(e)
+        print(f"[ERROR] Initialisation au démarrage échouée: {e}")
+
 # Utilisation du nouveau système lifespan pour l'init MongoDB
 @asynccontextmanager
 async def lifespan(app):
-    # Ensure demo users/indexes exist (db is initialized in db.py)
-    ensure_demo_users(get_password_hash)
+    # Démarrage non bloquant: l'API répond (liveness) pendant l'initialisation,
+    # /api/health/ready passe à 200 quand elle est terminée
+    app.state.startup_done = False
+    app.state.startup_error = None
+    startup = asyncio.create_task(run_startup_tasks(app))
+    solver_pool.start()
+    loop_lag = asyncio.create_task(monitor_event_loop_lag()) if EVENT_LOOP_LAG_INTERVAL_SECONDS > 0 else None
     yield
+    startup.cancel()
+    if loop_lag is not None:
+        loop_lag.cancel()
+    await solver_pool.shutdown()
+    if mongo_client is not None:
+        mongo_client.close()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -35,7 +87,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
+# Compression gzip/brotli des réponses au-delà de COMPRESSION_MIN_BYTES
+add_compression(app)
+# Latence par route (/metrics), en dernier: mesure aussi la compression et CORS
+app.add_middleware(MetricsMiddleware)
 
 # -----------------------
 # Auth settings & models
@@ -45,7 +102,15 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 8
 
+# Cache des utilisateurs authentifiés (email -> Principal), TTL court
+PRINCIPAL_CACHE_TTL_SECONDS = int(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+# bcrypt (~250 ms) exécuté hors de la boucle d'événements, dans un pool borné
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+password_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+principal_cache = LRUCache(max_entries=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL_SECONDS)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 class Token(BaseModel):
@@ -64,6 +129,12 @@ class User(BaseModel):
 class UserInDB(User):
     hashed_password: str
 
+class Principal(User):
+    """Utilisateur authentifié avec son périmètre (lycée, classes), mis en cache."""
+    lycee: Optional[str] = None
+    classes: list[str] = []
+    matieres: list[str] = []
+
 class SignupRequest(BaseModel):
     email: str
     password: str
@@ -75,12 +146,8 @@ class SignupRequest(BaseModel):
 # -----------------------
 # MongoDB setup
 # -----------------------
-MONGODB_URI = os.getenv("MONGODB_URI")
-MONGODB_DB = os.getenv("MONGODB_DB")
-
-# `db` is provided by backend.db
-mongo_client = None
-# db variable imported from backend.db
+# `db` / `mongo_client` (motor, async) sont fournis par backend.db,
+# les accès passent par backend.repository
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -89,6 +156,14 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_hash_executor, verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_hash_executor, get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
@@ -98,7 +173,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 async def get_user(username: str) -> Optional[UserInDB]:
     if db is None:
         return None
-    doc = db.users.find_one({"email": username})
+    doc = await repository.find_user(username)
     if not doc:
         return None
     return UserInDB(email=doc["email"], nom=doc.get("nom"), role=doc.get("role", "utilisateur"), hashed_password=doc["hashed_password"])
@@ -107,11 +182,44 @@ async def authenticate_user(username: str, password: str) -> Optional[UserInDB]:
     user = await get_user(username)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return None
     return user
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
+PRINCIPAL_PROJECTION = {"email": 1, "nom": 1, "role": 1, "lycee": 1, "classes": 1, "matieres": 1, "_id": 0}
+
+async def get_principal(email: str) -> Optional[Principal]:
+    """Utilisateur + périmètre, servi depuis le cache (une lecture base par TTL au plus)."""
+    cached = principal_cache.get(email)
+    if cached is not None:
+        return cached[0]
+    if db is None:
+        return None
+    doc = await repository.find_user(email, PRINCIPAL_PROJECTION)
+    if not doc:
+        return None
+    principal = Principal(
+        email=doc["email"],
+        nom=doc.get("nom"),
+        role=doc.get("role", "utilisateur"),
+        lycee=doc.get("lycee"),
+        classes=doc.get("classes", []),
+        matieres=doc.get("matieres", []),
+    )
+    principal_cache.set(email, principal)
+    return principal
+
+def invalidate_principal(email: str):
+    principal_cache.delete(email)
+
+def create_user_token(principal: User) -> str:
+    """Jeton d'accès portant le rôle et le périmètre (lycée, classes)."""
+    claims = {"sub": principal.email, "role": principal.role}
+    if isinstance(principal, Principal):
+        claims.update({"lycee": principal.lycee, "classes": principal.classes})
+    return create_access_token(claims)
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -126,13 +234,29 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
         token_data = TokenData(username=username, role=role)  # noqa: F841
     except JWTError:
         raise credentials_exception
-    user = await get_user(username)
+    user = await get_principal(username)
     if user is None:
         raise credentials_exception
     return user
 
+# Espace de travail par utilisateur (remplace les anciennes variables globales)
+session_store = create_session_store(db)
+solver_pool = SolverPool(queue=create_job_queue(db))
+register_cache("sessions", session_store.cache)
+register_cache("principals", principal_cache)
+register_cache("planning_index", index_cache)
+
+async def get_session(
+    user: Principal = Depends(get_current_user),
+    x_workspace_id: Optional[str] = Header(None),
+) -> UserSession:
+    return session_store.for_user(user.email, x_workspace_id)
+
+async def get_generated_planning(session: UserSession = Depends(get_session)) -> Optional[str]:
+    return await session.get("generated_planning")
+
 def require_role(*allowed_roles: Literal["utilisateur", "professeur"]):
-    def _dep(user: UserInDB = Depends(get_current_user)):
+    def _dep(user: Principal = Depends(get_current_user)):
         if user.role not in allowed_roles:
             raise HTTPException(status_code=403, detail="Insufficient permissions")
         return user
@@ -145,20 +269,25 @@ def require_role(*allowed_roles: Literal["utilisateur", "professeur"]):
 async def signup(req: SignupRequest):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not initialized")
-    exists = db.users.find_one({"email": req.email})
+    exists = await repository.user_exists(req.email)
     if exists:
         raise HTTPException(status_code=400, detail="Email already exists")
     if not req.lycee or not req.classes or len(req.classes) == 0:
         raise HTTPException(status_code=400, detail="Lycée et au moins une classe sont obligatoires")
-    db.users.insert_one({
-        "email": req.email,
-        "nom": req.nom,
-        "role": req.role,
-        "hashed_password": get_password_hash(req.password),
-        "created_at": datetime.now(timezone.utc),
-        "classes": req.classes,
-        "lycee": req.lycee
-    })
+    hashed_password = await get_password_hash_async(req.password)
+    try:
+        await repository.insert_user({
+            "email": req.email,
+            "nom": req.nom,
+            "role": req.role,
+            "hashed_password": hashed_password,
+            "created_at": datetime.now(timezone.utc),
+            "classes": req.classes,
+            "lycee": req.lycee
+        })
+    except DuplicateKeyError:
+        # Inscription concurrente avec le même email (index unique)
+        raise HTTPException(status_code=400, detail="Email already exists")
     return User(email=req.email, nom=req.nom, role=req.role)
 
 @app.post("/api/auth/login", response_model=Token)
@@ -166,7 +295,8 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     user = await authenticate_user(form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
-    access_token = create_access_token({"sub": user.email, "role": user.role})
+    principal = await get_principal(user.email)
+    access_token = create_user_token(principal or user)
     return Token(access_token=access_token)
 
 # -----------------------
@@ -180,328 +310,37 @@ class UserProfile(BaseModel):
     lycee: Optional[str] = None
 
 @app.get("/api/users/me")
-async def get_me(user: UserInDB = Depends(get_current_user)):
+async def get_me(user: Principal = Depends(get_current_user)):
     if db is None:
         return JSONResponse(status_code=500, content={"error": "Base de données non initialisée"})
-    d = db.users.find_one({"email": user.email})
-    if not d:
-        return JSONResponse(status_code=404, content={"error": "Utilisateur introuvable"})
     return {
-        "email": d["email"],
-        "nom": d.get("nom"),
-        "role": d.get("role"),
-        "classes": d.get("classes", []),
-        "matieres": d.get("matieres", []),
-        "lycee": d.get("lycee")
+        "email": user.email,
+        "nom": user.nom,
+        "role": user.role,
+        "classes": user.classes,
+        "matieres": user.matieres,
+        "lycee": user.lycee
     }
 
 @app.put("/api/users/me")
-async def update_me(payload: UserProfile, user: UserInDB = Depends(get_current_user)):
+async def update_me(payload: UserProfile, user: Principal = Depends(get_current_user)):
     if db is None:
         return JSONResponse(status_code=500, content={"error": "Base de données non initialisée"})
     update_doc = {k: v for k, v in payload.dict().items() if v is not None}
     if not update_doc:
         return {"updated": False}
-    db.users.update_one({"email": user.email}, {"$set": update_doc})
-    return {"updated": True}
-
-# -----------------------
-# Utils parsing groupes
-# -----------------------
-def parse_groups(txt):
-    if pd.isna(txt) or txt == '':
-        return []
-    if 'à' in txt:
-        a, b = txt.split('à')
-        return list(range(int(a.strip()), int(b.strip()) + 1))
-    return [int(str(txt).strip())]
-
-def extract_all_groups(df):
-    all_groups = set()
-    for _, row in df.iterrows():
-        all_groups.update(parse_groups(row['Groupes possibles semaine paire']))
-        all_groups.update(parse_groups(row['Groupes possibles semaine impaire']))
-    return sorted(list(all_groups))
-
-# -----------------------
-# Utils semaines dynamiques
-# -----------------------
-def extract_week_columns(df):
-    """
-    Retourne les colonnes semaines dans l'ordre du CSV.
-    Ex: ["38","39","41","42",...], et leur version int.
-    On ne trie pas : on respecte l'ordre fourni dans le fichier.
-    """
-    weeks_str = []
-    for c in df.columns:
-        if isinstance(c, str) and c.strip().isdigit():
-            weeks_str.append(c.strip())
-    weeks_int = [int(w) for w in weeks_str]
-    return weeks_str, weeks_int
-
-def make_windows_non_overlapping(weeks_list, size):
-    """
-    Découpe la liste des semaines en fenêtres non chevauchantes de 'size'.
-    Ignore la dernière fenêtre si incomplète (ex: reste 1 semaine).
-    Exemple: size=2 -> quinzaines, size=4 -> "mois" pédagogiques.
-    """
-    windows = []
-    for i in range(0, len(weeks_list), size):
-        chunk = weeks_list[i:i+size]
-        if len(chunk) == size:
-            windows.append(tuple(chunk))
-    return windows
-
-def parse_hhmm_range_to_minutes(hhmm_range):
-    # "17h-18h" -> (1020, 1080)
-    deb, fin = [p.strip() for p in str(hhmm_range).split('-')]
-    def h2m(p):
-        parts = str(p).split('h')
-        h = int(parts[0]) if parts[0] else 0
-        m = int(parts[1]) if len(parts) > 1 and parts[1] else 0
-        return h * 60 + m
-    return h2m(deb), h2m(fin)
-
-# -----------------------
-# Génération OR-Tools avec semaines dynamiques
-# -----------------------
-def generate_planning_with_ortools(csv_content, mode="strict"):
-    """
-    Mode:
-    - "strict": contraintes strictes (== 1) + interdit colles consécutives
-    - "relaxed": fréquence >= 1 + interdit colles consécutives
-    - "maximize": objectif de maximisation + minimise colles consécutives (pénalité douce)
-    """
-    df = pd.read_csv(io.StringIO(csv_content), sep=';')
-
-    # Normalisation pour fiabiliser les contraintes
-    df['Jour'] = df['Jour'].astype(str).str.strip()
-    df['Heure'] = (
-        df['Heure'].astype(str)
-        .str.replace(' ', '', regex=False)  # "18h - 19h" -> "18h-19h"
-        .str.strip()
-    )
-
-    groups = extract_all_groups(df)
-    if not groups:
-        return None, "Aucun groupe détecté dans le CSV"
-
-    # Semaines dynamiques depuis le CSV (ordre respecté, non trié)
-    weeks_str, weeks_int = extract_week_columns(df)
-    if not weeks_str:
-        return None, "Aucune colonne de semaine détectée dans le CSV"
-
-    print(f"[DEBUG] Mode: {mode}, Groupes: {groups}, Weeks: {weeks_str}")
-
-    # Fenêtres dynamiques basées sur la liste
-    # Quinzaines: fenêtres non chevauchantes de 2 semaines (selon l'ordre du CSV)
-    quinz = make_windows_non_overlapping(weeks_str, 2)
-    # "Mois" pédagogiques: fenêtres non chevauchantes de 4 semaines
-    mois = make_windows_non_overlapping(weeks_str, 4)
-    eight_week_blocks = make_windows_non_overlapping(weeks_str, 8)
-
-    # Création des slots
-    slots = []
-    for _, row in df.iterrows():
-        slots.append(dict(
-            mat=row['Matière'],
-            prof=row['Prof'],
-            day=row['Jour'],
-            hour=row['Heure'],
-            even=parse_groups(row['Groupes possibles semaine paire']),
-            odd=parse_groups(row['Groupes possibles semaine impaire']),
-            works_even=(str(row['Travaille les semaines paires']).strip() == 'Oui'),
-            works_odd=(str(row['Travaille les semaines impaires']).strip() == 'Oui')
-        ))
-
-    model = cp_model.CpModel()
-    X = {}
-
-    # Variables: respect pair/impair + autorisations par slot
-    for s, slot in enumerate(slots):
-        for w_str, w_int in zip(weeks_str, weeks_int):
-            for g in groups:
-                if (w_int % 2 == 0 and (g not in slot['even'] or not slot['works_even'])) or \
-                   (w_int % 2 == 1 and (g not in slot['odd'] or not slot['works_odd'])):
-                    continue
-                X[s, w_str, g] = model.NewBoolVar(f"x_{s}_{w_str}_{g}")
-
-    # 1) Un seul groupe par slot/semaine
-    for s in range(len(slots)):
-        for w_str in weeks_str:
-            model.Add(sum(X.get((s, w_str, g), 0) for g in groups) <= 1)
-
-    # 1bis) Prof unique par créneau (hors maximize)
-    if mode != "maximize":
-        for w_str in weeks_str:
-            for prof in df['Prof'].unique():
-                for day in df['Jour'].unique():
-                    for hour in df['Heure'].unique():
-                        model.Add(
-                            sum(
-                                X.get((s, w_str, g), 0)
-                                for s, sl in enumerate(slots)
-                                if sl['prof'] == prof and sl['day'] == day and sl['hour'] == hour
-                                for g in groups
-                            ) <= 1
-                        )
-
-    # 2) Fréquences par matière (selon mode) sur fenêtres dynamiques
-    if mode != "maximize":
-        for g in groups:
-            # 1 par quinzaine pour Maths/Physique/Anglais
-            for mat in ['Mathématiques', 'Physique', 'Anglais']:
-                for q in quinz:
-                    constraint_sum = sum(
-                        X.get((s, w, g), 0)
-                        for s, sl in enumerate(slots) if sl['mat'] == mat
-                        for w in q
-                    )
-                    if mode == "strict":
-                        model.Add(constraint_sum == 1)
-                    else:
-                        model.Add(constraint_sum >= 1)
-
-            # 1 par "mois" (4 semaines)
-            for mat in ['Chimie', 'S.I']:
-                for m in mois:
-                    constraint_sum = sum(
-                        X.get((s, w, g), 0)
-                        for s, sl in enumerate(slots) if sl['mat'] == mat
-                        for w in m
-                    )
-                    if mode == "strict":
-                        model.Add(constraint_sum == 1)
-                    else:
-                        model.Add(constraint_sum >= 1)
-
-            # Français: 1 sur toute la période (toutes semaines détectées)
-            # Français: 1 par tranche de 8 semaines
-            for g in groups:
-                for block in eight_week_blocks:
-                    constraint_sum = sum(
-                        X.get((s, w, g), 0)
-                        for s, sl in enumerate(slots) if sl['mat'] == 'Français'
-                        for w in block
-                    )
-                    if mode == "strict":
-                        model.Add(constraint_sum == 1)
-                    else:
-                        model.Add(constraint_sum >= 1)
-
-    # 3) Rotation profs sur 2 quinzaines adjacentes (hors maximize)
-    if mode != "maximize":
-        if len(quinz) >= 2:
-            for g in groups:
-                for mat in ['Mathématiques', 'Physique', 'Anglais']:
-                    profs_mat = sorted({sl['prof'] for sl in slots if sl['mat'] == mat})
-                    for p in profs_mat:
-                        for i in range(len(quinz) - 1):
-                            Q1, Q2 = quinz[i], quinz[i + 1]
-                            model.Add(
-                                sum(
-                                    X.get((s, w, g), 0)
-                                    for s, sl in enumerate(slots) if sl['mat'] == mat and sl['prof'] == p
-                                    for w in Q1
-                                )
-                                +
-                                sum(
-                                    X.get((s, w, g), 0)
-                                    for s, sl in enumerate(slots) if sl['mat'] == mat and sl['prof'] == p
-                                    for w in Q2
-                                )
-                                <= 1
-                            )
-
-    # 4) Pas deux colles même jour+heure pour un groupe
-    for g in groups:
-        for w_str in weeks_str:
-            for day in df['Jour'].unique():
-                for hour in df['Heure'].unique():
-                    model.Add(
-                        sum(
-                            X.get((s, w_str, g), 0)
-                            for s, sl in enumerate(slots)
-                            if sl['day'] == day and sl['hour'] == hour
-                        ) <= 1
-                    )
-
-    # 5) Charge hebdo (bornes)
-    for g in groups:
-        for w_str in weeks_str:
-            if mode == "maximize":
-                model.Add(sum(X.get((s, w_str, g), 0) for s in range(len(slots))) <= 4)
-            else:
-                model.Add(sum(X.get((s, w_str, g), 0) for s in range(len(slots))) >= 1)
-                model.Add(sum(X.get((s, w_str, g), 0) for s in range(len(slots))) <= 4)
-
-    # 6) Interdire systématiquement les colles consécutives (hard constraint)
-    for g in groups:
-        for w_str in weeks_str:
-            for day in df['Jour'].unique():
-                # Créneaux de ce jour (triés par heure de début)
-                slots_day = [(s, sl) for s, sl in enumerate(slots) if sl['day'] == day]
-                slots_day.sort(key=lambda x: parse_hhmm_range_to_minutes(x[1]['hour'])[0])
-
-                for i in range(len(slots_day) - 1):
-                    s1, sl1 = slots_day[i]
-                    s2, sl2 = slots_day[i + 1]
-                    _, end1 = parse_hhmm_range_to_minutes(sl1['hour'])
-                    start2, _ = parse_hhmm_range_to_minutes(sl2['hour'])
-
-                    if end1 == start2:
-                        # HARD: jamais 2 colles back-to-back pour un groupe
-                        model.Add(X.get((s1, w_str, g), 0) + X.get((s2, w_str, g), 0) <= 1)
-    
-        # (Hard) Au plus 1 colle par jour pour chaque groupe et semaine
-    for g in groups:
-        for w_str in weeks_str:
-            for day in df['Jour'].unique():
-                model.Add(
-                    sum(
-                        X.get((s, w_str, g), 0)
-                        for s, sl in enumerate(slots)
-                        if sl['day'] == day
-                    ) <= 1
-                )
-    # Objectif
-    if mode == "maximize":
-        model.Maximize(sum(X.values()))
-
-    # Solve
-    solver = cp_model.CpSolver()
-    solver.parameters.max_time_in_seconds = 30
-    status = solver.Solve(model)
-    print(f"[DEBUG] Status: {status}, Mode: {mode}")
-
-    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
-        return None, f"Aucune solution trouvée en mode {mode}"
-
-    # Injection: (ré)écrit uniquement les colonnes semaines détectées
-    for w_str in weeks_str:
-        col = []
-        for s in range(len(slots)):
-            g_found = ''
-            for g in groups:
-                if (s, w_str, g) in X and solver.Value(X[s, w_str, g]) == 1:
-                    g_found = str(g)
-                    break
-            col.append(g_found)
-        df[w_str] = col
-
-    mode_msg = {
-        "strict": "Planning généré (semaines dynamiques, consécutives interdites)",
-        "relaxed": "Planning généré (semaines dynamiques, contraintes relâchées, consécutives interdites)",
-        "maximize": "Planning généré (semaines dynamiques, max colles & min colles consécutives)"
-    }
-    #df = adjust_late_slots(df)
-    return df, mode_msg.get(mode, f"Planning généré en mode {mode}")
+    await repository.update_user(user.email, update_doc)
+    invalidate_principal(user.email)
+    # Nouveau jeton: le périmètre (lycée/classes) porté par les claims a pu changer
+    principal = await get_principal(user.email)
+    return {"updated": True, "access_token": create_user_token(principal) if principal else None}
 
 # -----------------------
 # Export Excel avec style
 # -----------------------
 
 def export_excel_with_style(df):
+    import pandas as pd  # import paresseux: pandas/xlsxwriter seulement pour les exports
     out = io.BytesIO()
     with pd.ExcelWriter(out, engine="xlsxwriter") as writer:
         df.to_excel(writer, sheet_name="Planning", index=False)
@@ -545,7 +384,9 @@ def export_excel_with_style(df):
 # -----------------------
 
 class PlanningAnalyzer:
-    def __init__(self, csv_content):
+    @timed("analysis.load")
+    def __init__(self, csv_content, rules=None):
+        import pandas as pd
         self.df = pd.read_csv(io.StringIO(csv_content), sep=';')
 
         # Semaines dynamiques (colonnes numériques, ordre du CSV, non trié)
@@ -553,13 +394,10 @@ class PlanningAnalyzer:
         # NE PAS trier les semaines, respecter l'ordre du CSV
         self.groups = list(range(1, 16))  # 15 groupes
 
-        def make_windows_non_overlapping(weeks, size):
-            return [tuple(weeks[i:i+size]) for i in range(0, len(weeks), size)
-                    if len(weeks[i:i+size]) == size]
-
-        self.groups_2 = make_windows_non_overlapping(self.weeks, 2)
-        self.groups_4 = make_windows_non_overlapping(self.weeks, 4)
-        self.groups_8 = make_windows_non_overlapping(self.weeks, 8)
+        # Règles de fréquence de la classe, compilées une fois (mêmes structures que le solveur)
+        column = lambda name: self.df[name].tolist() if name in self.df.columns else [None] * len(self.df)
+        self.rules = CompiledRules(rules, column("Matière"), column("Prof"), len(self.weeks))
+        self._groupes = None
 
     # -------------------- CONTRAINTES GLOBALES --------------------
     def verifier_contraintes_globales(self):
@@ -602,78 +440,24 @@ class PlanningAnalyzer:
         return erreurs
 
     # -------------------- CONTRAINTES PAR GROUPE --------------------
-    def verifier_contraintes_groupe(self, groupe):
-        erreurs = []
-        group_weeks = {w: [] for w in self.weeks}
-
-        # Construire dict colles pour ce groupe
-        for week in self.weeks:
-            week_str = str(week)
-            for _, row in self.df.iterrows():
-                val = row.get(week_str, "")
-                try:
-                    g = int(val)
-                except (ValueError, TypeError):
-                    continue
-                if g == groupe:
-                    group_weeks[week].append([row["Matière"], row["Prof"], row["Jour"], row["Heure"]])
-
-        # Maths / Physique / Anglais → 1 par quinzaine
-        for matiere in ["Mathématiques", "Physique", "Anglais"]:
-            for quin in self.groups_2:
-                count = sum(
-                    sum(1 for colle in group_weeks.get(w, []) if colle[0] == matiere)
-                    for w in quin
-                )
-                if count != 1:
-                    erreurs.append(f"{matiere} - Quinzaine {quin}: {count} colles (attendu: 1)")
-
-        # Chimie / SI → 1 par 4 semaines
-        for matiere in ["Chimie", "S.I"]:
-            for bloc in self.groups_4:
-                count = sum(
-                    sum(1 for colle in group_weeks.get(w, []) if colle[0] == matiere)
-                    for w in bloc
-                )
-                if count != 1:
-                    erreurs.append(f"{matiere} - Bloc {bloc}: {count} colles (attendu: 1)")
-
-        # Français → 1 par 8 semaines (vérification robuste)
-        if self.groups_8:
-            # Si on a des blocs de 8 semaines complets, on les utilise
-            for bloc in self.groups_8:
-                count = sum(
-                    sum(1 for colle in group_weeks.get(w, [])
-                        if colle[0].strip().lower() in ["français", "francais"])
-                    for w in bloc
-                )
-                if count != 1:
-                    erreurs.append(f"Français - Bloc {bloc}: {count} colles (attendu: 1)")
-        else:
-            # Si pas de bloc de 8 semaines complet, on vérifie sur toute la période
-            # (max 1 colle de français sur toute la période)
-            count = sum(
-                sum(1 for colle in group_weeks.get(w, [])
-                    if colle[0].strip().lower() in ["français", "francais"])
-                for w in self.weeks
-            )
-            if count > 1:
-                erreurs.append(f"Français - Période complète {tuple(self.weeks)}: {count} colles (max 1 autorisée sur {len(self.weeks)} semaines)")
-                erreurs.append(f"Français - Période complète {tuple(self.weeks)}: {count} colles (max 1 autorisée)")
-            # Note: on n'exige pas 1 colle si la période est courte
-
-        # Pas plus d'1 colle par jour
-        for week in self.weeks:
-            by_day = {}
-            for mat, prof, jour, heure in group_weeks.get(week, []):
-                by_day.setdefault(jour, []).append((mat, prof, heure))
-            for jour, colles in by_day.items():
-                if len(colles) > 1:
-                    erreurs.append(
-                        f"Groupe {groupe}, Semaine {week}, Jour {jour}: {len(colles)} colles (max 1 autorisée)"
-                    )
+    def group_matrix(self):
+        """Matrice créneaux × semaines des groupes affectés (0: case vide ou non numérique)."""
+        import pandas as pd
+        columns = [
+            pd.to_numeric(self.df[str(w)], errors="coerce").fillna(0).to_numpy().astype(np.int64)
+            for w in self.weeks
+        ]
+        return np.stack(columns, axis=1) if columns else np.zeros((len(self.df), 0), dtype=np.int64)
+
+    def verifier_contraintes_groupes(self):
+        """Fréquences par matière et colles par jour, tous groupes à la fois (règles compilées)."""
+        if self._groupes is None:
+            slot_days = self.df["Jour"].tolist() if "Jour" in self.df.columns else [None] * len(self.df)
+            self._groupes = self.rules.check_groups(self.group_matrix(), self.groups, self.weeks, slot_days)
+        return self._groupes
 
-        return erreurs
+    def verifier_contraintes_groupe(self, groupe):
+        return list(self.verifier_contraintes_groupes().get(groupe, []))
 
     # -------------------- CONSÉCUTIVES --------------------
     def _parse_heure_debut(self, heure_str):
@@ -770,6 +554,7 @@ class PlanningAnalyzer:
                 charge[g].append(weekly_counts[g])
         return charge
 
+    @timed("analysis.statistiques_globales")
     def statistiques_globales(self):
         # Calcul des créneaux réellement autorisés (selon contraintes du CSV)
         total_authorized = 0
@@ -858,64 +643,191 @@ class PlanningAnalyzer:
         return count
 
     # -------------------- WRAPPER --------------------
+    @timed("analysis.contraintes")
     def contraintes(self):
         return {
             "globales": self.verifier_contraintes_globales(),
-            "groupes": {g: self.verifier_contraintes_groupe(g) for g in self.groups},
+            "groupes": {g: list(v) for g, v in self.verifier_contraintes_groupes().items()},
             "consecutives": self.verifier_colles_consecutives(),
             "compatibilites_profs": self.verifier_compatibilites_profs()
         }
 
+def resume_contraintes(contraintes):
+    """Résumé (compteurs d'erreurs) des contraintes renvoyées par PlanningAnalyzer.contraintes()."""
+    return {
+        "total_erreurs": (len(contraintes["globales"]) +
+                          sum(len(v) for v in contraintes["groupes"].values()) +
+                          len(contraintes["consecutives"]) +
+                          len(contraintes["compatibilites_profs"])),
+        "globales_ok": len(contraintes["globales"]) == 0,
+        "groupes_ok": all(len(v) == 0 for v in contraintes["groupes"].values()),
+        "consecutives_ok": len(contraintes["consecutives"]) == 0,
+        "compatibilites_profs_ok": len(contraintes["compatibilites_profs"]) == 0,
+    }
+
+def summarize_planning(csv_content, rules=None):
+    """
+    Résumé d'analyse stocké avec un planning enregistré (liste / détail sans ré-analyse):
+    compteurs d'erreurs, charge par groupe, utilisation des créneaux.
+    """
+    analyzer = PlanningAnalyzer(csv_content, rules)
+    contraintes = analyzer.contraintes()
+    resume = resume_contraintes(contraintes)
+    resume.update({
+        "erreurs_globales": len(contraintes["globales"]),
+        "erreurs_groupes": sum(len(v) for v in contraintes["groupes"].values()),
+        "erreurs_consecutives": len(contraintes["consecutives"]),
+        "erreurs_compatibilites_profs": len(contraintes["compatibilites_profs"]),
+    })
+    return {
+        "resume": resume,
+        # Clés en chaînes: MongoDB n'accepte pas de clés entières
+        "charge_groupes": {str(g): n for g, n in analyzer.stats_groupes().items()},
+        "globales": analyzer.statistiques_globales(),
+    }
+
 # -----------------------
-# API ROUTES
+# Règles de fréquence par classe (backend/frequency_rules.py)
 # -----------------------
-uploaded_csv, generated_planning = None, None
+class FrequencyRule(BaseModel):
+    matiere: str = Field(..., min_length=1)
+    alias: List[str] = []
+    fenetre: int = Field(..., ge=1)          # semaines par fenêtre
+    nombre: int = Field(1, ge=0)             # colles par groupe et par fenêtre
+    type: Literal["exact", "min", "max"] = "exact"
+    rotation: Optional[int] = Field(None, ge=1)  # fenêtres consécutives sans revoir le même prof
+    periode_courte: bool = False
+
+class ClassRules(BaseModel):
+    frequences: List[FrequencyRule] = []
+    max_par_jour: Optional[int] = Field(None, ge=1)
+    min_par_semaine: Optional[int] = Field(None, ge=0)
+    max_par_semaine: Optional[int] = Field(None, ge=1)
+
+def check_class_scope(classe: str, user: Principal):
+    if classe not in user.classes:
+        raise ApiError(403, "Classe hors de votre périmètre")
+
+async def get_class_rules(
+    classe: Optional[str] = Query(None, description="Classe dont les règles de fréquence s'appliquent"),
+    x_workspace_id: Optional[str] = Header(None),
+    user: Principal = Depends(get_current_user),
+) -> Optional[dict]:
+    """
+    Règles de la classe `classe`, sinon de l'espace de travail s'il porte le nom d'une classe de
+    l'utilisateur, sinon de son unique classe. None: règles par défaut (DEFAULT_RULES).
+    """
+    if classe:
+        check_class_scope(classe, user)
+    elif x_workspace_id in user.classes:
+        classe = x_workspace_id
+    elif len(user.classes) == 1:
+        classe = user.classes[0]
+    if not classe or db is None:
+        return None
+    return await repository.find_class_rules(user.lycee or "", classe)
+
+@app.get("/api/classes/{classe}/rules")
+async def get_rules(classe: str, user: Principal = Depends(get_current_user)):
+    check_class_scope(classe, user)
+    rules = await repository.find_class_rules(user.lycee or "", classe) if db is not None else None
+    return {"classe": classe, "default": rules is None, "rules": rules or DEFAULT_RULES}
+
+@app.put("/api/classes/{classe}/rules")
+async def put_rules(classe: str, rules: ClassRules, user: Principal = Depends(get_current_user)):
+    """Remplace les règles de fréquence de la classe (appliquées aux générations et analyses suivantes)."""
+    check_class_scope(classe, user)
+    if db is None:
+        return JSONResponse(status_code=500, content={"error": "Base de données non initialisée"})
+    spec = rules.dict()
+    error = rules_error(spec)
+    if error:
+        return JSONResponse(status_code=400, content={"error": error})
+    await repository.save_class_rules(user.lycee or "", classe, spec, user.email)
+    return {"classe": classe, "default": False, "rules": spec}
+
+@app.delete("/api/classes/{classe}/rules")
+async def delete_rules(classe: str, user: Principal = Depends(get_current_user)):
+    """Retour aux règles par défaut."""
+    check_class_scope(classe, user)
+    if db is None:
+        return JSONResponse(status_code=500, content={"error": "Base de données non initialisée"})
+    await repository.delete_class_rules(user.lycee or "", classe)
+    return {"classe": classe, "default": True, "rules": DEFAULT_RULES}
 
+# -----------------------
+# API ROUTES
+# -----------------------
 @app.post("/api/upload_csv")
-async def upload_csv(file: UploadFile = File(...), user: UserInDB = Depends(get_current_user)):
-    global uploaded_csv
+async def upload_csv(file: UploadFile = File(...), session: UserSession = Depends(get_session)):
     content = await file.read()
     decoded=content.decode("utf-8")
-    uploaded_csv=decoded
+    await session.set("uploaded_csv", decoded)
     reader=csv.reader(io.StringIO(decoded),delimiter=';')
     rows=list(reader)
     return {"header":rows[0],"preview":rows[1:6]}
 
+def log_generation(session: UserSession, source: str, attempts, success: bool, phases: Optional[dict] = None) -> dict:
+    """Télémétrie agrégée d'une génération, écrite en JSON dans les logs."""
+    telemetry = generation_telemetry(attempts, phases)
+    log_json("planning_generation", user=session.user, workspace=session.workspace,
+             source=source, success=success, **telemetry)
+    return telemetry
+
+async def store_generated_planning(session: UserSession, csv_content: str, telemetry: dict):
+    """Planning généré + sa télémétrie (enregistrée avec le planning à la sauvegarde)."""
+    await session.set("generated_planning", csv_content)
+    await session.set("generated_telemetry", json.dumps(telemetry))
+
 @app.post("/api/generate_planning")
-async def generate_planning(user: UserInDB = Depends(get_current_user)):
-    global uploaded_csv, generated_planning
+async def generate_planning(
+    session: UserSession = Depends(get_session),
+    accept: Optional[str] = Header(None),
+    avoid_conflicts: bool = Query(False, description="Interdit les créneaux où le colleur est pris dans un autre planning du lycée"),
+    parent_id: Optional[str] = Query(None, description="Planning enregistré remplacé (ses créneaux restent libres)"),
+    user: Principal = Depends(get_current_user),
+    rules: Optional[dict] = Depends(get_class_rules),
+):
+    uploaded_csv = await session.get("uploaded_csv")
     if not uploaded_csv: 
         return JSONResponse(status_code=400, content={"error":"Aucun fichier CSV uploadé."})
 
-    # Essai 1: mode strict
-    print("[INFO] Tentative mode strict...")
-    df_result, message = generate_planning_with_ortools(uploaded_csv, mode="strict")
-    
+    busy = None
+    if avoid_conflicts and db is not None:
+        exclude = await lineage_of(parent_id, user)
+        profs = planning_profs(build_matrix(*parse_planning_csv(uploaded_csv))[0])
+        busy = busy_slots(await repository.find_colleur_slots(user.lycee or "", profs, exclude))
+
+    # Essais successifs: strict, puis relaxed, puis maximize (sauvegarde)
+    attempts = []
+    for mode in ("strict", "relaxed", "maximize"):
+        print(f"[INFO] Tentative mode {mode}...")
+        df_result, message, telemetry = await solver_pool.run(
+            "generate_planning_with_ortools", uploaded_csv, mode=mode, busy=busy, rules=rules
+        )
+        attempts.append(telemetry)
+        if df_result is not None:
+            break
+    telemetry = log_generation(session, "csv", attempts, success=df_result is not None)
     if df_result is None:
-        # Essai 2: mode relaxed
-        print("[INFO] Échec mode strict, tentative mode relaxed...")
-        df_result, message = generate_planning_with_ortools(uploaded_csv, mode="relaxed")
-        
-        if df_result is None:
-            # Essai 3: mode maximize (sauvegarde)
-            print("[INFO] Échec mode relaxed, tentative mode maximize...")
-            df_result, message = generate_planning_with_ortools(uploaded_csv, mode="maximize")
-            
-            if df_result is None:
-                return JSONResponse(status_code=400, content={"error": "Impossible de générer un planning même en mode sauvegarde"})
+        return JSONResponse(
+            status_code=400,
+            content={"error": "Impossible de générer un planning même en mode sauvegarde", "telemetry": telemetry}
+        )
 
     output=io.StringIO()
     df_result.to_csv(output,sep=';',index=False)
-    generated_planning=output.getvalue()
-    
-    return {
-        "header": df_result.columns.tolist(),
-        "rows": df_result.values.tolist(),
-        "message": message
-    }
+    await store_generated_planning(session, output.getvalue(), telemetry)
+
+    header, rows = parse_planning_csv(output.getvalue())
+    return planning_response(accept, header, rows, extra={"message": message, "telemetry": telemetry})
 
 @app.post("/api/analyse_planning")
-async def analyse_planning(file: UploadFile = File(...), user: UserInDB = Depends(get_current_user)):
+async def analyse_planning(
+    file: UploadFile = File(...),
+    user: Principal = Depends(get_current_user),
+    rules: Optional[dict] = Depends(get_class_rules),
+):
     """
     Attend un upload CSV via form-data: clé "file"
     """
@@ -924,7 +836,7 @@ async def analyse_planning(file: UploadFile = File(...), user: UserInDB = Depend
 
     try:
         content = (await file.read()).decode("utf-8")
-        analyzer = PlanningAnalyzer(content)
+        analyzer = PlanningAnalyzer(content, rules)
 
         stats = {
             "groupes": analyzer.stats_groupes(),
@@ -936,16 +848,7 @@ async def analyse_planning(file: UploadFile = File(...), user: UserInDB = Depend
 
         contraintes = analyzer.contraintes()
 
-        resume = {
-            "total_erreurs": (len(contraintes["globales"]) +
-                              sum(len(v) for v in contraintes["groupes"].values()) +
-                              len(contraintes["consecutives"]) +
-                              len(contraintes["compatibilites_profs"])),
-            "globales_ok": len(contraintes["globales"]) == 0,
-            "groupes_ok": all(len(v) == 0 for v in contraintes["groupes"].values()),
-            "consecutives_ok": len(contraintes["consecutives"]) == 0,
-            "compatibilites_profs_ok": len(contraintes["compatibilites_profs"]) == 0,
-        }
+        resume = resume_contraintes(contraintes)
 
         return {
             "resume": resume,
@@ -957,16 +860,26 @@ async def analyse_planning(file: UploadFile = File(...), user: UserInDB = Depend
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
 @app.get("/api/analyse_planning_generated")
-def analyse_planning_generated(user: UserInDB = Depends(get_current_user)):
+def analyse_planning_generated(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    generated_planning: Optional[str] = Depends(get_generated_planning),
+    rules: Optional[dict] = Depends(get_class_rules),
+):
     """
     Analyse le planning généré en mémoire (sans upload de fichier)
     """
-    global generated_planning
     if not generated_planning:
         return JSONResponse(status_code=400, content={"error": "Aucun planning généré."})
 
+    # Même planning et mêmes règles => même analyse: pas de recalcul si le client l'a déjà
+    etag = make_etag(content_hash(generated_planning + json.dumps(rules, sort_keys=True)), "analyse")
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, CACHE_CONTROL_REVALIDATE)
+    response.headers.update(cache_headers(etag, CACHE_CONTROL_REVALIDATE))
+
     try:
-        analyzer = PlanningAnalyzer(generated_planning)
+        analyzer = PlanningAnalyzer(generated_planning, rules)
 
         stats = {
             "groupes": analyzer.stats_groupes(),
@@ -978,16 +891,7 @@ def analyse_planning_generated(user: UserInDB = Depends(get_current_user)):
 
         contraintes = analyzer.contraintes()
 
-        resume = {
-            "total_erreurs": (len(contraintes["globales"]) +
-                              sum(len(v) for v in contraintes["groupes"].values()) +
-                              len(contraintes["consecutives"]) +
-                              len(contraintes["compatibilites_profs"])),
-            "globales_ok": len(contraintes["globales"]) == 0,
-            "groupes_ok": all(len(v) == 0 for v in contraintes["groupes"].values()),
-            "consecutives_ok": len(contraintes["consecutives"]) == 0,
-            "compatibilites_profs_ok": len(contraintes["compatibilites_profs"]) == 0,
-        }
+        resume = resume_contraintes(contraintes)
 
         return {
             "resume": resume,
@@ -999,8 +903,7 @@ def analyse_planning_generated(user: UserInDB = Depends(get_current_user)):
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
 @app.get("/api/get_groups")
-def get_groups(user: UserInDB = Depends(get_current_user)):
-    global generated_planning
+def get_groups(generated_planning: Optional[str] = Depends(get_generated_planning)):
     if not generated_planning: 
         return JSONResponse(status_code=400, content={"error":"Aucun planning généré."})
     
@@ -1008,8 +911,7 @@ def get_groups(user: UserInDB = Depends(get_current_user)):
     return {"groups":analyzer.groups}
 
 @app.get("/api/group_details/{groupe_id}")
-def group_details(groupe_id: int, user: UserInDB = Depends(get_current_user)):
-    global generated_planning
+def group_details(groupe_id: int, generated_planning: Optional[str] = Depends(get_generated_planning)):
     if not generated_planning:
         return JSONResponse(status_code=400, content={"error": "Aucun planning généré."})
 
@@ -1059,132 +961,538 @@ def group_details(groupe_id: int, user: UserInDB = Depends(get_current_user)):
         )
 
 @app.get("/api/download_planning")
-async def download_planning(format: str = Query("csv", enum=["csv", "excel"]), user: UserInDB = Depends(get_current_user)):
-    global generated_planning
+async def download_planning(
+    format: str = Query("csv", enum=["csv", "excel"]),
+    if_none_match: Optional[str] = Header(None),
+    generated_planning: Optional[str] = Depends(get_generated_planning),
+):
     if not generated_planning:
         return JSONResponse(status_code=400, content={"error": "Aucun planning généré."})
-    
-    df = pd.read_csv(io.StringIO(generated_planning), sep=';')
-    
+
+    etag = make_etag(content_hash(generated_planning), format)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, CACHE_CONTROL_REVALIDATE)
+    headers = cache_headers(etag, CACHE_CONTROL_REVALIDATE)
+
     if format == "excel":
-        out = io.BytesIO()
+        import pandas as pd
+        df = pd.read_csv(io.StringIO(generated_planning), sep=';')
         out = export_excel_with_style(df)
         out.seek(0)
         return StreamingResponse(
             out,
             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": "attachment; filename=planning_optimise.xlsx"}
+            headers={"Content-Disposition": "attachment; filename=planning_optimise.xlsx", **headers}
         )
     else:  # CSV par défaut
         return StreamingResponse(
             io.StringIO(generated_planning),
             media_type="text/csv",
-            headers={"Content-Disposition": "attachment; filename=planning_optimise.csv"}
+            headers={"Content-Disposition": "attachment; filename=planning_optimise.csv", **headers}
         )
 
+# -----------------------
+# Saisie par formulaire (SaisiePage)
+# -----------------------
+CSV_BASE_COLUMNS = [
+    'Matière', 'Prof', 'Jour', 'Heure',
+    'Groupes possibles semaine paire', 'Groupes possibles semaine impaire',
+    'Travaille les semaines paires', 'Travaille les semaines impaires'
+]
+
+class GroupRange(BaseModel):
+    min: int = 1
+    max: int = 15
+
+class ProfesseurForm(BaseModel):
+    nom: str = ''
+    matieres: list[str] = []
+    travaillePaires: bool = True
+    travailleImpaires: bool = True
+
+class CreneauForm(BaseModel):
+    matiere: str = ''
+    professeur: str = ''
+    jour: str = ''
+    heure: str = ''
+    groupesPaires: GroupRange = GroupRange()
+    groupesImpaires: GroupRange = GroupRange()
+
+class PlanningForm(BaseModel):
+    semaines: list[int] = []
+    nombreGroupes: Optional[int] = None
+    professeurs: list[ProfesseurForm] = []
+    creneaux: list[CreneauForm] = []
+
+class FormCompileError(Exception):
+    """Erreurs de saisie, au même format que les erreurs de validation FastAPI (loc/msg/type)."""
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} erreur(s) dans le formulaire")
+        self.errors = errors
+
+def compile_form(form: PlanningForm):
+    """
+    Compile le formulaire directement en structures du solveur (sans passer par un CSV).
+    Retourne un dict: slots, groups, weeks_str, weeks_int, rows (colonnes descriptives par créneau).
+    Lève FormCompileError avec une erreur par champ invalide.
+    """
+    errors = []
+
+    def err(loc, msg, type_="value_error"):
+        errors.append({"loc": ["body", *loc], "msg": msg, "type": type_})
+
+    if not form.semaines:
+        err(["semaines"], "Au moins une semaine est requise")
+    weeks_int = []
+    for i, w in enumerate(form.semaines):
+        if w in weeks_int:
+            err(["semaines", i], f"Semaine {w} en double")
+        else:
+            weeks_int.append(w)
+    weeks_str = [str(w) for w in weeks_int]
+
+    # Index des professeurs par nom (au lieu d'un parcours linéaire par créneau)
+    prof_index = {}
+    for i, prof in enumerate(form.professeurs):
+        nom = prof.nom.strip()
+        if not nom:
+            err(["professeurs", i, "nom"], "Nom du professeur manquant")
+        elif nom in prof_index:
+            err(["professeurs", i, "nom"], f"Professeur {nom} déclaré deux fois")
+        else:
+            prof_index[nom] = prof
+
+    if not form.creneaux:
+        err(["creneaux"], "Au moins un créneau est requis")
+
+    slots, rows, all_groups = [], [], set()
+    for i, creneau in enumerate(form.creneaux):
+        loc = ["creneaux", i]
+        nom = creneau.professeur.strip()
+        prof = prof_index.get(nom)
+        if prof is None:
+            err([*loc, "professeur"], f"Professeur inconnu: {creneau.professeur!r}")
+        matiere = creneau.matiere.strip()
+        if not matiere:
+            err([*loc, "matiere"], "Matière manquante")
+        jour = creneau.jour.strip()
+        if not jour:
+            err([*loc, "jour"], "Jour manquant")
+        heure = creneau.heure.replace(' ', '').strip()
+        try:
+            debut, fin = parse_hhmm_range_to_minutes(heure)
+            if fin <= debut:
+                err([*loc, "heure"], f"Plage horaire invalide: {creneau.heure!r}")
+        except (ValueError, TypeError):
+            err([*loc, "heure"], f"Format d'heure invalide: {creneau.heure!r} (attendu ex: 17h-18h)")
+        for champ in ("groupesPaires", "groupesImpaires"):
+            r = getattr(creneau, champ)
+            if r.min < 1:
+                err([*loc, champ, "min"], "Le premier groupe doit être >= 1")
+            if r.max < r.min:
+                err([*loc, champ, "max"], "Le dernier groupe doit être >= au premier")
+        if prof is None:
+            continue
+
+        even = list(range(creneau.groupesPaires.min, creneau.groupesPaires.max + 1))
+        odd = list(range(creneau.groupesImpaires.min, creneau.groupesImpaires.max + 1))
+        all_groups.update(even)
+        all_groups.update(odd)
+        slots.append(dict(
+            mat=matiere,
+            prof=nom,
+            day=jour,
+            hour=heure,
+            even=even,
+            odd=odd,
+            works_even=prof.travaillePaires,
+            works_odd=prof.travailleImpaires
+        ))
+        rows.append([
+            matiere,
+            nom,
+            jour,
+            heure,
+            f"{creneau.groupesPaires.min} à {creneau.groupesPaires.max}",
+            f"{creneau.groupesImpaires.min} à {creneau.groupesImpaires.max}",
+            'Oui' if prof.travaillePaires else 'Non',
+            'Oui' if prof.travailleImpaires else 'Non'
+        ])
+
+    if errors:
+        raise FormCompileError(errors)
+
+    return {
+        "slots": slots,
+        "groups": sorted(all_groups),
+        "weeks_str": weeks_str,
+        "weeks_int": weeks_int,
+        "rows": rows,
+    }
+
 @app.post("/api/generate_from_form")
-async def generate_from_form(form_data: dict, user: UserInDB = Depends(get_current_user)):
+async def generate_from_form(
+    form: PlanningForm,
+    session: UserSession = Depends(get_session),
+    accept: Optional[str] = Header(None),
+    rules: Optional[dict] = Depends(get_class_rules),
+):
     """
     Génère un planning à partir des données du formulaire de saisie
     """
-    global generated_planning
-    
+    started = time.perf_counter()
+    try:
+        compiled = compile_form(form)
+    except FormCompileError as e:
+        return JSONResponse(status_code=422, content={"detail": e.errors})
+    phases = {"form_compile": round(time.perf_counter() - started, 6)}
+
     try:
-        # Convertir les données du formulaire en CSV
-        csv_content = convert_form_to_csv(form_data)
-        
         # Générer le planning avec OR-Tools (essai des 3 modes)
-        print("[INFO] Tentative mode strict...")
-        df_result, message = generate_planning_with_ortools(csv_content, mode="strict")
-        
-        if df_result is None:
-            print("[INFO] Échec mode strict, tentative mode relaxed...")
-            df_result, message = generate_planning_with_ortools(csv_content, mode="relaxed")
-            
-            if df_result is None:
-                print("[INFO] Échec mode relaxed, tentative mode maximize...")
-                df_result, message = generate_planning_with_ortools(csv_content, mode="maximize")
-                
-                if df_result is None:
-                    return JSONResponse(
-                        status_code=400, 
-                        content={"error": "Impossible de générer un planning avec les contraintes données"}
-                    )
+        columns = None
+        attempts = []
+        for mode in ("strict", "relaxed", "maximize"):
+            print(f"[INFO] Tentative mode {mode}...")
+            columns, telemetry = await solver_pool.run(
+                "solve_slots_with_telemetry", compiled["slots"], compiled["groups"],
+                compiled["weeks_str"], compiled["weeks_int"], mode, rules=rules
+            )
+            attempts.append(telemetry)
+            if columns is not None:
+                break
+        telemetry = log_generation(session, "form", attempts, success=columns is not None, phases=phases)
+        if columns is None:
+            return JSONResponse(
+                status_code=400,
+                content={"error": "Impossible de générer un planning avec les contraintes données", "telemetry": telemetry}
+            )
+
+        header = CSV_BASE_COLUMNS + compiled["weeks_str"]
+        rows = [
+            prefix + [columns[w][s] for w in compiled["weeks_str"]]
+            for s, prefix in enumerate(compiled["rows"])
+        ]
 
         # Sauvegarder le planning généré
-        output = io.StringIO()
-        df_result.to_csv(output, sep=';', index=False)
-        generated_planning = output.getvalue()
-        
-        return {
-            "header": df_result.columns.tolist(),
-            "rows": df_result.values.tolist(),
-            "message": message + " (généré depuis le formulaire)"
-        }
-        
+        await store_generated_planning(session, planning_rows_to_csv(header, rows), telemetry)
+
+        return planning_response(
+            accept, header, rows,
+            extra={"message": MODE_MESSAGES[mode] + " (généré depuis le formulaire)", "telemetry": telemetry}
+        )
+
     except Exception as e:
         return JSONResponse(
             status_code=500,
             content={"error": f"Erreur lors de la génération: {str(e)}"}
         )
 
-def convert_form_to_csv(form_data):
+# -----------------------
+# Génération conjointe de plusieurs classes
+# -----------------------
+async def generate_component(names, class_csvs, rules_by_class):
+    """Essais strict -> relaxed -> maximize pour un groupe de classes liées par leurs colleurs."""
+    attempts = []
+    for mode in ("strict", "relaxed", "maximize"):
+        print(f"[INFO] Tentative mode {mode} ({', '.join(names)})...")
+        plannings, message, telemetry = await solver_pool.run(
+            "generate_batch_with_ortools", {n: class_csvs[n] for n in names}, mode=mode,
+            rules_by_class={n: rules_by_class[n] for n in names if rules_by_class.get(n)},
+        )
+        attempts.append(telemetry)
+        if plannings is not None:
+            return plannings, message, attempts
+    return None, message, attempts
+
+@app.post("/api/generate_batch")
+async def generate_batch(
+    files: List[UploadFile] = File(...),
+    classes: Optional[List[str]] = Form(None),
+    user: Principal = Depends(get_current_user),
+):
     """
-    Convertit les données du formulaire en format CSV équivalent
+    Génère en une fois les plannings de plusieurs classes (un CSV par classe, champ `files`), en
+    évitant qu'un colleur commun ait deux colles au même créneau. Noms des classes: champ `classes`
+    (même ordre que les fichiers), sinon nom du fichier sans extension.
+    Les classes sans colleur commun sont résolues séparément, en parallèle dans le pool du solveur.
+    Chaque planning est rangé dans l'espace de travail de sa classe (en-tête X-Workspace-Id: <classe>
+    pour l'analyser, le télécharger ou l'enregistrer ensuite).
     """
-    semaines = form_data.get('semaines', [])
-    professeurs = form_data.get('professeurs', [])
-    creneaux = form_data.get('creneaux', [])
-    
-    # Créer les en-têtes
-    headers = [
-        'Matière', 'Prof', 'Jour', 'Heure',
-        'Groupes possibles semaine paire', 'Groupes possibles semaine impaire',
-        'Travaille les semaines paires', 'Travaille les semaines impaires'
-    ] + [str(s) for s in semaines]
-    
-    # Créer les lignes de données
-    rows = []
-    for creneau in creneaux:
-        # Trouver le professeur correspondant
-        prof_info = None
-        for prof in professeurs:
-            if prof.get('nom') == creneau.get('professeur'):
-                prof_info = prof
-                break
-        
-        if not prof_info:
+    names = classes or [os.path.splitext(f.filename or "")[0] for f in files]
+    if len(names) != len(files):
+        return JSONResponse(status_code=400, content={"error": "Un nom de classe par fichier"})
+    if any(not n for n in names) or len(set(names)) != len(names):
+        return JSONResponse(status_code=400, content={"error": "Noms de classes vides ou en double"})
+
+    class_csvs, profs_by_class = {}, {}
+    for name, f in zip(names, files):
+        content = (await f.read()).decode("utf-8")
+        header, rows = parse_planning_csv(content)
+        if "Prof" not in header:
+            return JSONResponse(status_code=400, content={"error": f"{name}: colonne Prof absente"})
+        prof_col = header.index("Prof")
+        class_csvs[name] = content
+        profs_by_class[name] = {row[prof_col] for row in rows}
+
+    # Règles de fréquence de chaque classe du périmètre (défaut pour les autres noms)
+    rules_by_class = {}
+    if db is not None:
+        for name in names:
+            if name in user.classes:
+                rules_by_class[name] = await repository.find_class_rules(user.lycee or "", name)
+
+    components = class_components(profs_by_class)
+    results = await asyncio.gather(*(generate_component(c, class_csvs, rules_by_class) for c in components))
+
+    plannings, errors, telemetries = {}, {}, []
+    for index, (names_c, (dfs, message, attempts)) in enumerate(zip(components, results)):
+        first = session_store.for_user(user.email, names_c[0])
+        telemetry = log_generation(first, "batch", attempts, success=dfs is not None)
+        telemetries.append({"classes": names_c, **telemetry})
+        if dfs is None:
+            for name in names_c:
+                errors[name] = message
             continue
-            
-        # Formater les plages de groupes
-        groupes_paires = f"{creneau.get('groupesPaires', {}).get('min', 1)} à {creneau.get('groupesPaires', {}).get('max', 15)}"
-        groupes_impaires = f"{creneau.get('groupesImpaires', {}).get('min', 1)} à {creneau.get('groupesImpaires', {}).get('max', 15)}"
-        
-        # Ligne de données
-        row = [
-            creneau.get('matiere', ''),
-            creneau.get('professeur', ''),
-            creneau.get('jour', ''),
-            creneau.get('heure', ''),
-            groupes_paires,
-            groupes_impaires,
-            'Oui' if prof_info.get('travaillePaires', True) else 'Non',
-            'Oui' if prof_info.get('travailleImpaires', True) else 'Non'
-        ] + [''] * len(semaines)  # Colonnes semaines vides initialement
-        
-        rows.append(row)
-    
-    # Créer le CSV
-    csv_content = ';'.join(headers) + '\n'
-    for row in rows:
-        csv_content += ';'.join(str(cell) for cell in row) + '\n'
-    
-    return csv_content
+        for name in names_c:
+            output = io.StringIO()
+            dfs[name].to_csv(output, sep=';', index=False)
+            await store_generated_planning(session_store.for_user(user.email, name), output.getvalue(), telemetry)
+            header, rows = parse_planning_csv(output.getvalue())
+            plannings[name] = {"header": header, "rows": rows, "message": message, "component": index}
+
+    content = {"components": components, "plannings": plannings, "errors": errors, "telemetry": telemetries}
+    if not plannings:
+        return JSONResponse(status_code=400, content={
+            "error": "Impossible de générer les plannings même en mode sauvegarde", **content
+        })
+    return content
+
+# -----------------------
+# Plusieurs plannings au choix
+# -----------------------
+@app.post("/api/generate_alternatives")
+async def generate_alternatives(
+    k: int = Query(3, ge=1, le=10),
+    min_distance: Optional[int] = Query(None, ge=1),
+    session: UserSession = Depends(get_session),
+    rules: Optional[dict] = Depends(get_class_rules),
+):
+    """
+    Jusqu'à `k` plannings différant deux à deux d'au moins `min_distance` cases, obtenus dans une même
+    session de résolution (premier mode faisable parmi strict, relaxed, maximize), chacun avec son résumé
+    d'analyse. Le premier devient le planning généré ; POST /api/alternatives/{index}/select en choisit un autre.
+    """
+    uploaded_csv = await session.get("uploaded_csv")
+    if not uploaded_csv:
+        return JSONResponse(status_code=400, content={"error": "Aucun fichier CSV uploadé."})
+
+    attempts = []
+    for mode in ("strict", "relaxed", "maximize"):
+        print(f"[INFO] Tentative mode {mode} ({k} plannings)...")
+        plannings, message, telemetry = await solver_pool.run(
+            "generate_planning_alternatives", uploaded_csv, mode=mode, k=k, min_distance=min_distance, rules=rules
+        )
+        attempts.append(telemetry)
+        if plannings:
+            break
+    telemetry = log_generation(session, "alternatives", attempts, success=bool(plannings))
+    if not plannings:
+        return JSONResponse(
+            status_code=400,
+            content={"error": "Impossible de générer un planning même en mode sauvegarde", "telemetry": telemetry}
+        )
+
+    csvs = []
+    for df in plannings:
+        output = io.StringIO()
+        df.to_csv(output, sep=';', index=False)
+        csvs.append(output.getvalue())
+    summaries = await asyncio.gather(*(asyncio.to_thread(summarize_planning, c, rules) for c in csvs))
+    await session.set("generated_alternatives", json.dumps(csvs))
+    await store_generated_planning(session, csvs[0], telemetry)
+
+    distances = attempts[-1]["solver"].get("distances", [])
+    alternatives = []
+    for i, (content, summary) in enumerate(zip(csvs, summaries)):
+        header, rows = parse_planning_csv(content)
+        alternatives.append({
+            "index": i,
+            "header": header,
+            "rows": rows,
+            "summary": summary,
+            "objective": attempts[-1]["solver"]["alternatives"][i].get("objective"),
+            "distances": distances[i] if i < len(distances) else [],
+        })
+    return {"message": message, "mode": mode, "alternatives": alternatives, "telemetry": telemetry}
+
+@app.post("/api/alternatives/{index}/select")
+async def select_alternative(index: int, session: UserSession = Depends(get_session)):
+    """Le planning `index` de la dernière génération multiple devient le planning généré."""
+    stored = await session.get("generated_alternatives")
+    csvs = json.loads(stored) if stored else []
+    if not 0 <= index < len(csvs):
+        return JSONResponse(status_code=404, content={"error": "Planning introuvable"})
+    await session.set("generated_planning", csvs[index])
+    header, rows = parse_planning_csv(csvs[index])
+    return {"index": index, "header": header, "rows": rows}
+
+# -----------------------
+# Scénarios « et si »
+# -----------------------
+SCENARIOS_MAX = int(os.getenv("SCENARIOS_MAX", "20"))
+BASE_SCENARIO = "référence"
+
+class SlotFields(BaseModel):
+    matiere: Optional[str] = None
+    prof: Optional[str] = None
+    jour: Optional[str] = None
+    heure: Optional[str] = None
+    groupes_paire: Optional[str] = None
+    groupes_impaire: Optional[str] = None
+    travaille_paires: Optional[bool] = None
+    travaille_impaires: Optional[bool] = None
+
+class ScenarioPatch(BaseModel):
+    op: Literal["add_slot", "remove_slots", "modify_slots"]
+    match: Optional[SlotFields] = None
+    set: Optional[SlotFields] = None
+
+class Scenario(BaseModel):
+    name: str
+    patches: List[ScenarioPatch] = []
+
+class ScenarioRequest(BaseModel):
+    csv: Optional[str] = None   # défaut: CSV uploadé dans l'espace de travail
+    scenarios: List[Scenario]
+    modes: List[Literal["strict", "relaxed", "maximize"]] = ["strict", "relaxed", "maximize"]
+
+def planning_with_columns(header, rows, columns):
+    """Lignes du planning avec les colonnes semaines remplies par le solveur."""
+    weeks = [(j, header[j].strip()) for j in week_column_indexes(header)]
+    filled = []
+    for s, row in enumerate(rows):
+        row = list(row)
+        for j, w in weeks:
+            row[j] = columns[w][s]
+        filled.append(row)
+    return filled
+
+@app.post("/api/scenarios")
+async def evaluate_scenarios(
+    req: ScenarioRequest,
+    session: UserSession = Depends(get_session),
+    rules: Optional[dict] = Depends(get_class_rules),
+):
+    """
+    Compare des variantes de l'entrée (patchs sur les créneaux, voir backend/scenarios.py) : chaque
+    variante est résolue dans chaque mode demandé, toutes en parallèle dans le pool du solveur, puis la
+    meilleure solution (premier mode faisable) est analysée. La référence (sans patch) est incluse.
+    """
+    started = time.perf_counter()
+    base_csv = req.csv or await session.get("uploaded_csv")
+    if not base_csv:
+        return JSONResponse(status_code=400, content={"error": "Aucun fichier CSV uploadé."})
+    if not req.scenarios or len(req.scenarios) > SCENARIOS_MAX:
+        return JSONResponse(status_code=400, content={"error": f"Entre 1 et {SCENARIOS_MAX} scénarios"})
+    names = [BASE_SCENARIO] + [sc.name for sc in req.scenarios]
+    if len(set(names)) != len(names):
+        return JSONResponse(status_code=400, content={"error": "Noms de scénarios en double"})
+    if not req.modes:
+        return JSONResponse(status_code=400, content={"error": "Au moins un mode"})
+
+    # Base lue une fois, chaque scénario en dérive ses lignes et ses créneaux
+    header, base_rows = parse_planning_csv(base_csv)
+    variants = []
+    for name, patches in [(BASE_SCENARIO, [])] + [(sc.name, sc.patches) for sc in req.scenarios]:
+        try:
+            rows, touched = apply_patches(header, base_rows, [p.dict() for p in patches])
+            inputs = slot_input_from_rows(header, rows)
+        except PatchError as e:
+            return JSONResponse(status_code=400, content={"error": f"{name}: {e}"})
+        except (KeyError, ValueError) as e:
+            return JSONResponse(status_code=400, content={"error": f"{name}: entrée invalide ({e})"})
+        variants.append({"name": name, "rows": rows, "touched": touched, "inputs": inputs})
+
+    runs = [(v, mode) for v in variants for mode in req.modes]
+    results = await asyncio.gather(*(
+        solver_pool.run("solve_slots_with_telemetry", *v["inputs"], mode, rules=rules) for v, mode in runs
+    ))
+    for (v, mode), (columns, telemetry) in zip(runs, results):
+        v.setdefault("modes", {})[mode] = (columns, telemetry)
+
+    async def analyse(v):
+        kept = next((m for m in req.modes if v["modes"][m][0] is not None), None)
+        if kept is None:
+            return kept, None
+        rows = planning_with_columns(header, v["rows"], v["modes"][kept][0])
+        return kept, await asyncio.to_thread(summarize_planning, planning_rows_to_csv(header, rows), rules)
+
+    analyses = await asyncio.gather(*(analyse(v) for v in variants))
+
+    table = []
+    for v, (kept, summary) in zip(variants, analyses):
+        slots, groups, weeks_str, _ = v["inputs"]
+        modes = {}
+        for mode, (columns, telemetry) in v["modes"].items():
+            modes[mode] = {
+                "feasible": columns is not None,
+                "status": telemetry["solver"].get("status"),
+                "solve_seconds": telemetry["phases"].get("solve"),
+                "colles": colle_counts(slots, columns)["total"] if columns is not None else None,
+            }
+        table.append({
+            "name": v["name"],
+            "patches": v["touched"],
+            "slots": len(slots),
+            "groups": len(groups),
+            "weeks": len(weeks_str),
+            "modes": modes,
+            "mode": kept,
+            "colles": colle_counts(slots, v["modes"][kept][0]) if kept else None,
+            "violations": summary["resume"] if summary else None,
+            "utilisation": summary["globales"] if summary else None,
+        })
+    return {"scenarios": table, "elapsed_seconds": round(time.perf_counter() - started, 6)}
 
 @app.get("/api/hello")
 def hello():
     return {"message":"Backend Planning Colles avec OR-Tools (semaines dynamiques)"}
 
+# -----------------------
+# Santé (sondes liveness / readiness)
+# -----------------------
+HEALTH_MONGO_TIMEOUT_SECONDS = float(os.getenv("HEALTH_MONGO_TIMEOUT_SECONDS", "2"))
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Métriques Prometheus (latences par route, solveur, caches, MongoDB, mémoire du process)."""
+    content, media_type = metrics_payload()
+    return Response(content=content, media_type=media_type)
+
+@app.get("/api/health/live")
+def health_live():
+    """Le process répond: ne dépend ni de MongoDB ni du solveur."""
+    return {"status": "ok"}
+
+@app.get("/api/health/ready")
+async def health_ready():
+    """Prêt à recevoir du trafic: initialisation terminée, MongoDB joignable (si configurée), solveur préchauffé."""
+    checks = {
+        "startup": "ok" if app.state.startup_done else (app.state.startup_error or "en cours"),
+        "solver": solver_pool.status(),
+    }
+    if db is None:
+        checks["mongodb"] = "non configuré"
+    else:
+        try:
+            await asyncio.wait_for(db.command("ping"), HEALTH_MONGO_TIMEOUT_SECONDS)
+            checks["mongodb"] = "ok"
+        except Exception as e:
+            checks["mongodb"] = f"injoignable: {e.__class__.__name__}"
+    # Sans MONGODB_URI l'application fonctionne sans base: seule une base configurée et injoignable bloque
+    ready = checks["startup"] == "ok" and checks["mongodb"] in ("ok", "non configuré") and solver_pool.warm
+    return JSONResponse(status_code=200 if ready else 503, content={"status": "ready" if ready else "not_ready", **checks})
+
 # -----------------------
 # Persistence des plannings (MongoDB)
 # -----------------------
@@ -1195,110 +1503,437 @@ def _safe_object_id(oid: str) -> ObjectId:
     except Exception:
         raise HTTPException(status_code=400, detail="Identifiant invalide")
 
+# Une version sur PLANNING_SNAPSHOT_EVERY (au plus) est stockée en entier, les autres en delta
+PLANNING_SNAPSHOT_EVERY = int(os.getenv("PLANNING_SNAPSHOT_EVERY", "10"))
+
 @app.post("/api/plannings/save")
-async def save_planning(name: str = Query(None), user: UserInDB = Depends(get_current_user)):
-    global generated_planning
+async def save_planning(
+    name: str = Query(None),
+    parent_id: Optional[str] = Query(None),
+    user: Principal = Depends(get_current_user),
+    session: UserSession = Depends(get_session),
+    generated_planning: Optional[str] = Depends(get_generated_planning),
+    rules: Optional[dict] = Depends(get_class_rules),
+):
+    """
+    Enregistre le dernier planning généré (avec la télémétrie de sa génération). Avec `parent_id`, il devient une
+    nouvelle version de la même lignée, stockée si possible en delta du parent.
+    """
     if db is None:
         return JSONResponse(status_code=500, content={"error": "Base de données non initialisée"})
     if not generated_planning:
         return JSONResponse(status_code=400, content={"error": "Aucun planning généré à sauvegarder"})
 
     now = datetime.now(timezone.utc)
+    header, rows = parse_planning_csv(generated_planning)
+    payload = encode_planning(header, rows)
     doc = {
+        # Empreinte du contenu complet: ETag des réponses (le planning ne change plus)
+        "content_hash": content_hash(payload),
         "user": user.email,
         "name": name or f"Planning {now.date().isoformat()} {now.strftime('%H:%M')}",
         "created_at": now,
-        "csv_content": generated_planning,
+        # Périmètre dénormalisé: sert au listing et au contrôle d'accès
+        "lycee": user.lycee or "",
+        "classes": user.classes,
     }
-    res = db.plannings.insert_one(doc)
-    return {"id": str(res.inserted_id), "name": doc["name"], "created_at": doc["created_at"].isoformat()}
+    telemetry = await session.get("generated_telemetry")
+    if telemetry:
+        doc["telemetry"] = json.loads(telemetry)
+
+    delta = None
+    if parent_id:
+        parent = await repository.find_planning_in_scope(
+            _safe_object_id(parent_id), user.lycee or "", user.classes, repository.PLANNING_PAYLOAD_PROJECTION
+        )
+        if parent is None:
+            return JSONResponse(status_code=404, content={"error": "Planning parent introuvable"})
+        lineage_id = parent.get("lineage_id", parent["_id"])
+        doc.update({"lineage_id": lineage_id, "parent_id": parent["_id"]})
+        if parent.get("storage") == "delta":
+            chain = list(parent.get("delta_chain", [])) + [parent["_id"]]
+        else:
+            chain = [parent["_id"]]
+        if len(chain) < PLANNING_SNAPSHOT_EVERY:
+            parent_meta, parent_matrix = await repository.load_planning_matrix(parent)
+            meta, matrix = decode_matrix(payload)
+            if same_structure(parent_meta, meta):
+                delta = encode_delta(parent_matrix, matrix)
+                doc["delta_chain"] = chain
+
+    # Analyse faite une fois ici (hors boucle d'événements), relue par la liste et le détail
+    doc["summary"] = await asyncio.to_thread(summarize_planning, generated_planning, rules)
+    if parent_id:
+        inserted_id, doc["version"] = await repository.insert_planning_version(
+            doc, None if delta is not None else payload, delta
+        )
+    else:
+        inserted_id = await repository.insert_planning(doc, None if delta is not None else payload, delta)
+    # Nouvelle dernière version de la lignée: index des colleurs et tableau de bord du lycée
+    await repository.refresh_lineage_views({**doc, "_id": inserted_id}, *decode_matrix(payload))
+    return {
+        "id": str(inserted_id),
+        "name": doc["name"],
+        "created_at": doc["created_at"].isoformat(),
+        "version": doc.get("version", 1),
+    }
+
+PLANNINGS_PAGE_SIZE = 50
 
 @app.get("/api/plannings")
-async def list_plannings(user: UserInDB = Depends(get_current_user)):
+async def list_plannings(
+    limit: int = Query(PLANNINGS_PAGE_SIZE, ge=1, le=200),
+    cursor: Optional[str] = Query(None),
+    user: Principal = Depends(get_current_user),
+):
     if db is None:
         return JSONResponse(status_code=500, content={"error": "Base de données non initialisée"})
-    # On récupère les emails des users du même lycée et ayant au moins une classe en commun
-    user_doc = db.users.find_one({"email": user.email})
-    if not user_doc:
-        return JSONResponse(status_code=404, content={"error": "Utilisateur introuvable"})
-    user_classes = set(user_doc.get("classes", []))
-    user_lycee = user_doc.get("lycee", "")
-    # Trouver tous les utilisateurs du même lycée et au moins une classe en commun
-    allowed_users = set()
-    for u in db.users.find({"lycee": user_lycee}):
-        classes = set(u.get("classes", []))
-        if user_classes & classes:
-            allowed_users.add(u["email"])
-    cursor = db.plannings.find({"user": {"$in": list(allowed_users)}}, {"csv_content": 0}).sort("created_at", -1)
+    # Plannings du même lycée ayant au moins une classe en commun (périmètre stocké sur le planning)
+    try:
+        docs, next_cursor = await repository.list_plannings_page(user.lycee or "", user.classes, limit, cursor)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
     items = []
-    for d in cursor:
+    for d in docs:
         items.append({
             "id": str(d["_id"]),
             "name": d.get("name", "Planning"),
             "user": d.get("user", ""),
             "created_at": d.get("created_at").isoformat() if d.get("created_at") else None,
+            "summary": d.get("summary"),
+            "lineage_id": str(d.get("lineage_id", d["_id"])),
+            "version": d.get("version", 1),
         })
-    return {"items": items}
+    return {"items": items, "page_size": limit, "next_cursor": next_cursor}
+
+class ApiError(Exception):
+    """Erreur métier renvoyée au format {"error": ...} comme le reste de l'API."""
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+@app.exception_handler(ApiError)
+async def api_error_handler(request, exc: ApiError):
+    return JSONResponse(status_code=exc.status_code, content={"error": exc.message})
+
+def accessible_planning(projection: Optional[dict] = None):
+    """
+    Dépendance: charge un planning enregistré si l'utilisateur y a accès
+    (même lycée ET au moins une classe en commun). Une seule requête indexée,
+    le périmètre du demandeur vient du Principal en cache.
+    """
+    async def _dep(planning_id: str, user: Principal = Depends(get_current_user)) -> dict:
+        if db is None:
+            raise ApiError(500, "Base de données non initialisée")
+        oid = _safe_object_id(planning_id)
+        d = await repository.find_planning_in_scope(oid, user.lycee or "", user.classes, projection)
+        if d is None:
+            # Chemin d'échec uniquement: distinguer planning absent / accès refusé
+            if not await repository.planning_exists(oid):
+                raise ApiError(404, "Planning introuvable")
+            raise ApiError(403, "Accès refusé à ce planning")
+        return d
+    return _dep
+
+PLANNING_CONTENT_PROJECTION = {"name": 1, "summary": 1, "telemetry": 1, "content_hash": 1, **repository.PLANNING_PAYLOAD_PROJECTION}
+
+def saved_planning_etag(d: dict, variant: str) -> str:
+    # Anciens documents sans empreinte: l'identifiant suffit, un planning enregistré est immuable
+    return make_etag(d.get("content_hash") or content_hash(str(d["_id"])), variant)
+
+async def load_saved_planning(d: dict):
+    """(header, rows) d'un planning enregistré (snapshot, delta ou ancien format CSV)."""
+    meta, matrix = await repository.load_planning_matrix(d)
+    return rows_from_matrix(meta, matrix)
+
+def planning_dataframe(header, rows):
+    """DataFrame pour l'export Excel: groupes en entiers, cellules vides à None (comme pd.read_csv)."""
+    import pandas as pd
+    def cell(v):
+        try:
+            return int(v)
+        except ValueError:
+            return v if v != '' else None
+    week_cols = set(week_column_indexes(header))
+    return pd.DataFrame(
+        [[cell(v) if j in week_cols else v for j, v in enumerate(row)] for row in rows],
+        columns=header,
+    )
+
+class PlanningWindow:
+    """Fenêtre demandée sur un planning (paramètres de requête communs aux routes de lecture)."""
+    def __init__(
+        self,
+        week_from: Optional[str] = Query(None, description="Première semaine (incluse, ordre du planning)"),
+        week_to: Optional[str] = Query(None, description="Dernière semaine (incluse)"),
+        group: Optional[List[int]] = Query(None, description="Créneaux où l'un de ces groupes passe dans la fenêtre"),
+        prof: Optional[List[str]] = Query(None),
+        matiere: Optional[List[str]] = Query(None),
+        day: Optional[List[str]] = Query(None, description="Jour(s): Lundi, Mardi..."),
+        offset: int = Query(0, ge=0),
+        limit: Optional[int] = Query(None, ge=1),
+    ):
+        self.filters = {
+            "week_from": week_from, "week_to": week_to, "groups": group,
+            "profs": prof, "matieres": matiere, "days": day,
+        }
+        self.offset = offset
+        self.limit = limit
+
+    @property
+    def is_full(self) -> bool:
+        return self.offset == 0 and self.limit is None and not any(self.filters.values())
+
+async def planning_window_response(key: str, load, window: PlanningWindow, accept, extra: dict, headers: dict):
+    """Planning complet, ou fenêtre servie par l'index du planning (construit une fois par contenu)."""
+    if window.is_full:
+        meta, matrix = await load()
+    else:
+        index = await get_planning_index(key, load)
+        try:
+            meta, matrix, info = index.select(**window.filters, offset=window.offset, limit=window.limit)
+        except ValueError as e:
+            raise ApiError(400, str(e))
+        extra = {**extra, **info}
+    return planning_response(accept, meta=meta, matrix=matrix, extra=extra, headers=headers)
 
 @app.get("/api/plannings/{planning_id}")
-async def get_planning(planning_id: str, user: UserInDB = Depends(get_current_user)):
-    if db is None:
-        return JSONResponse(status_code=500, content={"error": "Base de données non initialisée"})
-    d = db.plannings.find_one({"_id": _safe_object_id(planning_id)})
-    if not d:
-        return JSONResponse(status_code=404, content={"error": "Planning introuvable"})
-    # Restriction d'accès : même lycée ET au moins une classe en commun
-    user_doc = db.users.find_one({"email": user.email})
-    if not user_doc:
-        return JSONResponse(status_code=404, content={"error": "Utilisateur introuvable"})
-    user_classes = set(user_doc.get("classes", []))
-    user_lycee = user_doc.get("lycee", "")
-    owner_doc = db.users.find_one({"email": d.get("user")})
-    if not owner_doc:
-        return JSONResponse(status_code=404, content={"error": "Auteur du planning introuvable"})
-    owner_classes = set(owner_doc.get("classes", []))
-    owner_lycee = owner_doc.get("lycee", "")
-    if user_lycee != owner_lycee or not (user_classes & owner_classes):
-        return JSONResponse(status_code=403, content={"error": "Accès refusé à ce planning"})
-    df = pd.read_csv(io.StringIO(d.get("csv_content", "")), sep=';')
-    return {"id": planning_id, "name": d.get("name"), "header": df.columns.tolist(), "rows": df.values.tolist()}
+async def get_planning(
+    planning_id: str,
+    if_none_match: Optional[str] = Header(None),
+    accept: Optional[str] = Header(None),
+    window: PlanningWindow = Depends(),
+    d: dict = Depends(accessible_planning(PLANNING_CONTENT_PROJECTION)),
+):
+    # Une représentation (json, columnar, msgpack) = un ETag ; les filtres font partie de l'URL
+    etag = saved_planning_etag(d, negotiated_format(accept))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, CACHE_CONTROL_IMMUTABLE)
+    return await planning_window_response(
+        d.get("content_hash") or str(d["_id"]), lambda: repository.load_planning_matrix(d), window, accept,
+        extra={"id": planning_id, "name": d.get("name"), "summary": d.get("summary"), "telemetry": d.get("telemetry")},
+        headers={**cache_headers(etag, CACHE_CONTROL_IMMUTABLE), "Vary": "Accept"},
+    )
+
+@app.get("/api/planning_generated")
+async def get_generated_planning_window(
+    if_none_match: Optional[str] = Header(None),
+    accept: Optional[str] = Header(None),
+    window: PlanningWindow = Depends(),
+    generated_planning: Optional[str] = Depends(get_generated_planning),
+):
+    """
+    Planning généré en session, complet ou filtré (semaines, groupes, profs, matières, jour).
+    """
+    if not generated_planning:
+        return JSONResponse(status_code=400, content={"error": "Aucun planning généré."})
+    digest = content_hash(generated_planning)
+    etag = make_etag(digest, negotiated_format(accept))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, CACHE_CONTROL_REVALIDATE)
+
+    async def load():
+        return build_matrix(*parse_planning_csv(generated_planning))
+
+    return await planning_window_response(
+        digest, load, window, accept, extra={},
+        headers={**cache_headers(etag, CACHE_CONTROL_REVALIDATE), "Vary": "Accept"},
+    )
 
 @app.get("/api/plannings/{planning_id}/download")
-async def download_saved_planning(planning_id: str, format: str = Query("csv", enum=["csv", "excel"]), user: UserInDB = Depends(get_current_user)):
-    if db is None:
-        return JSONResponse(status_code=500, content={"error": "Base de données non initialisée"})
-    d = db.plannings.find_one({"_id": _safe_object_id(planning_id)})
-    if not d:
-        return JSONResponse(status_code=404, content={"error": "Planning introuvable"})
-    # Restriction d'accès : même lycée ET au moins une classe en commun
-    user_doc = db.users.find_one({"email": user.email})
-    if not user_doc:
-        return JSONResponse(status_code=404, content={"error": "Utilisateur introuvable"})
-    user_classes = set(user_doc.get("classes", []))
-    user_lycee = user_doc.get("lycee", "")
-    owner_doc = db.users.find_one({"email": d.get("user")})
-    if not owner_doc:
-        return JSONResponse(status_code=404, content={"error": "Auteur du planning introuvable"})
-    owner_classes = set(owner_doc.get("classes", []))
-    owner_lycee = owner_doc.get("lycee", "")
-    if user_lycee != owner_lycee or not (user_classes & owner_classes):
-        return JSONResponse(status_code=403, content={"error": "Accès refusé à ce planning"})
-    csv_content = d.get("csv_content", "")
+async def download_saved_planning(
+    format: str = Query("csv", enum=["csv", "excel"]),
+    if_none_match: Optional[str] = Header(None),
+    d: dict = Depends(accessible_planning(PLANNING_CONTENT_PROJECTION)),
+):
+    etag = saved_planning_etag(d, format)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, CACHE_CONTROL_IMMUTABLE)
+    headers = cache_headers(etag, CACHE_CONTROL_IMMUTABLE)
+    header, rows = await load_saved_planning(d)
     if format == "excel":
-        df = pd.read_csv(io.StringIO(csv_content), sep=';')
+        df = planning_dataframe(header, rows)
         out = export_excel_with_style(df)
         out.seek(0)
         return StreamingResponse(
             out,
             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename={d.get('name','planning')}.xlsx"}
+            headers={"Content-Disposition": f"attachment; filename={d.get('name','planning')}.xlsx", **headers}
         )
     else:
         return StreamingResponse(
-            io.StringIO(csv_content),
+            io.StringIO(planning_rows_to_csv(header, rows)),
             media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename={d.get('name','planning')}.csv"}
+            headers={"Content-Disposition": f"attachment; filename={d.get('name','planning')}.csv", **headers}
+        )
+
+@app.get("/api/plannings/{planning_id}/versions")
+async def list_planning_versions(d: dict = Depends(accessible_planning({"lineage_id": 1}))):
+    """Versions de la lignée du planning, de la plus récente à la plus ancienne."""
+    items = []
+    for v in await repository.list_versions(d.get("lineage_id", d["_id"])):
+        items.append({
+            "id": str(v["_id"]),
+            "name": v.get("name", "Planning"),
+            "user": v.get("user", ""),
+            "created_at": v.get("created_at").isoformat() if v.get("created_at") else None,
+            "version": v.get("version", 1),
+            "parent_id": str(v["parent_id"]) if v.get("parent_id") else None,
+            "storage": v.get("storage", "snapshot"),
+            "payload_size": v.get("payload_size"),
+            "summary": v.get("summary"),
+        })
+    return {"items": items}
+
+@app.delete("/api/plannings/{planning_id}")
+async def delete_planning(
+    user: Principal = Depends(get_current_user),
+    d: dict = Depends(accessible_planning({
+        "user": 1, "lycee": 1, "payload_file_id": 1, "lineage_id": 1, "version": 1,
+    })),
+):
+    """Supprime un planning enregistré (par son auteur), s'il ne sert pas de base à une version delta."""
+    if d.get("user") != user.email:
+        raise ApiError(403, "Seul l'auteur peut supprimer ce planning")
+    if await repository.has_delta_dependents(d["_id"]):
+        raise ApiError(409, "D'autres versions sont enregistrées en delta de ce planning")
+    await repository.delete_planning(d)
+    return {"deleted": str(d["_id"])}
+
+async def lycee_conflicts(user: Principal, meta, matrix, exclude_lineage=None) -> dict:
+    """Colles d'un planning dont le colleur est déjà placé au même créneau dans un autre planning du lycée."""
+    entries = await repository.find_colleur_slots(user.lycee or "", planning_profs(meta), exclude_lineage)
+    conflicts = find_conflicts(colleur_cells(meta, matrix), entries)
+    return {"total": len(conflicts), "conflits": conflicts}
+
+async def lineage_of(parent_id: Optional[str], user: Principal):
+    """Lignée d'un planning enregistré du périmètre (None sans `parent_id`)."""
+    if not parent_id:
+        return None
+    parent = await repository.find_planning_in_scope(
+        _safe_object_id(parent_id), user.lycee or "", user.classes, {"lineage_id": 1}
+    )
+    if parent is None:
+        raise ApiError(404, "Planning parent introuvable")
+    return parent.get("lineage_id", parent["_id"])
+
+@app.get("/api/plannings/{planning_id}/conflicts")
+async def saved_planning_conflicts(
+    user: Principal = Depends(get_current_user),
+    d: dict = Depends(accessible_planning(PLANNING_CONTENT_PROJECTION)),
+):
+    """Conflits de colleurs entre ce planning et les autres plannings (dernières versions) du lycée."""
+    meta, matrix = await repository.load_planning_matrix(d)
+    return await lycee_conflicts(user, meta, matrix, d.get("lineage_id", d["_id"]))
+
+@app.get("/api/colleur_conflicts")
+async def generated_planning_conflicts(
+    parent_id: Optional[str] = Query(None, description="Planning enregistré que le planning généré remplacera"),
+    user: Principal = Depends(get_current_user),
+    generated_planning: Optional[str] = Depends(get_generated_planning),
+):
+    """Conflits de colleurs entre le planning généré et les plannings enregistrés du lycée."""
+    if not generated_planning:
+        return JSONResponse(status_code=400, content={"error": "Aucun planning généré."})
+    exclude = await lineage_of(parent_id, user)
+    meta, matrix = build_matrix(*parse_planning_csv(generated_planning))
+    return await lycee_conflicts(user, meta, matrix, exclude)
+
+@app.get("/api/dashboard")
+async def lycee_dashboard(user: Principal = Depends(get_current_user)):
+    """
+    Vue d'ensemble du lycée (dernière version de chaque planning enregistré): charge hebdomadaire
+    par prof toutes classes confondues, utilisation et violations par classe. Une seule lecture
+    du document d'agrégats tenu à jour à l'enregistrement et à la suppression.
+    """
+    if db is None:
+        return JSONResponse(status_code=500, content={"error": "Base de données non initialisée"})
+    return {"lycee": user.lycee or "", **dashboard_view(await repository.find_dashboard(user.lycee or ""))}
+
+def flatten_contraintes(contraintes):
+    """Ensemble des messages de violation (clé groupe préfixée pour les contraintes par groupe)."""
+    messages = set(contraintes["globales"])
+    for g, lst in contraintes["groupes"].items():
+        messages.update(f"Groupe {g}: {m}" for m in lst)
+    messages.update(contraintes["consecutives"])
+    messages.update(contraintes["compatibilites_profs"])
+    return messages
+
+def diff_plannings(meta_a, matrix_a, meta_b, matrix_b):
+    """
+    Cellules modifiées de A vers B. Même structure: comparaison directe des
+    matrices d'affectation; sinon (même en-tête et nombre de lignes) cellule par cellule.
+    """
+    header_b, rows_b = rows_from_matrix(meta_b, matrix_b)
+    cols = {name: j for j, name in enumerate(header_b)}
+
+    def describe(i, j, avant, apres):
+        row = rows_b[i]
+        return {
+            "ligne": i,
+            "semaine": header_b[j],
+            "matiere": row[cols["Matière"]] if "Matière" in cols else None,
+            "prof": row[cols["Prof"]] if "Prof" in cols else None,
+            "jour": row[cols["Jour"]] if "Jour" in cols else None,
+            "heure": row[cols["Heure"]] if "Heure" in cols else None,
+            "avant": avant,
+            "apres": apres,
+        }
+
+    if same_structure(meta_a, meta_b):
+        rows_idx, cols_idx = np.nonzero(matrix_a != matrix_b)
+        return [
+            describe(int(i), meta_b["matrix_columns"][int(k)],
+                     str(int(matrix_a[i, k]) or ''), str(int(matrix_b[i, k]) or ''))
+            for i, k in zip(rows_idx, cols_idx)
+        ]
+    _, rows_a = rows_from_matrix(meta_a, matrix_a)
+    return [
+        describe(i, j, rows_a[i][j], rows_b[i][j])
+        for i in range(len(rows_b)) for j in range(len(header_b))
+        if rows_a[i][j] != rows_b[i][j]
+    ]
+
+def _violations(header, rows, rules=None):
+    return flatten_contraintes(PlanningAnalyzer(planning_rows_to_csv(header, rows), rules).contraintes())
+
+@app.get("/api/plannings/{planning_id}/diff")
+async def diff_planning_versions(
+    against: str = Query(..., description="Identifiant du planning de référence"),
+    user: Principal = Depends(get_current_user),
+    d: dict = Depends(accessible_planning(repository.PLANNING_PAYLOAD_PROJECTION)),
+    rules: Optional[dict] = Depends(get_class_rules),
+):
+    """Cellules et violations de contraintes qui changent de `against` vers ce planning."""
+    other = await repository.find_planning_in_scope(
+        _safe_object_id(against), user.lycee or "", user.classes, repository.PLANNING_PAYLOAD_PROJECTION
+    )
+    if other is None:
+        return JSONResponse(status_code=404, content={"error": "Planning de référence introuvable"})
+    meta_a, matrix_a = await repository.load_planning_matrix(other)
+    meta_b, matrix_b = await repository.load_planning_matrix(d)
+    if meta_a["header"] != meta_b["header"] or meta_a["n_rows"] != meta_b["n_rows"]:
+        return JSONResponse(status_code=400, content={"error": "Plannings non comparables (structure différente)"})
+
+    cellules = diff_plannings(meta_a, matrix_a, meta_b, matrix_b)
+    if cellules:
+        violations_a, violations_b = await asyncio.gather(
+            asyncio.to_thread(_violations, *rows_from_matrix(meta_a, matrix_a), rules),
+            asyncio.to_thread(_violations, *rows_from_matrix(meta_b, matrix_b), rules),
         )
+    else:
+        violations_a = violations_b = set()
+    return {
+        "from": against,
+        "to": str(d["_id"]),
+        "nb_cellules": len(cellules),
+        "cellules": cellules,
+        "violations": {
+            "ajoutees": sorted(violations_b - violations_a),
+            "supprimees": sorted(violations_a - violations_b),
+        },
+    }
 
 # --- Changement de mot de passe utilisateur ---
 from pydantic import BaseModel as PydanticBaseModel
@@ -1307,10 +1942,11 @@ class PasswordChangeRequest(PydanticBaseModel):
     password: str
 
 @app.put("/api/users/me/password")
-async def change_password(payload: PasswordChangeRequest, user: UserInDB = Depends(get_current_user)):
+async def change_password(payload: PasswordChangeRequest, user: Principal = Depends(get_current_user)):
     if db is None:
         return JSONResponse(status_code=500, content={"error": "Base de données non initialisée"})
     if not payload.password or len(payload.password) < 4:
         return JSONResponse(status_code=400, content={"error": "Mot de passe trop court"})
-    db.users.update_one({"email": user.email}, {"$set": {"hashed_password": get_password_hash(payload.password)}})
+    await repository.update_user(user.email, {"hashed_password": await get_password_hash_async(payload.password)})
+    invalidate_principal(user.email)
     return {"updated": True}
\ No newline at end of file
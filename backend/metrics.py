@@ -0,0 +1,175 @@
+"""
+Métriques Prometheus exposées sur `GET /metrics`.
+
+- Latence HTTP par route (modèle de chemin, pas l'URL brute) via un middleware ASGI
+- Solveur: appels en cours, file d'attente, durée par fonction
+- Durée des opérations d'analyse (PlanningAnalyzer)
+- Caches: hits / misses lus à la collecte sur les compteurs des caches (aucun coût par requête)
+- MongoDB: durée de chaque commande via le CommandListener de pymongo
+- Boucle d'événements: retard des réveils (tâche de fond lancée par le lifespan)
+- Process: RSS, CPU, descripteurs (collecteur standard de prometheus_client)
+
+Plusieurs workers uvicorn: définir PROMETHEUS_MULTIPROC_DIR (répertoire vide au
+démarrage) pour agréger les compteurs et histogrammes de tous les processus.
+"""
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Gauge, Histogram, ProcessCollector, generate_latest,
+)
+from prometheus_client.core import CounterMetricFamily
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Durée des requêtes HTTP",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+OPERATION_DURATION = Histogram(
+    "planning_operation_duration_seconds", "Durée des opérations métier (solveur, analyse)",
+    ["operation"], buckets=LATENCY_BUCKETS,
+)
+MONGODB_COMMAND_DURATION = Histogram(
+    "mongodb_command_duration_seconds", "Durée des commandes MongoDB",
+    ["command", "status"], buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "Retard de la boucle d'événements sur un réveil programmé",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+EVENT_LOOP_LAG_INTERVAL_SECONDS = float(os.getenv("EVENT_LOOP_LAG_INTERVAL_SECONDS", "0.25"))
+SOLVER_QUEUE_DEPTH = Gauge("solver_queue_depth", "Générations en attente d'un worker solveur", multiprocess_mode="livesum")
+SOLVER_ACTIVE = Gauge("solver_active", "Générations en cours de résolution", multiprocess_mode="livesum")
+
+
+# -----------------------
+# HTTP
+# -----------------------
+class MetricsMiddleware:
+    """Middleware ASGI: une observation d'histogramme par requête HTTP."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Le routeur a complété le scope: modèle de chemin (/api/plannings/{planning_id})
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"], getattr(route, "path", "other"), str(status["code"])
+            ).observe(time.perf_counter() - start)
+
+
+# -----------------------
+# Boucle d'événements
+# -----------------------
+async def monitor_event_loop_lag(interval: float = EVENT_LOOP_LAG_INTERVAL_SECONDS):
+    """Mesure en continu l'écart entre l'heure de réveil demandée et l'heure effective (code bloquant)."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, time.perf_counter() - start - interval))
+
+
+# -----------------------
+# Opérations métier
+# -----------------------
+@contextmanager
+def track(operation: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        OPERATION_DURATION.labels(operation).observe(time.perf_counter() - start)
+
+
+def timed(operation: str):
+    """Décorateur: durée de la fonction dans planning_operation_duration_seconds."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with track(operation):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# -----------------------
+# Caches
+# -----------------------
+class CacheCollector:
+    """Expose les compteurs `hits` / `misses` des caches enregistrés, lus à la collecte."""
+
+    def __init__(self):
+        self.caches = {}
+
+    def register(self, name: str, cache):
+        self.caches[name] = cache
+
+    def collect(self):
+        hits = CounterMetricFamily("cache_hits", "Lectures servies par le cache", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Lectures absentes du cache", labels=["cache"])
+        for name, cache in self.caches.items():
+            hits.add_metric([name], cache.hits)
+            misses.add_metric([name], cache.misses)
+        yield hits
+        yield misses
+
+
+cache_collector = CacheCollector()
+REGISTRY.register(cache_collector)
+
+
+def register_cache(name: str, cache):
+    """`cache` doit exposer des attributs entiers `hits` et `misses`."""
+    cache_collector.register(name, cache)
+
+
+# -----------------------
+# MongoDB
+# -----------------------
+class MongoCommandMetrics(monitoring.CommandListener):
+    """À passer à AsyncIOMotorClient(event_listeners=[...])."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGODB_COMMAND_DURATION.labels(event.command_name, "ok").observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        MONGODB_COMMAND_DURATION.labels(event.command_name, "error").observe(event.duration_micros / 1e6)
+
+
+# -----------------------
+# Exposition
+# -----------------------
+def metrics_payload():
+    """(contenu, type MIME) au format texte Prometheus."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        # Caches et mémoire du process qui répond
+        registry.register(cache_collector)
+        ProcessCollector(registry=registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
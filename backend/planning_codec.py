@@ -0,0 +1,174 @@
+"""
+Format de stockage compact des plannings enregistrés.
+
+Un planning est un tableau (en-tête + lignes) : colonnes descriptives
+(Matière, Prof, Jour, Heure, ...) puis une colonne par semaine contenant
+le numéro du groupe affecté ou une cellule vide.
+
+Encodage:
+    zlib( len(meta) sur 4 octets | meta JSON | matrice uint16 créneaux × semaines )
+- meta: en-tête, index des colonnes de la matrice, valeurs des autres colonnes
+- matrice: 0 = cellule vide, sinon numéro de groupe
+Une colonne semaine qui contient autre chose qu'un entier positif est
+simplement gardée dans les colonnes descriptives (aucune perte).
+
+Versions: une nouvelle version de même structure que son parent peut être
+stockée comme delta (cellules modifiées) au lieu d'un snapshot complet.
+"""
+import csv
+import io
+import json
+import struct
+import zlib
+
+import numpy as np
+
+CODEC_VERSION = 1
+_MATRIX_DTYPE = np.dtype("<u2")
+_MAX_GROUP = np.iinfo(_MATRIX_DTYPE).max
+
+
+def parse_planning_csv(csv_content: str):
+    """CSV ';' -> (header, rows) en chaînes, sans pandas."""
+    reader = csv.reader(io.StringIO(csv_content), delimiter=';')
+    rows = [row for row in reader if row]
+    if not rows:
+        return [], []
+    header = rows[0]
+    width = len(header)
+    body = [(row + [''] * (width - len(row)))[:width] for row in rows[1:]]
+    return header, body
+
+
+def planning_rows_to_csv(header, rows) -> str:
+    """Sérialise un planning (en-tête + lignes) au format CSV ';' utilisé partout ailleurs."""
+    output = io.StringIO()
+    writer = csv.writer(output, delimiter=';', lineterminator='\n')
+    writer.writerow(header)
+    writer.writerows(rows)
+    return output.getvalue()
+
+
+def week_column_indexes(header):
+    """Index des colonnes semaines (en-tête numérique), dans l'ordre du fichier."""
+    return [i for i, c in enumerate(header) if str(c).strip().isdigit()]
+
+
+def _as_group(cell):
+    """'' -> 0, '12' / '12.0' -> 12, sinon None (cellule non codable)."""
+    text = str(cell).strip()
+    if text == '':
+        return 0
+    try:
+        value = float(text)
+    except ValueError:
+        return None
+    if value != int(value) or not (1 <= value <= _MAX_GROUP):
+        return None
+    return int(value)
+
+
+def build_matrix(header, rows):
+    """(header, rows) -> (meta, matrice uint16 créneaux × semaines codées)."""
+    matrix_cols = []
+    columns = []
+    for j in week_column_indexes(header):
+        values = [_as_group(row[j]) for row in rows]
+        if all(v is not None for v in values):
+            matrix_cols.append(j)
+            columns.append(values)
+    matrix_set = set(matrix_cols)
+    meta_cols = [j for j in range(len(header)) if j not in matrix_set]
+
+    meta = {
+        "v": CODEC_VERSION,
+        "header": list(header),
+        "n_rows": len(rows),
+        "matrix_columns": matrix_cols,
+        "meta_columns": meta_cols,
+        "meta": [[row[j] for j in meta_cols] for row in rows],
+    }
+    if columns:
+        matrix = np.asarray(columns, dtype=_MATRIX_DTYPE).T  # créneaux × semaines
+    else:
+        matrix = np.zeros((len(rows), 0), dtype=_MATRIX_DTYPE)
+    return meta, matrix
+
+
+def encode_planning(header, rows) -> bytes:
+    return encode_matrix(*build_matrix(header, rows))
+
+
+def encode_matrix(meta, matrix) -> bytes:
+    """(meta, matrice) -> format complet (snapshot)."""
+    meta_bytes = json.dumps(meta, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    raw = struct.pack('<I', len(meta_bytes)) + meta_bytes + np.ascontiguousarray(matrix, dtype=_MATRIX_DTYPE).tobytes()
+    return zlib.compress(raw, 6)
+
+
+def decode_matrix(blob: bytes):
+    """-> (meta, matrice numpy créneaux × semaines_codées)."""
+    raw = zlib.decompress(blob)
+    (meta_len,) = struct.unpack_from('<I', raw, 0)
+    meta = json.loads(raw[4:4 + meta_len].decode('utf-8'))
+    if meta.get("v") != CODEC_VERSION:
+        raise ValueError(f"Version de format de planning inconnue: {meta.get('v')}")
+    matrix = np.frombuffer(raw, dtype=_MATRIX_DTYPE, offset=4 + meta_len)
+    matrix = matrix.reshape(meta["n_rows"], len(meta["matrix_columns"]))
+    return meta, matrix
+
+
+def decode_planning(blob: bytes):
+    """-> (header, rows) en chaînes (cellule vide = '')."""
+    meta, matrix = decode_matrix(blob)
+    return rows_from_matrix(meta, matrix)
+
+
+# -----------------------
+# Versions: deltas de cellules entre deux matrices
+# -----------------------
+def same_structure(meta_a, meta_b) -> bool:
+    """Deux plannings dont seules les affectations (matrice) diffèrent."""
+    keys = ("header", "n_rows", "matrix_columns", "meta_columns", "meta")
+    return all(meta_a.get(k) == meta_b.get(k) for k in keys)
+
+
+def encode_delta(parent_matrix, child_matrix) -> bytes:
+    """Cellules modifiées (ligne, colonne, nouvelle valeur) de parent -> enfant."""
+    rows, cols = np.nonzero(parent_matrix != child_matrix)
+    values = child_matrix[rows, cols]
+    raw = (
+        struct.pack('<I', len(rows))
+        + rows.astype('<u4').tobytes()
+        + cols.astype('<u4').tobytes()
+        + values.astype(_MATRIX_DTYPE).tobytes()
+    )
+    return zlib.compress(raw, 6)
+
+
+def apply_delta(matrix, delta: bytes):
+    """Applique un delta sur une copie de la matrice."""
+    raw = zlib.decompress(delta)
+    (n,) = struct.unpack_from('<I', raw, 0)
+    rows = np.frombuffer(raw, dtype='<u4', count=n, offset=4)
+    cols = np.frombuffer(raw, dtype='<u4', count=n, offset=4 + 4 * n)
+    values = np.frombuffer(raw, dtype=_MATRIX_DTYPE, count=n, offset=4 + 8 * n)
+    out = np.array(matrix, copy=True)
+    out[rows, cols] = values
+    return out
+
+
+def rows_from_matrix(meta, matrix):
+    """(header, rows) en chaînes à partir de (meta, matrice)."""
+    header = meta["header"]
+    width = len(header)
+    rows = []
+    for i in range(meta["n_rows"]):
+        row = [''] * width
+        for j, value in zip(meta["meta_columns"], meta["meta"][i]):
+            row[j] = value
+        for k, j in enumerate(meta["matrix_columns"]):
+            g = int(matrix[i, k])
+            row[j] = str(g) if g else ''
+        rows.append(row)
+    return header, rows
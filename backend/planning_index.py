@@ -0,0 +1,146 @@
+"""
+Index d'un planning pour servir des fenêtres filtrées (semaines, groupes,
+profs, matières, jour) sans refiltrer un DataFrame complet à chaque appel.
+
+L'index est construit une fois par contenu (empreinte) à partir de la
+représentation (meta, matrice) de backend.planning_codec :
+- colonnes descriptives (Matière, Prof, Jour) -> valeur -> lignes triées
+- groupes -> (lignes, colonnes semaine) où le groupe apparaît
+Les lignes renvoyées gardent toujours l'ordre du planning d'origine.
+
+Configuration (.env) :
+    PLANNING_INDEX_CACHE_SIZE=64   (nombre d'index gardés en mémoire)
+"""
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from backend.planning_codec import week_column_indexes
+
+PLANNING_INDEX_CACHE_SIZE = int(os.getenv("PLANNING_INDEX_CACHE_SIZE", "64"))
+
+# Paramètre de requête -> colonne descriptive indexée
+FILTER_COLUMNS = {"matiere": "Matière", "prof": "Prof", "day": "Jour"}
+
+
+class PlanningIndex:
+    def __init__(self, meta, matrix):
+        self.meta = meta
+        self.matrix = matrix
+        header = meta["header"]
+        self.weeks = [header[j] for j in week_column_indexes(header)]
+        self.n_rows = meta["n_rows"]
+
+        # Colonne descriptive -> valeur -> lignes (ordre croissant)
+        self.postings = {}
+        for k, j in enumerate(meta["meta_columns"]):
+            if header[j] not in FILTER_COLUMNS.values():
+                continue
+            by_value = {}
+            for i, row in enumerate(meta["meta"]):
+                by_value.setdefault(str(row[k]).strip(), []).append(i)
+            self.postings[header[j]] = {v: np.asarray(rows, dtype=np.int64) for v, rows in by_value.items()}
+
+        # Groupe -> (lignes, colonnes de la matrice) triés par groupe
+        rows, cols = np.nonzero(matrix)
+        values = matrix[rows, cols]
+        order = np.argsort(values, kind="stable")
+        self._group_values = values[order]
+        self._group_rows = rows[order]
+        self._group_cols = cols[order]
+
+    def _rows_for_values(self, column, values):
+        postings = self.postings.get(column)
+        if postings is None:
+            raise ValueError(f"Colonne '{column}' absente du planning")
+        found = [postings[v.strip()] for v in values if v.strip() in postings]
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+    def _rows_for_groups(self, groups, matrix_cols):
+        lo = np.searchsorted(self._group_values, groups, side="left")
+        hi = np.searchsorted(self._group_values, groups, side="right")
+        hits = [np.arange(a, b) for a, b in zip(lo, hi)]
+        positions = np.concatenate(hits) if hits else np.zeros(0, dtype=np.int64)
+        positions = positions[np.isin(self._group_cols[positions], matrix_cols)]
+        return np.unique(self._group_rows[positions])
+
+    def _week_window(self, week_from, week_to):
+        """Semaines retenues, bornes incluses, dans l'ordre du fichier (l'année scolaire passe de 52 à 1)."""
+        start, end = 0, len(self.weeks) - 1
+        for label, bound in (("week_from", week_from), ("week_to", week_to)):
+            if bound is not None and bound.strip() not in self.weeks:
+                raise ValueError(f"{label}: semaine '{bound}' absente du planning")
+        if week_from is not None:
+            start = self.weeks.index(week_from.strip())
+        if week_to is not None:
+            end = self.weeks.index(week_to.strip())
+        return set(self.weeks[start:end + 1])
+
+    def select(self, week_from=None, week_to=None, groups=None, profs=None, matieres=None, days=None,
+               offset=0, limit=None):
+        """
+        Fenêtre filtrée -> (meta, matrice, infos) au même format que decode_matrix,
+        utilisable directement par backend.planning_response.
+        Filtres combinés en ET ; plusieurs valeurs d'un même filtre en OU.
+        """
+        meta, header = self.meta, self.meta["header"]
+        weeks = self._week_window(week_from, week_to)
+        kept_cols = [j for j in range(len(header)) if header[j] not in self.weeks or header[j] in weeks]
+        kept_set = set(kept_cols)
+        matrix_k = [k for k, j in enumerate(meta["matrix_columns"]) if j in kept_set]
+        meta_k = [k for k, j in enumerate(meta["meta_columns"]) if j in kept_set]
+
+        rows = np.arange(self.n_rows)
+        for param, values in (("prof", profs), ("matiere", matieres), ("day", days)):
+            if values:
+                rows = np.intersect1d(rows, self._rows_for_values(FILTER_COLUMNS[param], values), assume_unique=True)
+        if groups:
+            rows = np.intersect1d(rows, self._rows_for_groups(sorted(groups), matrix_k), assume_unique=True)
+
+        total = len(rows)
+        rows = rows[offset:offset + limit if limit is not None else None]
+
+        position = {j: p for p, j in enumerate(kept_cols)}
+        window_meta = {
+            "v": meta["v"],
+            "header": [header[j] for j in kept_cols],
+            "n_rows": len(rows),
+            "matrix_columns": [position[meta["matrix_columns"][k]] for k in matrix_k],
+            "meta_columns": [position[meta["meta_columns"][k]] for k in meta_k],
+            "meta": [[meta["meta"][i][k] for k in meta_k] for i in rows],
+        }
+        window_matrix = self.matrix[np.ix_(rows, matrix_k)]
+        info = {"total_rows": total, "offset": offset, "row_ids": rows.tolist()}
+        return window_meta, window_matrix, info
+
+
+class _IndexCache:
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+
+index_cache = _IndexCache()
+
+
+async def get_planning_index(key: str, load) -> PlanningIndex:
+    """
+    Index mis en cache par empreinte de contenu (un planning enregistré est immuable).
+    `load` : coroutine sans argument renvoyant (meta, matrice), appelée seulement si absent du cache.
+    """
+    entries = index_cache.entries
+    index = entries.get(key)
+    if index is not None:
+        index_cache.hits += 1
+        entries.move_to_end(key)
+        return index
+    index_cache.misses += 1
+    index = PlanningIndex(*await load())
+    entries[key] = index
+    while len(entries) > PLANNING_INDEX_CACHE_SIZE:
+        entries.popitem(last=False)
+    return index
@@ -0,0 +1,95 @@
+"""
+Sérialisation des grilles de planning pour les réponses API.
+
+Sans passer par `jsonable_encoder` ni par `df.values.tolist()` (objets mixtes,
+NaN pour les cellules vides), trois représentations, négociées par `Accept` :
+
+- défaut (`application/json`) : `{header, rows}` comme avant, cellules en chaînes ('' si vide)
+- `application/vnd.planning.columnar+json` : colonnes descriptives encodées par dictionnaire
+  (valeurs distinctes + codes) et matrice des groupes par semaine (0 = vide)
+- `application/msgpack` : même contenu en MessagePack, matrice en binaire uint16 (créneaux × semaines)
+"""
+from typing import Optional
+
+import msgpack
+import numpy as np
+import orjson
+from fastapi import Response
+
+from backend.planning_codec import build_matrix, rows_from_matrix
+
+COLUMNAR_JSON = "application/vnd.planning.columnar+json"
+MSGPACK = "application/msgpack"
+_MSGPACK_TYPES = (MSGPACK, "application/x-msgpack")
+
+
+class ORJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+def _dictionary_encode(values):
+    index = {}
+    codes = [index.setdefault(v, len(index)) for v in values]
+    return {"values": list(index), "codes": codes}
+
+
+def columnar_planning(meta, matrix, binary: bool = False) -> dict:
+    header = meta["header"]
+    meta_rows = meta["meta"]
+    columns = {
+        header[j]: _dictionary_encode([row[k] for row in meta_rows])
+        for k, j in enumerate(meta["meta_columns"])
+    }
+    weeks = [header[j] for j in meta["matrix_columns"]]
+    if binary:
+        groups = {"dtype": "uint16", "shape": list(matrix.shape), "data": np.ascontiguousarray(matrix, dtype="<u2").tobytes()}
+    else:
+        groups = np.ascontiguousarray(matrix.T)  # une liste par semaine, sérialisée directement par orjson
+    return {
+        "format": "columnar",
+        "header": header,
+        "n_rows": meta["n_rows"],
+        "columns": columns,
+        "weeks": weeks,
+        "groups": groups,
+    }
+
+
+def negotiated_format(accept: Optional[str]) -> str:
+    accept = (accept or "").lower()
+    if any(t in accept for t in _MSGPACK_TYPES):
+        return "msgpack"
+    if COLUMNAR_JSON in accept:
+        return "columnar"
+    return "json"
+
+
+def planning_response(
+    accept: Optional[str],
+    header=None,
+    rows=None,
+    meta=None,
+    matrix=None,
+    extra: Optional[dict] = None,
+    headers: Optional[dict] = None,
+) -> Response:
+    """
+    Réponse planning dans le format demandé. Fournir soit (header, rows) en chaînes,
+    soit (meta, matrix) issus de backend.planning_codec. `extra` (message, id, ...) est ajouté tel quel.
+    """
+    fmt = negotiated_format(accept)
+    extra = extra or {}
+    if fmt == "json":
+        if header is None:
+            header, rows = rows_from_matrix(meta, matrix)
+        return ORJSONResponse({"header": header, "rows": rows, **extra}, headers=headers)
+    if meta is None:
+        meta, matrix = build_matrix(header, rows)
+    if fmt == "msgpack":
+        body = msgpack.packb({**columnar_planning(meta, matrix, binary=True), **extra}, use_bin_type=True)
+        return Response(body, media_type=MSGPACK, headers=headers)
+    content = {**columnar_planning(meta, matrix), **extra}
+    return ORJSONResponse(content, media_type=COLUMNAR_JSON, headers=headers)
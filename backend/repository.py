@@ -0,0 +1,337 @@
+"""
+Accès aux données (MongoDB via motor, non bloquant).
+
+Les routes de main.py passent par ces fonctions plutôt que d'appeler
+`db.<collection>` directement : chaque aller-retour base est attendu
+(`await`) et ne bloque plus la boucle d'événements.
+"""
+import base64
+import os
+from datetime import datetime, timezone
+from typing import Optional
+
+from bson import Binary, ObjectId
+from pymongo.errors import DuplicateKeyError
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+from backend.colleur_index import colleur_cells
+from backend.dashboard import lineage_entry
+from backend.db import db
+from backend.planning_codec import apply_delta, decode_matrix, encode_planning, parse_planning_csv
+
+# Au-delà de cette taille (compressée), le contenu d'un planning part dans GridFS
+PLANNING_INLINE_MAX_BYTES = int(os.getenv("PLANNING_INLINE_MAX_BYTES", str(1024 * 1024)))
+PLANNING_PAYLOAD_BUCKET = "planning_payloads"
+
+
+# -----------------------
+# Utilisateurs
+# -----------------------
+async def find_user(email: str, projection: Optional[dict] = None) -> Optional[dict]:
+    return await db.users.find_one({"email": email}, projection)
+
+async def user_exists(email: str) -> bool:
+    return await db.users.count_documents({"email": email}, limit=1) > 0
+
+async def insert_user(doc: dict):
+    await db.users.insert_one(doc)
+
+async def update_user(email: str, fields: dict):
+    await db.users.update_one({"email": email}, {"$set": fields})
+
+
+# -----------------------
+# Plannings
+# -----------------------
+async def insert_planning(doc: dict, payload: Optional[bytes] = None, delta: Optional[bytes] = None):
+    """
+    Insère un planning. `payload` (format backend.planning_codec) est stocké
+    dans le document s'il est petit, sinon dans GridFS (payload_file_id).
+    Une version stockée en `delta` ne garde que les cellules modifiées par
+    rapport à son parent (doc["parent_id"], doc["delta_chain"]).
+    """
+    doc = dict(doc)
+    doc.setdefault("_id", ObjectId())
+    doc.setdefault("lineage_id", doc["_id"])
+    doc.setdefault("version", 1)
+    # Vues du lycée (index des colleurs, tableau de bord) pas encore à jour: voir refresh_lineage_views
+    doc.setdefault("lineage_views", False)
+    if delta is not None:
+        doc["storage"] = "delta"
+        doc["delta"] = Binary(delta)
+        doc["payload_size"] = len(delta)
+    elif payload is not None:
+        doc["storage"] = "snapshot"
+        doc["payload_size"] = len(payload)
+        if len(payload) > PLANNING_INLINE_MAX_BYTES:
+            bucket = AsyncIOMotorGridFSBucket(db, bucket_name=PLANNING_PAYLOAD_BUCKET)
+            doc["payload_file_id"] = await bucket.upload_from_stream(doc.get("name") or "planning", payload)
+        else:
+            doc["payload"] = Binary(payload)
+    try:
+        res = await db.plannings.insert_one(doc)
+    except DuplicateKeyError:
+        if doc.get("payload_file_id") is not None:
+            await AsyncIOMotorGridFSBucket(db, bucket_name=PLANNING_PAYLOAD_BUCKET).delete(doc["payload_file_id"])
+        raise
+    return res.inserted_id
+
+# Enregistrements concurrents d'une même lignée: nouvelles tentatives au numéro suivant
+PLANNING_VERSION_ATTEMPTS = 5
+
+async def insert_planning_version(doc: dict, payload: Optional[bytes] = None, delta: Optional[bytes] = None):
+    """
+    Insère `doc` comme nouvelle version de sa lignée (doc["lineage_id"]) -> (id, version).
+    L'index unique (lineage_id, version) refuse un numéro déjà pris par un enregistrement
+    concurrent : on relit alors le dernier numéro et on réessaie.
+    """
+    for attempt in range(PLANNING_VERSION_ATTEMPTS):
+        version = await next_version(doc["lineage_id"])
+        try:
+            return await insert_planning({**doc, "version": version}, payload, delta), version
+        except DuplicateKeyError:
+            if attempt == PLANNING_VERSION_ATTEMPTS - 1:
+                raise
+
+PLANNING_PAYLOAD_PROJECTION = {
+    "storage": 1, "payload": 1, "payload_file_id": 1, "csv_content": 1,
+    "delta": 1, "delta_chain": 1, "lineage_id": 1, "version": 1,
+}
+
+async def load_planning_payload(doc: dict) -> Optional[bytes]:
+    """Contenu compressé d'un planning (inline ou GridFS), None pour l'ancien format CSV."""
+    if doc.get("payload") is not None:
+        return bytes(doc["payload"])
+    if doc.get("payload_file_id") is not None:
+        bucket = AsyncIOMotorGridFSBucket(db, bucket_name=PLANNING_PAYLOAD_BUCKET)
+        stream = await bucket.open_download_stream(doc["payload_file_id"])
+        return await stream.read()
+    return None
+
+async def find_planning_in_scope(planning_id, lycee: str, classes: list, projection: Optional[dict] = None) -> Optional[dict]:
+    """
+    Planning `planning_id` s'il est visible pour ce périmètre (même lycée, au moins
+    une classe en commun), en une seule requête sur le périmètre stocké sur le planning.
+    """
+    query = {"_id": planning_id, "lycee": lycee, "classes": {"$in": list(classes)}}
+    return await db.plannings.find_one(query, projection)
+
+async def planning_exists(planning_id) -> bool:
+    return await db.plannings.count_documents({"_id": planning_id}, limit=1) > 0
+
+async def load_planning_matrix(doc: dict):
+    """
+    (meta, matrice) d'un planning enregistré. Pour une version delta, le snapshot
+    et les deltas intermédiaires (delta_chain, borné) sont lus en une requête.
+    """
+    if doc.get("storage") != "delta":
+        payload = await load_planning_payload(doc)
+        if payload is None:
+            header, rows = parse_planning_csv(doc.get("csv_content", ""))
+            payload = encode_planning(header, rows)
+        return decode_matrix(payload)
+    chain = list(doc.get("delta_chain", []))  # [snapshot, delta, delta, ..., parent]
+    ancestors = {
+        d["_id"]: d
+        async for d in db.plannings.find({"_id": {"$in": chain}}, PLANNING_PAYLOAD_PROJECTION)
+    }
+    if len(ancestors) != len(chain):
+        raise ValueError("Historique du planning incomplet")
+    meta, matrix = await load_planning_matrix(ancestors[chain[0]])
+    for oid in chain[1:]:
+        matrix = apply_delta(matrix, bytes(ancestors[oid]["delta"]))
+    return meta, apply_delta(matrix, bytes(doc["delta"]))
+
+async def list_versions(lineage_id) -> list:
+    projection = {"name": 1, "user": 1, "created_at": 1, "version": 1, "parent_id": 1,
+                  "storage": 1, "payload_size": 1, "summary": 1}
+    cursor = db.plannings.find({"lineage_id": lineage_id}, projection).sort("version", -1)
+    return [d async for d in cursor]
+
+async def next_version(lineage_id) -> int:
+    last = await db.plannings.find_one({"lineage_id": lineage_id}, {"version": 1}, sort=[("version", -1)])
+    return (last.get("version", 0) if last else 0) + 1
+
+async def has_delta_dependents(planning_id) -> bool:
+    """Une version stockée en delta s'appuie sur ce planning (il ne peut pas être supprimé)."""
+    return await db.plannings.count_documents({"delta_chain": planning_id}, limit=1) > 0
+
+async def delete_planning(doc: dict):
+    """
+    Supprime un planning (et son contenu GridFS). S'il était la dernière version de
+    sa lignée, l'index des colleurs et le tableau de bord repassent à la version précédente.
+    """
+    await db.plannings.delete_one({"_id": doc["_id"]})
+    if doc.get("payload_file_id") is not None:
+        bucket = AsyncIOMotorGridFSBucket(db, bucket_name=PLANNING_PAYLOAD_BUCKET)
+        await bucket.delete(doc["payload_file_id"])
+    lineage_id = doc.get("lineage_id", doc["_id"])
+    head = await db.plannings.find_one(
+        {"lineage_id": lineage_id}, {**PLANNING_PAYLOAD_PROJECTION, **LINEAGE_VIEW_PROJECTION}, sort=[("version", -1)]
+    )
+    if head is None:
+        await db.colleur_slots.delete_many({"lineage_id": lineage_id})
+        await remove_dashboard_lineage(doc.get("lycee", ""), lineage_id)
+    elif head.get("version", 1) < doc.get("version", 1):
+        await db.colleur_slots.delete_many({"planning_id": doc["_id"]})
+        await refresh_lineage_views(head, *await load_planning_matrix(head), replace=True)
+
+
+# -----------------------
+# Vues du lycée tenues à jour par lignée: index des colleurs, tableau de bord
+# -----------------------
+LINEAGE_VIEW_PROJECTION = {
+    "lycee": 1, "classes": 1, "name": 1, "user": 1, "created_at": 1, "summary": 1, "lineage_id": 1, "version": 1,
+}
+
+async def refresh_lineage_views(doc: dict, meta, matrix, replace: bool = False):
+    """
+    `doc` (meta, matrice) devient la dernière version de sa lignée dans l'index des colleurs
+    et le tableau de bord. `replace`: il remplace une version plus récente supprimée.
+    """
+    cells = colleur_cells(meta, matrix)
+    await index_colleur_slots(doc, cells)
+    await update_dashboard(doc, cells, replace)
+    await db.plannings.update_many(
+        {"lineage_id": doc.get("lineage_id", doc["_id"]), "lineage_views": False},
+        {"$set": {"lineage_views": True}},
+    )
+
+async def backfill_lineage_views():
+    """
+    Indexe les lignées dont les vues ne sont pas à jour (lineage_views: false, index partiel) :
+    plannings enregistrés avant ces vues, enregistrement interrompu avant refresh_lineage_views.
+    """
+    if db is None:
+        return
+    # Plannings antérieurs au drapeau: marqués une seule fois
+    if await db.migrations.count_documents({"_id": "lineage_views"}, limit=1) == 0:
+        await db.plannings.update_many({"lineage_views": {"$exists": False}}, {"$set": {"lineage_views": False}})
+        await db.migrations.update_one(
+            {"_id": "lineage_views"}, {"$set": {"done_at": datetime.now(timezone.utc)}}, upsert=True
+        )
+    lineages = await db.plannings.distinct("lineage_id", {"lineage_views": False})
+    for lineage_id in lineages:
+        head = await db.plannings.find_one(
+            {"lineage_id": lineage_id},
+            {**PLANNING_PAYLOAD_PROJECTION, **LINEAGE_VIEW_PROJECTION},
+            sort=[("version", -1)],
+        )
+        try:
+            await refresh_lineage_views(head, *await load_planning_matrix(head))
+        except ValueError as e:
+            print(f"[WARN] Lignée {lineage_id} non indexée: {e}")
+
+# Index des colleurs du lycée (backend.colleur_index)
+COLLEUR_SLOT_PROJECTION = {
+    "_id": 0, "prof": 1, "week": 1, "day": 1, "hour": 1, "planning_id": 1,
+    "name": 1, "classes": 1, "matiere": 1, "group": 1,
+}
+
+async def index_colleur_slots(doc: dict, cells: list):
+    """
+    Remplace les entrées de la lignée de `doc` par ses colles (dernière version).
+    Deux enregistrements concurrents d'une même lignée: la version la plus haute l'emporte.
+    """
+    lineage_id = doc.get("lineage_id", doc["_id"])
+    version = doc.get("version", 1)
+    base = {
+        "lycee": doc.get("lycee", ""), "classes": doc.get("classes", []), "name": doc.get("name"),
+        "lineage_id": lineage_id, "version": version, "planning_id": doc["_id"],
+    }
+    if cells:
+        await db.colleur_slots.insert_many([{**base, **cell} for cell in cells], ordered=False)
+    await db.colleur_slots.delete_many({"lineage_id": lineage_id, "version": {"$lt": version}})
+    if await db.colleur_slots.count_documents({"lineage_id": lineage_id, "version": {"$gt": version}}, limit=1):
+        await db.colleur_slots.delete_many({"planning_id": doc["_id"]})
+
+async def find_colleur_slots(lycee: str, profs: Optional[list] = None, exclude_lineage=None) -> list:
+    """Colles du lycée (des profs donnés), hors lignée `exclude_lineage`. Servi par l'index {lycee, prof, ...}."""
+    query = {"lycee": lycee}
+    if profs is not None:
+        query["prof"] = {"$in": list(profs)}
+    if exclude_lineage is not None:
+        query["lineage_id"] = {"$ne": exclude_lineage}
+    return await db.colleur_slots.find(query, COLLEUR_SLOT_PROJECTION).to_list(length=None)
+
+# Tableau de bord du lycée (backend.dashboard)
+async def update_dashboard(doc: dict, cells: list, replace: bool = False):
+    """
+    Entrée de la lignée de `doc` dans le tableau de bord de son lycée. Sauf `replace`,
+    une version plus ancienne que celle déjà enregistrée n'écrase pas l'entrée.
+    """
+    lycee = doc.get("lycee", "")
+    key = f"lineages.{doc.get('lineage_id', doc['_id'])}"
+    query = {"_id": lycee}
+    if not replace:
+        query[f"{key}.version"] = {"$not": {"$gt": doc.get("version", 1)}}
+    try:
+        await db.lycee_dashboard.update_one(
+            query,
+            {"$set": {key: lineage_entry(doc, cells), "updated_at": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        pass  # une version plus récente de la lignée est déjà agrégée
+
+async def remove_dashboard_lineage(lycee: str, lineage_id):
+    await db.lycee_dashboard.update_one(
+        {"_id": lycee},
+        {"$unset": {f"lineages.{lineage_id}": ""}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+    )
+
+async def find_dashboard(lycee: str) -> Optional[dict]:
+    return await db.lycee_dashboard.find_one({"_id": lycee})
+
+# Règles de fréquence par classe (backend.frequency_rules)
+async def find_class_rules(lycee: str, classe: str) -> Optional[dict]:
+    doc = await db.class_rules.find_one({"lycee": lycee, "classe": classe}, {"rules": 1, "_id": 0})
+    return doc["rules"] if doc else None
+
+async def save_class_rules(lycee: str, classe: str, rules: dict, user: str):
+    await db.class_rules.update_one(
+        {"lycee": lycee, "classe": classe},
+        {"$set": {"rules": rules, "updated_by": user, "updated_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+
+async def delete_class_rules(lycee: str, classe: str) -> bool:
+    result = await db.class_rules.delete_one({"lycee": lycee, "classe": classe})
+    return result.deleted_count > 0
+
+PLANNING_LIST_PROJECTION = {"name": 1, "user": 1, "created_at": 1, "summary": 1, "lineage_id": 1, "version": 1}
+
+def encode_cursor(doc: dict) -> str:
+    """Curseur opaque (created_at, _id) du dernier élément d'une page."""
+    raw = f"{doc['created_at'].isoformat()}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str):
+    """Lève ValueError si le curseur est invalide."""
+    try:
+        created_at, oid = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(created_at), ObjectId(oid)
+    except Exception as e:
+        raise ValueError("Curseur invalide") from e
+
+async def list_plannings_page(lycee: str, classes: list, limit: int, cursor: Optional[str] = None):
+    """
+    Plannings visibles pour un périmètre (même lycée, au moins une classe en commun),
+    du plus récent au plus ancien. Pagination par clé (created_at, _id) servie par
+    l'index {lycee, classes, created_at, _id}. Retourne (items, next_cursor).
+    """
+    query = {"lycee": lycee, "classes": {"$in": list(classes)}}
+    if cursor:
+        created_at, oid = decode_cursor(cursor)
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": oid}},
+        ]
+    docs = await (
+        db.plannings.find(query, PLANNING_LIST_PROJECTION)
+        .sort([("created_at", -1), ("_id", -1)])
+        .limit(limit + 1)
+        .to_list(length=limit + 1)
+    )
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return docs[:limit], next_cursor
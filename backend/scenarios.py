@@ -0,0 +1,111 @@
+"""
+Scénarios « et si » : variantes d'une entrée de planning décrites par des patchs.
+
+Le CSV de base est lu une fois ((en-tête, lignes) en chaînes, sans pandas) ;
+chaque scénario en copie les lignes, applique ses patchs puis est converti en
+créneaux pour le solveur (mêmes normalisations que le chemin CSV).
+
+Patchs (un dict chacun) :
+    {"op": "add_slot", "set": {...}}                  ajoute un créneau
+    {"op": "remove_slots", "match": {...}}            retire les créneaux correspondants
+    {"op": "modify_slots", "match": {...}, "set": {...}}
+        ex: disponibilités {"travaille_paires": false}, groupes {"groupes_paire": "1 à 14"}
+
+`match` filtre sur matiere / prof / jour / heure (égalité, espaces ignorés) ;
+`set` accepte aussi groupes_paire / groupes_impaire / travaille_paires / travaille_impaires.
+"""
+
+FIELD_COLUMNS = {
+    "matiere": "Matière",
+    "prof": "Prof",
+    "jour": "Jour",
+    "heure": "Heure",
+    "groupes_paire": "Groupes possibles semaine paire",
+    "groupes_impaire": "Groupes possibles semaine impaire",
+    "travaille_paires": "Travaille les semaines paires",
+    "travaille_impaires": "Travaille les semaines impaires",
+}
+MATCH_FIELDS = ("matiere", "prof", "jour", "heure")
+REQUIRED_NEW_SLOT = ("matiere", "prof", "jour", "heure")
+
+
+class PatchError(ValueError):
+    pass
+
+
+def _normalize(field, value) -> str:
+    if isinstance(value, bool):
+        return "Oui" if value else "Non"
+    value = "" if value is None else str(value)
+    return value.replace(" ", "") if field == "heure" else value.strip()
+
+
+def _columns(header):
+    missing = [c for c in FIELD_COLUMNS.values() if c not in header]
+    if missing:
+        raise PatchError(f"Colonnes absentes du CSV: {', '.join(missing)}")
+    return {field: header.index(column) for field, column in FIELD_COLUMNS.items()}
+
+
+def _matches(row, cols, match):
+    return all(_normalize(f, row[cols[f]]) == _normalize(f, v) for f, v in match.items() if v is not None)
+
+
+def apply_patches(header, rows, patches):
+    """
+    -> (nouvelles lignes, nombre de lignes touchées par patch). Les lignes de base ne sont pas modifiées.
+    Lève PatchError si un patch est invalide ou ne correspond à aucun créneau.
+    """
+    cols = _columns(header)
+    rows = [list(r) for r in rows]
+    touched = []
+    for i, patch in enumerate(patches):
+        op = patch.get("op")
+        match = {k: v for k, v in (patch.get("match") or {}).items() if v is not None}
+        values = {k: v for k, v in (patch.get("set") or {}).items() if v is not None}
+        unknown = [k for k in {**match, **values} if k not in FIELD_COLUMNS]
+        if unknown or any(k not in MATCH_FIELDS for k in match):
+            raise PatchError(f"Patch {i}: champ inconnu ou non filtrable: {', '.join(unknown or list(match))}")
+
+        if op == "add_slot":
+            missing = [f for f in REQUIRED_NEW_SLOT if f not in values]
+            if missing:
+                raise PatchError(f"Patch {i}: champs requis pour un créneau: {', '.join(missing)}")
+            row = [""] * len(header)
+            defaults = {"travaille_paires": True, "travaille_impaires": True}
+            for field, value in {**defaults, **values}.items():
+                row[cols[field]] = _normalize(field, value)
+            rows.append(row)
+            touched.append(1)
+            continue
+
+        if op not in ("remove_slots", "modify_slots"):
+            raise PatchError(f"Patch {i}: opération inconnue {op!r}")
+        if not match:
+            raise PatchError(f"Patch {i}: `match` requis")
+        selected = [r for r in rows if _matches(r, cols, match)]
+        if not selected:
+            raise PatchError(f"Patch {i}: aucun créneau ne correspond à {match}")
+        if op == "remove_slots":
+            rows = [r for r in rows if not _matches(r, cols, match)]
+        else:
+            if not values:
+                raise PatchError(f"Patch {i}: `set` requis")
+            for row in selected:
+                for field, value in values.items():
+                    row[cols[field]] = _normalize(field, value)
+        touched.append(len(selected))
+    return rows, touched
+
+
+def colle_counts(slots, columns):
+    """Nombre de colles placées, au total et par matière."""
+    by_matiere = {}
+    total = 0
+    for cells in columns.values():
+        for s, value in enumerate(cells):
+            if value != "":
+                total += 1
+                mat = slots[s]["mat"]
+                by_matiere[mat] = by_matiere.get(mat, 0) + 1
+    return {"total": total, "par_matiere": by_matiere}
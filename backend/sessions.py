@@ -0,0 +1,240 @@
+"""
+Espace de travail par utilisateur (CSV uploadé, dernier planning généré).
+
+Remplace les variables globales de main.py : chaque utilisateur authentifié
+(et éventuellement chaque espace de travail via l'en-tête X-Workspace-Id)
+a ses propres données.
+
+- Cache local LRU borné (nombre d'entrées + taille totale) avec TTL.
+- Backend partagé optionnel (MongoDB ou serveur compatible Redis) pour que
+  plusieurs workers uvicorn / plusieurs machines servent le même utilisateur.
+
+Configuration (.env) :
+    SESSION_BACKEND=memory|mongodb|redis   (défaut: memory)
+    SESSION_TTL_SECONDS=28800
+    SESSION_MAX_ENTRIES=1000
+    SESSION_MAX_BYTES=268435456
+    REDIS_URL=redis://localhost:6379/0     (si SESSION_BACKEND=redis)
+"""
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory").lower()
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(8 * 3600)))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "1000"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(256 * 1024 * 1024)))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+DEFAULT_WORKSPACE = "default"
+
+
+def _size_of(value) -> int:
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return len(str(value))
+
+
+class LRUCache:
+    """Cache en mémoire: LRU + TTL + budget mémoire (taille approximative des valeurs)."""
+
+    def __init__(self, max_entries=SESSION_MAX_ENTRIES, max_bytes=SESSION_MAX_BYTES, ttl=SESSION_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (value, version, expires_at, size)
+
+    def get(self, key):
+        """Retourne (value, version) ou None."""
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        value, version, expires_at, _ = item
+        if expires_at < time.monotonic():
+            self.delete(key)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value, version
+
+    def set(self, key, value, version=None):
+        self.delete(key)
+        size = _size_of(value)
+        if size > self.max_bytes:
+            # Trop gros pour le cache local: on laisse le backend partagé s'en charger
+            return
+        self._data[key] = (value, version, time.monotonic() + self.ttl, size)
+        self.total_bytes += size
+        self._evict()
+
+    def delete(self, key):
+        item = self._data.pop(key, None)
+        if item is not None:
+            self.total_bytes -= item[3]
+
+    def _evict(self):
+        while self._data and (len(self._data) > self.max_entries or self.total_bytes > self.max_bytes):
+            _, item = self._data.popitem(last=False)
+            self.total_bytes -= item[3]
+
+    def __len__(self):
+        return len(self._data)
+
+
+# -----------------------
+# Backends partagés
+# -----------------------
+class MongoSessionBackend:
+    """Collection `sessions` avec index TTL sur expires_at."""
+
+    def __init__(self, database, ttl=SESSION_TTL_SECONDS):
+        self.col = database.sessions
+        self.ttl = ttl
+
+    async def init(self):
+        await self.col.create_index("expires_at", expireAfterSeconds=0)
+
+    async def get(self, key):
+        d = await self.col.find_one({"_id": key})
+        if not d:
+            return None
+        return d.get("value"), d.get("version")
+
+    async def get_version(self, key):
+        d = await self.col.find_one({"_id": key}, {"version": 1})
+        return d.get("version") if d else None
+
+    async def set(self, key, value, version):
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+        await self.col.replace_one(
+            {"_id": key},
+            {"_id": key, "value": value, "version": version, "expires_at": expires_at},
+            upsert=True,
+        )
+
+    async def delete(self, key):
+        await self.col.delete_one({"_id": key})
+
+
+class RedisSessionBackend:
+    """Serveur compatible Redis (Redis, Valkey, KeyDB...). Nécessite `pip install redis`."""
+
+    def __init__(self, url=REDIS_URL, ttl=SESSION_TTL_SECONDS):
+        try:
+            import redis.asyncio as aioredis
+        except ImportError as e:
+            raise RuntimeError("SESSION_BACKEND=redis nécessite le paquet `redis` (pip install redis)") from e
+        self.client = aioredis.from_url(url)
+        self.ttl = ttl
+
+    async def get(self, key):
+        value, version = await self.client.hmget(f"session:{key}", "value", "version")
+        if value is None:
+            return None
+        return value.decode("utf-8"), version.decode("utf-8") if version else None
+
+    async def get_version(self, key):
+        version = await self.client.hget(f"session:{key}", "version")
+        return version.decode("utf-8") if version else None
+
+    async def set(self, key, value, version):
+        pipe = self.client.pipeline()
+        pipe.hset(f"session:{key}", mapping={"value": value, "version": version})
+        pipe.expire(f"session:{key}", self.ttl)
+        await pipe.execute()
+
+    async def delete(self, key):
+        await self.client.delete(f"session:{key}")
+
+
+# -----------------------
+# Store
+# -----------------------
+class SessionStore:
+    """
+    Cache local devant un backend partagé optionnel.
+    Avec un backend partagé, une entrée locale n'est servie que si sa version
+    correspond à celle du backend (lecture de la seule version, pas du contenu),
+    ce qui garde les workers cohérents sans retransférer les gros CSV.
+    """
+
+    def __init__(self, backend=None, cache: Optional[LRUCache] = None):
+        self.backend = backend
+        self.cache = cache or LRUCache()
+
+    async def init(self):
+        """À appeler au démarrage (lifespan): index du backend partagé."""
+        if self.backend is not None and hasattr(self.backend, "init"):
+            await self.backend.init()
+
+    @staticmethod
+    def make_key(user: str, workspace: Optional[str], name: str) -> str:
+        return f"{user}:{workspace or DEFAULT_WORKSPACE}:{name}"
+
+    async def get(self, key):
+        local = self.cache.get(key)
+        if self.backend is None:
+            return local[0] if local else None
+        if local is not None:
+            if await self.backend.get_version(key) == local[1]:
+                return local[0]
+        remote = await self.backend.get(key)
+        if remote is None:
+            self.cache.delete(key)
+            return None
+        value, version = remote
+        self.cache.set(key, value, version)
+        return value
+
+    async def set(self, key, value):
+        version = uuid.uuid4().hex
+        if self.backend is not None:
+            await self.backend.set(key, value, version)
+        self.cache.set(key, value, version)
+
+    async def delete(self, key):
+        if self.backend is not None:
+            await self.backend.delete(key)
+        self.cache.delete(key)
+
+    def for_user(self, user: str, workspace: Optional[str] = None) -> "UserSession":
+        return UserSession(self, user, workspace)
+
+
+class UserSession:
+    """Vue sur le store restreinte à un utilisateur / espace de travail."""
+
+    def __init__(self, store: SessionStore, user: str, workspace: Optional[str] = None):
+        self.store = store
+        self.user = user
+        self.workspace = workspace or DEFAULT_WORKSPACE
+
+    async def get(self, name):
+        return await self.store.get(SessionStore.make_key(self.user, self.workspace, name))
+
+    async def set(self, name, value):
+        await self.store.set(SessionStore.make_key(self.user, self.workspace, name), value)
+
+    async def delete(self, name):
+        await self.store.delete(SessionStore.make_key(self.user, self.workspace, name))
+
+
+def create_session_store(database=None) -> SessionStore:
+    """Construit le store selon SESSION_BACKEND (repli sur la mémoire si MongoDB absent)."""
+    backend = None
+    if SESSION_BACKEND == "mongodb":
+        if database is not None:
+            backend = MongoSessionBackend(database)
+        else:
+            print("[WARN] SESSION_BACKEND=mongodb mais MongoDB non configuré: sessions en mémoire")
+    elif SESSION_BACKEND == "redis":
+        backend = RedisSessionBackend()
+    return SessionStore(backend)
@@ -0,0 +1,596 @@
+"""
+Solveur CP-SAT (OR-Tools) des plannings de colles.
+
+OR-Tools et pandas sont importés dans les fonctions qui les utilisent : le
+module reste léger pour l'API, qui l'exécute via backend/solver_pool.py
+(thread ou processus préchauffés).
+"""
+import io
+
+from backend.frequency_rules import CompiledRules
+from backend.solver_capture import maybe_capture
+from backend.telemetry import SolverTelemetry
+
+
+# -----------------------
+# Utils parsing groupes
+# -----------------------
+def parse_groups(txt):
+    # Cellule vide: '' ou NaN (pd.read_csv)
+    if txt is None or txt == '' or (isinstance(txt, float) and txt != txt):
+        return []
+    if 'à' in txt:
+        a, b = txt.split('à')
+        return list(range(int(a.strip()), int(b.strip()) + 1))
+    return [int(str(txt).strip())]
+
+def extract_all_groups(df):
+    all_groups = set()
+    for _, row in df.iterrows():
+        all_groups.update(parse_groups(row['Groupes possibles semaine paire']))
+        all_groups.update(parse_groups(row['Groupes possibles semaine impaire']))
+    return sorted(list(all_groups))
+
+# -----------------------
+# Utils semaines dynamiques
+# -----------------------
+def extract_week_columns(df):
+    """
+    Retourne les colonnes semaines dans l'ordre du CSV.
+    Ex: ["38","39","41","42",...], et leur version int.
+    On ne trie pas : on respecte l'ordre fourni dans le fichier.
+    """
+    weeks_str = []
+    for c in df.columns:
+        if isinstance(c, str) and c.strip().isdigit():
+            weeks_str.append(c.strip())
+    weeks_int = [int(w) for w in weeks_str]
+    return weeks_str, weeks_int
+
+def parse_hhmm_range_to_minutes(hhmm_range):
+    # "17h-18h" -> (1020, 1080)
+    deb, fin = [p.strip() for p in str(hhmm_range).split('-')]
+    def h2m(p):
+        parts = str(p).split('h')
+        h = int(parts[0]) if parts[0] else 0
+        m = int(parts[1]) if len(parts) > 1 and parts[1] else 0
+        return h * 60 + m
+    return h2m(deb), h2m(fin)
+
+# -----------------------
+# Génération OR-Tools avec semaines dynamiques
+# -----------------------
+MODE_MESSAGES = {
+    "strict": "Planning généré (semaines dynamiques, consécutives interdites)",
+    "relaxed": "Planning généré (semaines dynamiques, contraintes relâchées, consécutives interdites)",
+    "maximize": "Planning généré (semaines dynamiques, max colles & min colles consécutives)"
+}
+
+def extract_slots(df):
+    """
+    Transforme les lignes du CSV (déjà normalisées) en créneaux pour le solveur.
+    """
+    slots = []
+    for _, row in df.iterrows():
+        slots.append(dict(
+            mat=row['Matière'],
+            prof=row['Prof'],
+            day=row['Jour'],
+            hour=row['Heure'],
+            even=parse_groups(row['Groupes possibles semaine paire']),
+            odd=parse_groups(row['Groupes possibles semaine impaire']),
+            works_even=(str(row['Travaille les semaines paires']).strip() == 'Oui'),
+            works_odd=(str(row['Travaille les semaines impaires']).strip() == 'Oui')
+        ))
+    return slots
+
+def slot_input_from_rows(header, rows):
+    """
+    (en-tête, lignes) en chaînes -> (créneaux, groupes, semaines str, semaines int), sans pandas.
+    Mêmes normalisations que prepare_planning_input + extract_slots.
+    """
+    col = {name: header.index(name) for name in (
+        'Matière', 'Prof', 'Jour', 'Heure',
+        'Groupes possibles semaine paire', 'Groupes possibles semaine impaire',
+        'Travaille les semaines paires', 'Travaille les semaines impaires',
+    )}
+    slots = []
+    for row in rows:
+        slots.append(dict(
+            mat=row[col['Matière']],
+            prof=row[col['Prof']],
+            day=row[col['Jour']].strip(),
+            hour=row[col['Heure']].replace(' ', '').strip(),
+            even=parse_groups(row[col['Groupes possibles semaine paire']].strip()),
+            odd=parse_groups(row[col['Groupes possibles semaine impaire']].strip()),
+            works_even=(row[col['Travaille les semaines paires']].strip() == 'Oui'),
+            works_odd=(row[col['Travaille les semaines impaires']].strip() == 'Oui'),
+        ))
+    groups = sorted({g for sl in slots for g in sl['even'] + sl['odd']})
+    weeks_str = [c.strip() for c in header if c.strip().isdigit()]
+    return slots, groups, weeks_str, [int(w) for w in weeks_str]
+
+def add_class_model(model, slots, groups, weeks_str, weeks_int, mode, tel, prefix="", prof_unique=True, busy=None,
+                    rules=None):
+    """
+    Ajoute à `model` les variables et contraintes d'une classe ; retourne X[(slot, semaine, groupe)].
+    `prefix` distingue les variables de plusieurs classes dans un même modèle ; `prof_unique=False`
+    quand l'unicité des profs est posée pour toutes les classes à la fois (add_shared_prof_capacity).
+    `busy`: clés (prof, semaine, jour, heure) déjà occupées dans d'autres plannings du lycée
+    (backend.colleur_index), sans variable.
+    `rules`: règles de fréquence de la classe (backend.frequency_rules, défaut DEFAULT_RULES).
+    """
+    tel.step("model_setup")
+
+    # Valeurs distinctes (ordre d'apparition, comme df[...].unique())
+    profs = list(dict.fromkeys(sl['prof'] for sl in slots))
+    days = list(dict.fromkeys(sl['day'] for sl in slots))
+    hours = list(dict.fromkeys(sl['hour'] for sl in slots))
+
+    # Règles compilées une fois: créneaux de chaque matière, fenêtres de semaines (ordre du CSV)
+    compiled = CompiledRules(rules, [sl['mat'] for sl in slots], [sl['prof'] for sl in slots], len(weeks_str))
+
+    X = {}
+
+    # Variables: respect pair/impair + autorisations par slot
+    tel.step("variables")
+    busy = {tuple(k) for k in busy} if busy else set()
+    for s, slot in enumerate(slots):
+        for w_str, w_int in zip(weeks_str, weeks_int):
+            if busy and (prof_key(slot['prof']), w_str, slot['day'], slot['hour']) in busy:
+                continue
+            for g in groups:
+                if (w_int % 2 == 0 and (g not in slot['even'] or not slot['works_even'])) or \
+                   (w_int % 2 == 1 and (g not in slot['odd'] or not slot['works_odd'])):
+                    continue
+                X[s, w_str, g] = model.NewBoolVar(f"x_{prefix}{s}_{w_str}_{g}")
+
+    # 1) Un seul groupe par slot/semaine
+    tel.step("constraints.one_group_per_slot", model)
+    for s in range(len(slots)):
+        for w_str in weeks_str:
+            model.Add(sum(X.get((s, w_str, g), 0) for g in groups) <= 1)
+
+    # 1bis) Prof unique par créneau (hors maximize)
+    tel.step("constraints.prof_unique", model)
+    if prof_unique and mode != "maximize":
+        for w_str in weeks_str:
+            for prof in profs:
+                for day in days:
+                    for hour in hours:
+                        model.Add(
+                            sum(
+                                X.get((s, w_str, g), 0)
+                                for s, sl in enumerate(slots)
+                                if sl['prof'] == prof and sl['day'] == day and sl['hour'] == hour
+                                for g in groups
+                            ) <= 1
+                        )
+
+    # 2) Fréquences par matière (selon mode) sur fenêtres dynamiques
+    tel.step("constraints.frequency", model)
+    compiled.add_frequency_constraints(model, X, groups, weeks_str, mode)
+
+    # 3) Rotation profs sur fenêtres adjacentes (hors maximize)
+    tel.step("constraints.prof_rotation", model)
+    compiled.add_rotation_constraints(model, X, groups, weeks_str, mode)
+
+    # 4) Pas deux colles même jour+heure pour un groupe
+    tel.step("constraints.group_same_time", model)
+    for g in groups:
+        for w_str in weeks_str:
+            for day in days:
+                for hour in hours:
+                    model.Add(
+                        sum(
+                            X.get((s, w_str, g), 0)
+                            for s, sl in enumerate(slots)
+                            if sl['day'] == day and sl['hour'] == hour
+                        ) <= 1
+                    )
+
+    # 5) Charge hebdo (bornes)
+    tel.step("constraints.weekly_load", model)
+    for g in groups:
+        for w_str in weeks_str:
+            load = sum(X.get((s, w_str, g), 0) for s in range(len(slots)))
+            if mode != "maximize" and compiled.min_per_week is not None:
+                model.Add(load >= compiled.min_per_week)
+            if compiled.max_per_week is not None:
+                model.Add(load <= compiled.max_per_week)
+
+    # 6) Interdire systématiquement les colles consécutives (hard constraint)
+    tel.step("constraints.no_back_to_back", model)
+    for g in groups:
+        for w_str in weeks_str:
+            for day in days:
+                # Créneaux de ce jour (triés par heure de début)
+                slots_day = [(s, sl) for s, sl in enumerate(slots) if sl['day'] == day]
+                slots_day.sort(key=lambda x: parse_hhmm_range_to_minutes(x[1]['hour'])[0])
+
+                for i in range(len(slots_day) - 1):
+                    s1, sl1 = slots_day[i]
+                    s2, sl2 = slots_day[i + 1]
+                    _, end1 = parse_hhmm_range_to_minutes(sl1['hour'])
+                    start2, _ = parse_hhmm_range_to_minutes(sl2['hour'])
+
+                    if end1 == start2:
+                        # HARD: jamais 2 colles back-to-back pour un groupe
+                        model.Add(X.get((s1, w_str, g), 0) + X.get((s2, w_str, g), 0) <= 1)
+    
+        # (Hard) Au plus 1 colle par jour pour chaque groupe et semaine
+    tel.step("constraints.one_per_day", model)
+    if compiled.max_per_day is not None:
+        for g in groups:
+            for w_str in weeks_str:
+                for day in days:
+                    model.Add(
+                        sum(
+                            X.get((s, w_str, g), 0)
+                            for s, sl in enumerate(slots)
+                            if sl['day'] == day
+                        ) <= compiled.max_per_day
+                    )
+    tel.step(None)
+    return X
+
+def read_columns(solver, X, n_slots, groups, weeks_str):
+    """{semaine: [groupe affecté ou '' pour chaque créneau]} depuis la solution."""
+    columns = {}
+    for w_str in weeks_str:
+        col = []
+        for s in range(n_slots):
+            g_found = ''
+            for g in groups:
+                if (s, w_str, g) in X and solver.Value(X[s, w_str, g]) == 1:
+                    g_found = str(g)
+                    break
+            col.append(g_found)
+        columns[w_str] = col
+    return columns
+
+def solve_slots(slots, groups, weeks_str, weeks_int, mode="strict", telemetry=None, busy=None, rules=None):
+    """
+    Construit et résout le modèle CP-SAT à partir des créneaux.
+    Retourne {semaine: [groupe affecté ou '' pour chaque créneau]} ou None si aucune solution.
+    Utilisé tel quel par le chemin CSV et par le chemin formulaire.
+    `telemetry` (SolverTelemetry) reçoit les durées par phase, la taille du modèle et les stats CP-SAT.
+    `busy`: créneaux de colleurs interdits, `rules`: règles de fréquence (voir add_class_model).
+    """
+    from ortools.sat.python import cp_model
+    tel = telemetry or SolverTelemetry(mode)
+    model = cp_model.CpModel()
+    X = add_class_model(model, slots, groups, weeks_str, weeks_int, mode, tel, busy=busy, rules=rules)
+
+    # Objectif
+    tel.step("objective")
+    if mode == "maximize":
+        model.Maximize(sum(X.values()))
+
+    # Solve
+    tel.step(None)
+    tel.record_model(model, slots=len(slots), groups=len(groups), weeks=len(weeks_str))
+    if busy:
+        tel.model["busy_slots"] = len(busy)
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = 30
+    with tel.phase("solve"):
+        status = solver.Solve(model)
+    tel.record_solver(solver, status, cp_model, has_objective=(mode == "maximize"))
+    # Résolution lente ou en échec: modèle + entrée sur disque si SOLVER_CAPTURE_DIR est défini
+    maybe_capture(model, solver, tel, {
+        "mode": mode, "slots": slots, "groups": groups, "weeks_str": weeks_str, "weeks_int": weeks_int,
+        "busy": [list(k) for k in busy or ()], "rules": rules,
+    })
+
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return None
+
+    # Lecture de la solution: une colonne par semaine détectée
+    tel.step("extract_solution")
+    columns = read_columns(solver, X, len(slots), groups, weeks_str)
+    tel.step(None)
+    return columns
+
+def solve_slots_with_telemetry(slots, groups, weeks_str, weeks_int, mode="strict", busy=None, rules=None):
+    """solve_slots + télémétrie sérialisable (appel depuis le pool de processus)."""
+    telemetry = SolverTelemetry(mode)
+    columns = solve_slots(slots, groups, weeks_str, weeks_int, mode, telemetry, busy, rules)
+    return columns, telemetry.to_dict()
+
+def prepare_planning_input(csv_content, tel):
+    """
+    CSV -> (df normalisé, groupes, semaines str, semaines int, créneaux), ou (None, message d'erreur).
+    """
+    import pandas as pd
+    tel.step("csv_parse")
+    df = pd.read_csv(io.StringIO(csv_content), sep=';')
+
+    # Normalisation pour fiabiliser les contraintes
+    df['Jour'] = df['Jour'].astype(str).str.strip()
+    df['Heure'] = (
+        df['Heure'].astype(str)
+        .str.replace(' ', '', regex=False)  # "18h - 19h" -> "18h-19h"
+        .str.strip()
+    )
+
+    tel.step("slot_extraction")
+    groups = extract_all_groups(df)
+    if not groups:
+        tel.step(None)
+        return None, "Aucun groupe détecté dans le CSV"
+
+    # Semaines dynamiques depuis le CSV (ordre respecté, non trié)
+    weeks_str, weeks_int = extract_week_columns(df)
+    if not weeks_str:
+        tel.step(None)
+        return None, "Aucune colonne de semaine détectée dans le CSV"
+
+    # Création des slots
+    slots = extract_slots(df)
+    tel.step(None)
+    return (df, groups, weeks_str, weeks_int, slots), None
+
+def generate_planning_with_ortools(csv_content, mode="strict", busy=None, rules=None):
+    """
+    Retourne (df ou None, message, télémétrie).
+    Mode:
+    - "strict": contraintes strictes (== 1) + interdit colles consécutives
+    - "relaxed": fréquence >= 1 + interdit colles consécutives
+    - "maximize": objectif de maximisation + minimise colles consécutives (pénalité douce)
+    `busy`: créneaux de colleurs déjà occupés dans d'autres plannings du lycée (interdits).
+    `rules`: règles de fréquence de la classe (backend.frequency_rules).
+    """
+    tel = SolverTelemetry(mode)
+    prepared, error = prepare_planning_input(csv_content, tel)
+    if prepared is None:
+        return None, error, tel.to_dict()
+    df, groups, weeks_str, weeks_int, slots = prepared
+
+    columns = solve_slots(slots, groups, weeks_str, weeks_int, mode, tel, busy, rules)
+    if columns is None:
+        return None, f"Aucune solution trouvée en mode {mode}", tel.to_dict()
+
+    # Injection: (ré)écrit uniquement les colonnes semaines détectées
+    with tel.phase("result_injection"):
+        for w_str in weeks_str:
+            df[w_str] = columns[w_str]
+
+    #df = adjust_late_slots(df)
+    return df, MODE_MESSAGES.get(mode, f"Planning généré en mode {mode}"), tel.to_dict()
+
+# -----------------------
+# Génération conjointe de plusieurs classes (colleurs partagés)
+# -----------------------
+def prof_key(prof):
+    return str(prof).strip()
+
+def class_components(profs_by_class):
+    """
+    Regroupe les classes qui partagent au moins un colleur ({classe: profs} -> [[classes], ...]).
+    Des classes sans colleur commun n'interagissent pas: chaque groupe se résout séparément.
+    """
+    names = list(profs_by_class)
+    parent = {name: name for name in names}
+
+    def find(name):
+        while parent[name] != name:
+            parent[name] = parent[parent[name]]
+            name = parent[name]
+        return name
+
+    owner = {}
+    for name in names:
+        for prof in profs_by_class[name]:
+            key = prof_key(prof)
+            if key in owner:
+                parent[find(name)] = find(owner[key])
+            else:
+                owner[key] = name
+    components = {}
+    for name in names:
+        components.setdefault(find(name), []).append(name)
+    return list(components.values())
+
+def add_shared_prof_capacity(model, classes, Xs, mode="strict"):
+    """
+    Un colleur a au plus une colle par (semaine, jour, heure), toutes classes confondues.
+    En maximize, comme pour une classe seule (add_class_model, 1bis), l'unicité n'est pas imposée
+    à l'intérieur d'une classe ; seul reste interdit qu'une même case soit prise par deux classes,
+    ce qu'évite précisément la génération conjointe.
+    """
+    buckets = {}
+    for name, cls in classes.items():
+        slots = cls["slots"]
+        for (s, w_str, g), var in Xs[name].items():
+            sl = slots[s]
+            key = (prof_key(sl['prof']), w_str, sl['day'], sl['hour'])
+            buckets.setdefault(key, {}).setdefault(name, []).append(var)
+    for by_class in buckets.values():
+        if mode != "maximize":
+            variables = [v for vs in by_class.values() for v in vs]
+            if len(variables) > 1:
+                model.Add(sum(variables) <= 1)
+        elif len(by_class) > 1:
+            # Case occupée par la classe: au moins une de ses colles y est placée
+            used = []
+            for variables in by_class.values():
+                if len(variables) == 1:
+                    used.append(variables[0])
+                    continue
+                taken = model.NewBoolVar("")
+                for v in variables:
+                    model.AddImplication(v, taken)
+                used.append(taken)
+            model.Add(sum(used) <= 1)
+
+def solve_classes(classes, mode="strict", telemetry=None):
+    """
+    Résout ensemble plusieurs classes ({classe: {slots, groups, weeks_str, weeks_int, rules?}}) dans un seul
+    modèle: contraintes propres à chaque classe (avec ses règles de fréquence) + capacité des colleurs partagée.
+    Retourne {classe: colonnes} ou None si aucune solution.
+    """
+    from ortools.sat.python import cp_model
+    tel = telemetry or SolverTelemetry(mode)
+    model = cp_model.CpModel()
+    Xs = {}
+    for i, (name, cls) in enumerate(classes.items()):
+        Xs[name] = add_class_model(
+            model, cls["slots"], cls["groups"], cls["weeks_str"], cls["weeks_int"], mode, tel,
+            prefix=f"c{i}_", prof_unique=False, rules=cls.get("rules"),
+        )
+    tel.step("constraints.shared_prof_capacity", model)
+    add_shared_prof_capacity(model, classes, Xs, mode)
+
+    tel.step("objective")
+    if mode == "maximize":
+        model.Maximize(sum(v for X in Xs.values() for v in X.values()))
+
+    tel.step(None)
+    tel.record_model(
+        model, classes=len(classes), slots=sum(len(c["slots"]) for c in classes.values()),
+        groups=sum(len(c["groups"]) for c in classes.values()),
+    )
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = 30
+    with tel.phase("solve"):
+        status = solver.Solve(model)
+    tel.record_solver(solver, status, cp_model, has_objective=(mode == "maximize"))
+    maybe_capture(model, solver, tel, {"mode": mode, "classes": classes})
+
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return None
+
+    tel.step("extract_solution")
+    result = {
+        name: read_columns(solver, Xs[name], len(cls["slots"]), cls["groups"], cls["weeks_str"])
+        for name, cls in classes.items()
+    }
+    tel.step(None)
+    return result
+
+def solve_classes_with_telemetry(classes, mode="strict"):
+    """solve_classes + télémétrie sérialisable (appel depuis le pool de processus)."""
+    telemetry = SolverTelemetry(mode)
+    result = solve_classes(classes, mode, telemetry)
+    return result, telemetry.to_dict()
+
+def generate_batch_with_ortools(class_csvs, mode="strict", rules_by_class=None):
+    """
+    Génère conjointement les plannings de plusieurs classes ({classe: CSV}, règles de fréquence
+    {classe: règles} optionnelles). Retourne ({classe: df} ou None, message, télémétrie).
+    """
+    tel = SolverTelemetry(mode)
+    prepared = {}
+    for name, csv_content in class_csvs.items():
+        data, error = prepare_planning_input(csv_content, tel)
+        if data is None:
+            return None, f"{name}: {error}", tel.to_dict()
+        prepared[name] = data
+
+    classes = {
+        name: {"slots": slots, "groups": groups, "weeks_str": weeks_str, "weeks_int": weeks_int,
+               "rules": (rules_by_class or {}).get(name)}
+        for name, (_, groups, weeks_str, weeks_int, slots) in prepared.items()
+    }
+    result = solve_classes(classes, mode, tel)
+    if result is None:
+        return None, f"Aucune solution trouvée en mode {mode}", tel.to_dict()
+
+    plannings = {}
+    with tel.phase("result_injection"):
+        for name, (df, _, weeks_str, _, _) in prepared.items():
+            for w_str in weeks_str:
+                df[w_str] = result[name][w_str]
+            plannings[name] = df
+    return plannings, MODE_MESSAGES.get(mode, f"Planning généré en mode {mode}"), tel.to_dict()
+
+# -----------------------
+# Plusieurs plannings différents en une session de résolution
+# -----------------------
+ALTERNATIVE_MAX_SECONDS = 10  # par solution au-delà de la première
+
+def hamming(columns_a, columns_b):
+    """Nombre de cases (créneau, semaine) dont le groupe diffère entre deux solutions."""
+    return sum(a != b for w in columns_a for a, b in zip(columns_a[w], columns_b[w]))
+
+def add_distance_constraint(model, X, columns, groups, min_distance):
+    """
+    Impose au moins `min_distance` cases différentes de `columns` (distance de Hamming linéaire:
+    case remplie -> 1 - x du groupe affecté, case vide -> somme des x de la case).
+    """
+    terms = []
+    for w_str, col in columns.items():
+        for s, value in enumerate(col):
+            if value != '':
+                terms.append(1 - X[s, w_str, int(value)])
+            else:
+                terms.extend(X[s, w_str, g] for g in groups if (s, w_str, g) in X)
+    model.Add(sum(terms) >= min_distance)
+
+def generate_planning_alternatives(csv_content, mode="strict", k=3, min_distance=None, rules=None):
+    """
+    Jusqu'à k plannings, chacun différant des précédents d'au moins `min_distance` cases
+    (défaut: 5 % des colles de la première solution). Le modèle est construit une fois puis complété
+    d'une contrainte de distance par solution trouvée ; la solution précédente sert d'indice (hint).
+    En mode maximize, chaque solution est la meilleure parmi celles assez éloignées des précédentes.
+    Retourne ([df, ...] (vide si aucune solution), message, télémétrie).
+    """
+    from ortools.sat.python import cp_model
+    tel = SolverTelemetry(mode)
+    prepared, error = prepare_planning_input(csv_content, tel)
+    if prepared is None:
+        return [], error, tel.to_dict()
+    df, groups, weeks_str, weeks_int, slots = prepared
+
+    model = cp_model.CpModel()
+    X = add_class_model(model, slots, groups, weeks_str, weeks_int, mode, tel, rules=rules)
+    tel.step("objective")
+    if mode == "maximize":
+        model.Maximize(sum(X.values()))
+    tel.step(None)
+    tel.record_model(model, slots=len(slots), groups=len(groups), weeks=len(weeks_str))
+
+    solutions, stats = [], []
+    for i in range(k):
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = 30 if i == 0 else ALTERNATIVE_MAX_SECONDS
+        with tel.phase("solve"):
+            status = solver.Solve(model)
+        tel.record_solver(solver, status, cp_model, has_objective=(mode == "maximize"))
+        stats.append(tel.solver)
+        if i == 0:
+            maybe_capture(model, solver, tel, {
+                "mode": mode, "slots": slots, "groups": groups, "weeks_str": weeks_str, "weeks_int": weeks_int,
+                "rules": rules,
+            })
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            break
+        with tel.phase("extract_solution"):
+            columns = read_columns(solver, X, len(slots), groups, weeks_str)
+            solutions.append(columns)
+        if i + 1 < k:
+            with tel.phase("diversity"):
+                if min_distance is None:
+                    filled = sum(v != '' for col in columns.values() for v in col)
+                    min_distance = max(1, round(0.05 * filled))
+                add_distance_constraint(model, X, columns, groups, min_distance)
+                model.ClearHints()
+                for (s, w_str, g), var in X.items():
+                    model.AddHint(var, int(columns[w_str][s] == str(g)))
+    tel.solver = {**(stats[0] if stats else {}), "alternatives": stats, "min_distance": min_distance}
+
+    if not solutions:
+        return [], f"Aucune solution trouvée en mode {mode}", tel.to_dict()
+
+    plannings = []
+    with tel.phase("result_injection"):
+        for columns in solutions:
+            planning = df.copy()
+            for w_str in weeks_str:
+                planning[w_str] = columns[w_str]
+            plannings.append(planning)
+    tel.solver["distances"] = [
+        [hamming(a, b) for b in solutions] for a in solutions
+    ]
+    return plannings, MODE_MESSAGES.get(mode, f"Planning généré en mode {mode}"), tel.to_dict()
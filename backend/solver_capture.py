@@ -0,0 +1,102 @@
+"""
+Capture des résolutions lentes ou en échec, pour les rejouer hors ligne
+(python -m backend.bench.replay_capture).
+
+Désactivée par défaut. Avec SOLVER_CAPTURE_DIR, chaque résolution plus longue
+que SOLVER_CAPTURE_SECONDS, ou terminée avec un statut de SOLVER_CAPTURE_STATUSES,
+écrit un répertoire :
+
+    <SOLVER_CAPTURE_DIR>/<date>-<mode>-<statut>-<id>/
+        model.pb.gz      modèle CP-SAT construit (CpModelProto sérialisé)
+        params.txt       paramètres du solveur (SatParameters, format texte protobuf)
+        input.json       entrée normalisée de solve_slots / solve_classes (créneaux, groupes, semaines, mode)
+        response.json    télémétrie (phases, taille du modèle, statistiques CP-SAT)
+
+Configuration (.env) :
+    SOLVER_CAPTURE_DIR=/var/lib/planning-colles/captures
+    SOLVER_CAPTURE_SECONDS=10
+    SOLVER_CAPTURE_STATUSES=INFEASIBLE,UNKNOWN,MODEL_INVALID
+"""
+import gzip
+import json
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+SOLVER_CAPTURE_DIR = os.getenv("SOLVER_CAPTURE_DIR")
+SOLVER_CAPTURE_SECONDS = float(os.getenv("SOLVER_CAPTURE_SECONDS", "10"))
+SOLVER_CAPTURE_STATUSES = {
+    s.strip().upper() for s in os.getenv("SOLVER_CAPTURE_STATUSES", "INFEASIBLE,UNKNOWN,MODEL_INVALID").split(",")
+    if s.strip()
+}
+
+MODEL_FILE = "model.pb.gz"
+PARAMS_FILE = "params.txt"
+INPUT_FILE = "input.json"
+RESPONSE_FILE = "response.json"
+
+
+def capture_reason(status_name: str, solve_seconds: float) -> Optional[str]:
+    """Motif de capture, ou None si la résolution n'en mérite pas."""
+    if not SOLVER_CAPTURE_DIR:
+        return None
+    if status_name in SOLVER_CAPTURE_STATUSES:
+        return f"status:{status_name}"
+    if solve_seconds > SOLVER_CAPTURE_SECONDS:
+        return f"slow:{solve_seconds:.1f}s>{SOLVER_CAPTURE_SECONDS:g}s"
+    return None
+
+
+def write_capture(model, solver, telemetry, inputs: dict, reason: str, directory: Optional[str] = None) -> str:
+    """Écrit la capture et renvoie son répertoire."""
+    status = telemetry.solver.get("status", "UNKNOWN")
+    now = datetime.now(timezone.utc)
+    name = f"{now.strftime('%Y%m%dT%H%M%S')}-{telemetry.mode}-{status}-{uuid.uuid4().hex[:8]}"
+    path = os.path.join(directory or SOLVER_CAPTURE_DIR, name)
+    os.makedirs(path)
+
+    with gzip.open(os.path.join(path, MODEL_FILE), "wb") as f:
+        f.write(model.Proto().SerializeToString())
+    with open(os.path.join(path, PARAMS_FILE), "w", encoding="utf-8") as f:
+        f.write(str(solver.parameters))
+    with open(os.path.join(path, INPUT_FILE), "w", encoding="utf-8") as f:
+        json.dump(inputs, f, ensure_ascii=False)
+    with open(os.path.join(path, RESPONSE_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "captured_at": now.isoformat(),
+            "reason": reason,
+            "telemetry": telemetry.to_dict(),
+            "response_stats": solver.ResponseStats(),
+        }, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def maybe_capture(model, solver, telemetry, inputs: dict):
+    """
+    Appelé par solve_slots après la résolution. Ne lève jamais : une capture
+    impossible (disque plein, droits) ne doit pas faire échouer la génération.
+    """
+    reason = capture_reason(telemetry.solver.get("status", ""), telemetry.phases.get("solve", 0.0))
+    if reason is None:
+        return None
+    try:
+        path = write_capture(model, solver, telemetry, inputs, reason)
+    except Exception as e:
+        print(f"[WARN] Capture du modèle échouée: {e}")
+        return None
+    telemetry.solver["capture"] = os.path.basename(path)
+    return path
+
+
+def load_capture(path: str) -> dict:
+    """-> {"model": bytes, "params": str, "input": dict, "response": dict} d'un répertoire de capture."""
+    with gzip.open(os.path.join(path, MODEL_FILE), "rb") as f:
+        model = f.read()
+    with open(os.path.join(path, PARAMS_FILE), encoding="utf-8") as f:
+        params = f.read()
+    with open(os.path.join(path, INPUT_FILE), encoding="utf-8") as f:
+        inputs = json.load(f)
+    with open(os.path.join(path, RESPONSE_FILE), encoding="utf-8") as f:
+        response = json.load(f)
+    return {"model": model, "params": params, "input": inputs, "response": response}
@@ -0,0 +1,130 @@
+"""
+Exécution du solveur hors de la boucle d'événements.
+
+- SOLVER_WORKERS=0 (défaut) : le solveur tourne dans un thread du process API.
+- SOLVER_WORKERS=N : pool de N processus démarré en arrière-plan au lancement
+  (lifespan). Chaque processus importe OR-Tools et résout un petit modèle à
+  vide, de sorte que la première vraie génération ne paie pas l'initialisation
+  de la bibliothèque native. Le process API n'importe alors jamais OR-Tools.
+
+Les fonctions du solveur sont appelées par leur nom (module backend.solver),
+ce qui évite de charger le module dans le process API pour les sérialiser.
+
+Avec une file (SOLVER_QUEUE, backend/solver_queue.py), les appels partent
+vers des workers séparés (python -m backend.solver_worker) : le process API
+ne démarre alors ni pool ni préchauffage.
+
+Configuration (.env) :
+    SOLVER_WORKERS=0
+    SOLVER_START_METHOD=forkserver   (spawn si indisponible ; fork déconseillé avec motor)
+    SOLVER_PREWARM=1                 (préchauffage en thread quand SOLVER_WORKERS=0)
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from backend.metrics import SOLVER_ACTIVE, SOLVER_QUEUE_DEPTH, track
+
+SOLVER_WORKERS = int(os.getenv("SOLVER_WORKERS", "0"))
+SOLVER_PREWARM = os.getenv("SOLVER_PREWARM", "1").lower() in ("1", "true", "yes")
+_DEFAULT_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+SOLVER_START_METHOD = os.getenv("SOLVER_START_METHOD", _DEFAULT_START_METHOD)
+
+
+def call_solver(name, *args, **kwargs):
+    """Appelle backend.solver.<name> (import à la demande, dans le process courant)."""
+    from backend import solver
+    return getattr(solver, name)(*args, **kwargs)
+
+
+def warm_up():
+    """Importe OR-Tools et résout un modèle trivial (chargement de la bibliothèque native)."""
+    from ortools.sat.python import cp_model
+    import backend.solver  # noqa: F401
+    model = cp_model.CpModel()
+    x = model.NewBoolVar("x")
+    model.Add(x == 1)
+    cp_model.CpSolver().Solve(model)
+    return os.getpid()
+
+
+class SolverPool:
+    def __init__(self, workers=SOLVER_WORKERS, start_method=SOLVER_START_METHOD, prewarm=SOLVER_PREWARM, queue=None):
+        self.queue = queue
+        self.workers = 0 if queue is not None else workers
+        self.start_method = start_method
+        self.prewarm = prewarm and queue is None
+        self.executor = None
+        self.warm = False
+        self.inflight = 0
+        self._warming = None
+
+    async def init(self):
+        """À appeler au démarrage (lifespan): index du backend de la file."""
+        if self.queue is not None:
+            await self.queue.init()
+
+    def start(self):
+        """Lance le pool (ou le préchauffage en thread) en arrière-plan ; n'attend pas."""
+        if self.workers > 0:
+            context = multiprocessing.get_context(self.start_method)
+            if self.start_method == "forkserver":
+                # Le serveur de fork charge OR-Tools une fois: les workers en héritent
+                context.set_forkserver_preload(["ortools.sat.python.cp_model", "backend.solver"])
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=context,
+                initializer=warm_up,
+            )
+        if self.workers > 0 or self.prewarm:
+            self._warming = asyncio.create_task(self._warm_all())
+        else:
+            self.warm = True
+
+    async def _warm_all(self):
+        try:
+            if self.executor is not None:
+                loop = asyncio.get_running_loop()
+                # Une tâche par worker: force la création de tous les processus
+                await asyncio.gather(*(loop.run_in_executor(self.executor, os.getpid) for _ in range(self.workers)))
+            else:
+                await asyncio.to_thread(warm_up)
+            self.warm = True
+        except Exception as e:
+            print(f"[WARN] Préchauffage du solveur échoué: {e}")
+
+    async def run(self, name, *args, **kwargs):
+        """Exécute backend.solver.<name>(*args) dans le pool, ou dans un thread sans pool."""
+        self._update_gauges(+1)
+        try:
+            with track(f"solver.{name}"):
+                if self.queue is not None:
+                    return await self.queue.call(name, args, kwargs)
+                if self.executor is not None:
+                    loop = asyncio.get_running_loop()
+                    return await loop.run_in_executor(self.executor, partial(call_solver, name, *args, **kwargs))
+                return await asyncio.to_thread(call_solver, name, *args, **kwargs)
+        finally:
+            self._update_gauges(-1)
+
+    def _update_gauges(self, delta):
+        self.inflight += delta
+        # Sans pool de processus, chaque appel a son thread: pas de file d'attente
+        active = min(self.inflight, self.workers) if self.executor is not None else self.inflight
+        SOLVER_ACTIVE.set(active)
+        SOLVER_QUEUE_DEPTH.set(self.inflight - active)
+
+    def status(self) -> dict:
+        status = {"workers": self.workers, "warm": self.warm, "inflight": self.inflight}
+        if self.queue is not None:
+            status["queue"] = self.queue.name
+        return status
+
+    async def shutdown(self):
+        if self._warming is not None and not self._warming.done():
+            self._warming.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,343 @@
+"""
+File de résolutions pour des workers solveur hors du process API
+(python -m backend.solver_worker), sur d'autres machines si besoin.
+
+Avec SOLVER_QUEUE défini, SolverPool.run ne résout plus localement : l'appel
+(nom de la fonction de backend.solver + arguments) devient un job de la file,
+un worker le prend, le résout et écrit le résultat, que l'API attend.
+
+- Bail (lease) : un job pris est réservé à son worker pendant
+  SOLVER_QUEUE_LEASE_SECONDS, prolongé par des battements de cœur
+  (SOLVER_QUEUE_HEARTBEAT_SECONDS). Un worker arrêté ou perdu laisse expirer
+  son bail : le job repart dans la file.
+- Reprises : au plus SOLVER_QUEUE_MAX_ATTEMPTS prises par job (bail expiré ou
+  exception du solveur), ensuite le job est en échec.
+- Idempotence : le premier résultat écrit est définitif ; un worker dont le
+  bail a été repris par un autre peut terminer, son résultat est ignoré.
+
+Jobs et résultats sont sérialisés avec pickle (DataFrame, télémétrie) : la
+file ne doit être accessible qu'à l'API et aux workers, avec la même version
+du code des deux côtés.
+
+Configuration (.env) :
+    SOLVER_QUEUE=                       (vide: pool local de solver_pool.py) | mongodb | redis
+    SOLVER_QUEUE_LEASE_SECONDS=30
+    SOLVER_QUEUE_HEARTBEAT_SECONDS=10
+    SOLVER_QUEUE_MAX_ATTEMPTS=3
+    SOLVER_QUEUE_TIMEOUT_SECONDS=600    (attente maximale d'un résultat côté API)
+    SOLVER_QUEUE_POLL_SECONDS=0.2
+    SOLVER_QUEUE_RESULT_TTL_SECONDS=3600
+    REDIS_URL=redis://localhost:6379/0  (si SOLVER_QUEUE=redis)
+"""
+import asyncio
+import os
+import pickle
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from bson import Binary
+from pymongo import ReturnDocument
+
+SOLVER_QUEUE = os.getenv("SOLVER_QUEUE", "").lower()
+SOLVER_QUEUE_LEASE_SECONDS = float(os.getenv("SOLVER_QUEUE_LEASE_SECONDS", "30"))
+SOLVER_QUEUE_HEARTBEAT_SECONDS = float(os.getenv("SOLVER_QUEUE_HEARTBEAT_SECONDS", "10"))
+SOLVER_QUEUE_MAX_ATTEMPTS = int(os.getenv("SOLVER_QUEUE_MAX_ATTEMPTS", "3"))
+SOLVER_QUEUE_TIMEOUT_SECONDS = float(os.getenv("SOLVER_QUEUE_TIMEOUT_SECONDS", "600"))
+SOLVER_QUEUE_POLL_SECONDS = float(os.getenv("SOLVER_QUEUE_POLL_SECONDS", "0.2"))
+SOLVER_QUEUE_RESULT_TTL_SECONDS = int(os.getenv("SOLVER_QUEUE_RESULT_TTL_SECONDS", "3600"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class SolverJobError(RuntimeError):
+    """Job en échec après ses reprises (message du worker), ou résultat non reçu à temps."""
+
+
+def encode_call(name, args, kwargs) -> bytes:
+    return pickle.dumps((name, args, kwargs), protocol=pickle.HIGHEST_PROTOCOL)
+
+def decode_call(payload: bytes):
+    return pickle.loads(payload)
+
+def encode_result(value) -> bytes:
+    return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+def decode_result(payload: bytes):
+    return pickle.loads(payload)
+
+
+class Job:
+    """Job pris par un worker."""
+
+    def __init__(self, job_id: str, payload: bytes, attempts: int):
+        self.id = job_id
+        self.payload = payload
+        self.attempts = attempts
+
+
+class JobQueue:
+    """Partie commune: soumission + attente du résultat (API)."""
+
+    name = "queue"
+
+    async def call(self, name, args, kwargs, timeout=SOLVER_QUEUE_TIMEOUT_SECONDS):
+        """Soumet backend.solver.<name>(*args, **kwargs) et attend son résultat."""
+        job_id = uuid.uuid4().hex
+        await self.submit(job_id, encode_call(name, args, kwargs))
+        deadline = time.monotonic() + timeout
+        while True:
+            state = await self.result(job_id)
+            if state is not None and state[0] == DONE:
+                return decode_result(state[1])
+            if state is not None and state[0] == FAILED:
+                raise SolverJobError(f"Job solveur {job_id} en échec: {state[2]}")
+            if time.monotonic() > deadline:
+                await self.cancel(job_id)
+                raise SolverJobError(f"Job solveur {job_id} sans résultat après {timeout:g}s")
+            await asyncio.sleep(SOLVER_QUEUE_POLL_SECONDS)
+
+
+# -----------------------
+# MongoDB
+# -----------------------
+class MongoJobQueue(JobQueue):
+    """Collection `solver_jobs` ; prise atomique par find_one_and_update."""
+
+    name = "mongodb"
+
+    def __init__(self, database, lease=SOLVER_QUEUE_LEASE_SECONDS, max_attempts=SOLVER_QUEUE_MAX_ATTEMPTS,
+                 result_ttl=SOLVER_QUEUE_RESULT_TTL_SECONDS):
+        self.col = database.solver_jobs
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.result_ttl = result_ttl
+
+    async def init(self):
+        await self.col.create_index([("status", 1), ("created_at", 1)])
+        await self.col.create_index([("status", 1), ("lease_until", 1)])
+        await self.col.create_index("expires_at", expireAfterSeconds=0)
+
+    async def submit(self, job_id: str, payload: bytes):
+        await self.col.insert_one({
+            "_id": job_id, "status": QUEUED, "payload": Binary(payload), "attempts": 0,
+            "created_at": datetime.now(timezone.utc),
+        })
+
+    async def result(self, job_id: str):
+        d = await self.col.find_one({"_id": job_id}, {"status": 1, "result": 1, "error": 1})
+        if d is None:
+            return None
+        return d["status"], bytes(d["result"]) if d.get("result") is not None else None, d.get("error")
+
+    async def cancel(self, job_id: str):
+        await self.col.delete_one({"_id": job_id, "status": {"$in": [QUEUED, RUNNING]}})
+
+    def _finished(self, status, **fields):
+        now = datetime.now(timezone.utc)
+        return {"$set": {"status": status, "finished_at": now,
+                         "expires_at": now + timedelta(seconds=self.result_ttl), **fields},
+                "$unset": {"payload": "", "lease_until": ""}}
+
+    async def claim(self, worker_id: str) -> Optional[Job]:
+        now = datetime.now(timezone.utc)
+        # Baux expirés trop de fois: le job ne repart plus
+        await self.col.update_many(
+            {"status": RUNNING, "lease_until": {"$lt": now}, "attempts": {"$gte": self.max_attempts}},
+            self._finished(FAILED, error=f"bail expiré {self.max_attempts} fois (worker arrêté ?)"),
+        )
+        d = await self.col.find_one_and_update(
+            {"$or": [
+                {"status": QUEUED},
+                {"status": RUNNING, "lease_until": {"$lt": now}, "attempts": {"$lt": self.max_attempts}},
+            ]},
+            {"$set": {"status": RUNNING, "worker": worker_id, "lease_until": now + timedelta(seconds=self.lease),
+                      "heartbeat_at": now},
+             "$inc": {"attempts": 1}},
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if d is None:
+            return None
+        return Job(d["_id"], bytes(d["payload"]), d["attempts"])
+
+    async def heartbeat(self, job: Job, worker_id: str) -> bool:
+        """Prolonge le bail ; False si le job n'est plus à ce worker."""
+        now = datetime.now(timezone.utc)
+        res = await self.col.update_one(
+            {"_id": job.id, "status": RUNNING, "worker": worker_id},
+            {"$set": {"lease_until": now + timedelta(seconds=self.lease), "heartbeat_at": now}},
+        )
+        return res.matched_count == 1
+
+    async def complete(self, job: Job, worker_id: str, result: bytes) -> bool:
+        """Écrit le résultat s'il n'y en a pas déjà un (False sinon)."""
+        res = await self.col.update_one(
+            {"_id": job.id, "status": {"$in": [QUEUED, RUNNING]}},
+            self._finished(DONE, result=Binary(result), worker=worker_id),
+        )
+        return res.matched_count == 1
+
+    async def fail(self, job: Job, worker_id: str, error: str):
+        """Exception du solveur: nouvelle tentative tant qu'il en reste, sinon échec."""
+        if job.attempts < self.max_attempts:
+            await self.col.update_one(
+                {"_id": job.id, "status": RUNNING, "worker": worker_id},
+                {"$set": {"status": QUEUED, "error": error}, "$unset": {"lease_until": ""}},
+            )
+        else:
+            await self.col.update_one(
+                {"_id": job.id, "status": {"$in": [QUEUED, RUNNING]}}, self._finished(FAILED, error=error),
+            )
+
+
+# -----------------------
+# Serveur compatible Redis
+# -----------------------
+# Prise atomique (script Lua) : reprise des baux expirés, puis premier job de la file
+_REDIS_CLAIM = """
+local now = tonumber(ARGV[1])
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now)) do
+    redis.call('ZREM', KEYS[2], id)
+    local key = ARGV[5] .. id
+    if tonumber(redis.call('HGET', key, 'attempts') or '0') >= tonumber(ARGV[4]) then
+        redis.call('HSET', key, 'status', 'failed', 'error', ARGV[6])
+        redis.call('HDEL', key, 'payload')
+        redis.call('EXPIRE', key, tonumber(ARGV[7]))
+    elseif redis.call('HGET', key, 'status') == 'running' then
+        redis.call('HSET', key, 'status', 'queued')
+        redis.call('RPUSH', KEYS[1], id)
+    end
+end
+local id = redis.call('LPOP', KEYS[1])
+if not id then return nil end
+local key = ARGV[5] .. id
+if redis.call('HGET', key, 'status') ~= 'queued' then return nil end
+redis.call('HSET', key, 'status', 'running', 'worker', ARGV[3])
+local attempts = redis.call('HINCRBY', key, 'attempts', 1)
+redis.call('ZADD', KEYS[2], now + tonumber(ARGV[2]), id)
+return {id, redis.call('HGET', key, 'payload'), attempts}
+"""
+
+_REDIS_HEARTBEAT = """
+if redis.call('HGET', KEYS[1], 'status') ~= 'running' or redis.call('HGET', KEYS[1], 'worker') ~= ARGV[1] then
+    return 0
+end
+redis.call('ZADD', KEYS[2], tonumber(ARGV[2]), ARGV[3])
+return 1
+"""
+
+# ARGV: statut final, champ, valeur, ttl, [worker exigé pour une nouvelle tentative]
+_REDIS_FINISH = """
+local status = redis.call('HGET', KEYS[1], 'status')
+if status ~= 'queued' and status ~= 'running' then return 0 end
+if ARGV[1] == 'queued' then
+    -- Nouvelle tentative: seulement par le worker qui tient le job (le bail d'un autre reste en place)
+    if status ~= 'running' or redis.call('HGET', KEYS[1], 'worker') ~= ARGV[6] then return 0 end
+    redis.call('ZREM', KEYS[2], ARGV[5])
+    redis.call('HSET', KEYS[1], 'status', 'queued', ARGV[2], ARGV[3])
+    redis.call('RPUSH', KEYS[3], ARGV[5])
+    return 1
+end
+redis.call('ZREM', KEYS[2], ARGV[5])
+redis.call('HSET', KEYS[1], 'status', ARGV[1], ARGV[2], ARGV[3])
+redis.call('HDEL', KEYS[1], 'payload')
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[4]))
+return 1
+"""
+
+
+class RedisJobQueue(JobQueue):
+    """
+    Serveur compatible Redis (Redis, Valkey, KeyDB...). Nécessite `pip install redis`.
+    Clés: liste `solver:queue` (ids en attente), zset `solver:leases` (fin de bail), hash `solver:job:<id>`.
+    """
+
+    name = "redis"
+    QUEUE_KEY = "solver:queue"
+    LEASES_KEY = "solver:leases"
+    JOB_PREFIX = "solver:job:"
+
+    def __init__(self, url=REDIS_URL, lease=SOLVER_QUEUE_LEASE_SECONDS, max_attempts=SOLVER_QUEUE_MAX_ATTEMPTS,
+                 result_ttl=SOLVER_QUEUE_RESULT_TTL_SECONDS, client=None):
+        if client is None:
+            try:
+                import redis.asyncio as aioredis
+            except ImportError as e:
+                raise RuntimeError("SOLVER_QUEUE=redis nécessite le paquet `redis` (pip install redis)") from e
+            client = aioredis.from_url(url)
+        self.client = client
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.result_ttl = result_ttl
+        self._claim = client.register_script(_REDIS_CLAIM)
+        self._heartbeat = client.register_script(_REDIS_HEARTBEAT)
+        self._finish = client.register_script(_REDIS_FINISH)
+
+    async def init(self):
+        pass
+
+    def _key(self, job_id):
+        return f"{self.JOB_PREFIX}{job_id}"
+
+    async def submit(self, job_id: str, payload: bytes):
+        pipe = self.client.pipeline()
+        pipe.hset(self._key(job_id), mapping={"status": QUEUED, "payload": payload, "attempts": 0})
+        pipe.rpush(self.QUEUE_KEY, job_id)
+        await pipe.execute()
+
+    async def result(self, job_id: str):
+        status, result, error = await self.client.hmget(self._key(job_id), "status", "result", "error")
+        if status is None:
+            return None
+        return status.decode(), result, error.decode("utf-8") if error else None
+
+    async def cancel(self, job_id: str):
+        await self._finish(
+            keys=[self._key(job_id), self.LEASES_KEY, self.QUEUE_KEY],
+            args=[FAILED, "error", "annulé (délai dépassé côté API)", self.result_ttl, job_id, ""],
+        )
+
+    async def claim(self, worker_id: str) -> Optional[Job]:
+        found = await self._claim(
+            keys=[self.QUEUE_KEY, self.LEASES_KEY],
+            args=[time.time(), self.lease, worker_id, self.max_attempts, self.JOB_PREFIX,
+                  f"bail expiré {self.max_attempts} fois (worker arrêté ?)", self.result_ttl],
+        )
+        if not found:
+            return None
+        job_id, payload, attempts = found
+        return Job(job_id.decode(), payload, int(attempts))
+
+    async def heartbeat(self, job: Job, worker_id: str) -> bool:
+        return bool(await self._heartbeat(
+            keys=[self._key(job.id), self.LEASES_KEY], args=[worker_id, time.time() + self.lease, job.id],
+        ))
+
+    async def complete(self, job: Job, worker_id: str, result: bytes) -> bool:
+        return bool(await self._finish(
+            keys=[self._key(job.id), self.LEASES_KEY, self.QUEUE_KEY],
+            args=[DONE, "result", result, self.result_ttl, job.id, worker_id],
+        ))
+
+    async def fail(self, job: Job, worker_id: str, error: str):
+        status = QUEUED if job.attempts < self.max_attempts else FAILED
+        await self._finish(
+            keys=[self._key(job.id), self.LEASES_KEY, self.QUEUE_KEY],
+            args=[status, "error", error, self.result_ttl, job.id, worker_id],
+        )
+
+
+def create_job_queue(database=None) -> Optional[JobQueue]:
+    """File selon SOLVER_QUEUE (None: résolution locale dans solver_pool)."""
+    if SOLVER_QUEUE == "mongodb":
+        if database is not None:
+            return MongoJobQueue(database)
+        print("[WARN] SOLVER_QUEUE=mongodb mais MongoDB non configuré: solveur local")
+    elif SOLVER_QUEUE == "redis":
+        return RedisJobQueue()
+    elif SOLVER_QUEUE:
+        print(f"[WARN] SOLVER_QUEUE={SOLVER_QUEUE} inconnu: solveur local")
+    return None
@@ -0,0 +1,128 @@
+"""
+Worker solveur: consomme la file de résolutions (backend/solver_queue.py) et
+écrit les résultats. Autant d'instances que voulu, sur d'autres machines que
+l'API ; en ajouter ou en retirer ne demande aucun changement côté API.
+
+Chaque worker résout au plus --concurrency jobs à la fois, dans son propre
+pool de processus (SolverPool, OR-Tools préchargé). Pendant une résolution,
+le bail du job est prolongé toutes les SOLVER_QUEUE_HEARTBEAT_SECONDS.
+SIGTERM / SIGINT : plus de nouvelle prise, les jobs en cours se terminent.
+
+Usage:
+    SOLVER_QUEUE=mongodb MONGODB_URI=... python -m backend.solver_worker --concurrency 2
+    SOLVER_QUEUE=redis REDIS_URL=redis://queue:6379/0 python -m backend.solver_worker
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+import uuid
+
+from backend.solver_pool import SolverPool
+from backend.solver_queue import (
+    SOLVER_QUEUE_HEARTBEAT_SECONDS, SOLVER_QUEUE_POLL_SECONDS, create_job_queue, decode_call, encode_result,
+)
+from backend.telemetry import log_json
+
+
+class SolverWorker:
+    def __init__(self, queue, concurrency=1, heartbeat=SOLVER_QUEUE_HEARTBEAT_SECONDS, poll=SOLVER_QUEUE_POLL_SECONDS,
+                 pool=None, worker_id=None):
+        self.queue = queue
+        self.concurrency = concurrency
+        self.heartbeat = heartbeat
+        self.poll = poll
+        self.pool = pool or SolverPool(workers=concurrency)
+        self.id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.stopping = asyncio.Event()
+        self.running = set()
+
+    def stop(self):
+        self.stopping.set()
+
+    async def run(self, max_jobs=None):
+        """Boucle de prise des jobs jusqu'à stop() (ou max_jobs jobs pris)."""
+        await self.queue.init()
+        self.pool.start()
+        log_json("solver_worker_started", worker=self.id, queue=self.queue.name, concurrency=self.concurrency)
+        slots = asyncio.Semaphore(self.concurrency)
+        taken = 0
+        try:
+            while not self.stopping.is_set() and (max_jobs is None or taken < max_jobs):
+                await slots.acquire()
+                job = await self.queue.claim(self.id) if not self.stopping.is_set() else None
+                if job is None:
+                    slots.release()
+                    try:
+                        await asyncio.wait_for(self.stopping.wait(), self.poll)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                taken += 1
+                task = asyncio.create_task(self.process(job))
+                self.running.add(task)
+                task.add_done_callback(lambda t: (self.running.discard(t), slots.release()))
+            if self.running:
+                await asyncio.gather(*self.running, return_exceptions=True)
+        finally:
+            await self.pool.shutdown()
+            log_json("solver_worker_stopped", worker=self.id, jobs=taken)
+
+    async def process(self, job):
+        name, args, kwargs = decode_call(job.payload)
+        beat = asyncio.create_task(self._keep_lease(job))
+        start = time.perf_counter()
+        try:
+            result = await self.pool.run(name, *args, **kwargs)
+        except Exception as e:
+            await self.queue.fail(job, self.id, f"{e.__class__.__name__}: {e}")
+            log_json("solver_job", worker=self.id, job=job.id, function=name, attempt=job.attempts, status="error",
+                     seconds=round(time.perf_counter() - start, 6), error=traceback.format_exc(limit=5))
+            return
+        finally:
+            beat.cancel()
+        stored = await self.queue.complete(job, self.id, encode_result(result))
+        log_json("solver_job", worker=self.id, job=job.id, function=name, attempt=job.attempts,
+                 status="done" if stored else "duplicate", seconds=round(time.perf_counter() - start, 6))
+
+    async def _keep_lease(self, job):
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            try:
+                if not await self.queue.heartbeat(job, self.id):
+                    # Bail repris par un autre worker: on termine quand même, le premier résultat l'emporte
+                    log_json("solver_job_lease_lost", worker=self.id, job=job.id)
+                    return
+            except Exception as e:
+                print(f"[WARN] Battement de cœur du job {job.id} échoué: {e}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Worker solveur (file SOLVER_QUEUE).")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("SOLVER_WORKERS", "0")) or 1,
+                        help="jobs résolus en parallèle (processus du pool ; défaut: SOLVER_WORKERS ou 1)")
+    args = parser.parse_args(argv)
+
+    from backend.db import db
+    queue = create_job_queue(db)
+    if queue is None:
+        print("SOLVER_QUEUE doit valoir mongodb ou redis", file=sys.stderr)
+        return 2
+
+    async def serve():
+        worker = SolverWorker(queue, args.concurrency)
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, worker.stop)
+        await worker.run()
+
+    asyncio.run(serve())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
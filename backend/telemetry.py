@@ -0,0 +1,96 @@
+"""
+Télémétrie du solveur : durée de chaque phase d'une génération, taille du
+modèle CP-SAT (variables, contraintes par famille) et statistiques de la
+réponse du solveur.
+
+Le résultat (`to_dict()`) est renvoyé par l'API, écrit en JSON sur une ligne
+dans les logs (`log_json`) et enregistré avec le planning sauvegardé, pour
+suivre les régressions de performance d'un fichier d'entrée à l'autre.
+"""
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+
+class SolverTelemetry:
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.phases = {}        # phase -> secondes (ordre d'exécution)
+        self.constraints = {}   # famille -> nombre de contraintes ajoutées
+        self.model = {}
+        self.solver = {}
+        self._started = time.perf_counter()
+        self._current = None    # (étape, début, modèle, nb de contraintes au début)
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def step(self, name, model=None):
+        """
+        Termine l'étape en cours et démarre `name` (None: termine seulement).
+        Avec `model`, compte les contraintes ajoutées pendant l'étape (famille = nom sans `constraints.`).
+        """
+        now = time.perf_counter()
+        if self._current is not None:
+            current, start, current_model, before = self._current
+            self.phases[current] = self.phases.get(current, 0.0) + now - start
+            if current_model is not None:
+                family = current.removeprefix("constraints.")
+                added = len(current_model.Proto().constraints) - before
+                self.constraints[family] = self.constraints.get(family, 0) + added
+        self._current = None
+        if name is not None:
+            before = len(model.Proto().constraints) if model is not None else None
+            self._current = (name, now, model, before)
+
+    def record_model(self, model, **sizes):
+        proto = model.Proto()
+        self.model = {"variables": len(proto.variables), "constraints": len(proto.constraints), **sizes}
+
+    def record_solver(self, solver, status, cp_model, has_objective=False):
+        stats = {
+            "status": solver.StatusName(status),
+            "wall_time": round(solver.WallTime(), 6),
+            "user_time": round(solver.UserTime(), 6),
+            "conflicts": solver.NumConflicts(),
+            "branches": solver.NumBranches(),
+        }
+        if has_objective and status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            stats["objective"] = solver.ObjectiveValue()
+            stats["best_bound"] = solver.BestObjectiveBound()
+        self.solver = stats
+
+    def to_dict(self) -> dict:
+        return {
+            "mode": self.mode,
+            "total_seconds": round(time.perf_counter() - self._started, 6),
+            "phases": {k: round(v, 6) for k, v in self.phases.items()},
+            "model": {**self.model, "constraints_by_family": dict(self.constraints)},
+            "solver": self.solver,
+        }
+
+
+def generation_telemetry(attempts, phases=None) -> dict:
+    """
+    Agrège les tentatives successives (strict, relaxed, maximize) d'une génération.
+    `phases`: durées mesurées hors solveur (ex: compilation du formulaire).
+    """
+    phases = phases or {}
+    return {
+        "mode": attempts[-1]["mode"] if attempts else None,
+        "total_seconds": round(sum(phases.values()) + sum(a.get("total_seconds", 0) for a in attempts), 6),
+        "phases": phases,
+        "attempts": attempts,
+    }
+
+
+def log_json(event: str, **fields):
+    """Une ligne JSON par événement sur la sortie standard (collectée par les logs du conteneur)."""
+    record = {"ts": datetime.now(timezone.utc).isoformat(), "event": event, **fields}
+    print(json.dumps(record, ensure_ascii=False, default=str), flush=True)
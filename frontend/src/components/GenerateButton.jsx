@@ -2,6 +2,7 @@ const BASE_URL = import.meta.env.VITE_API_URL;
 import React from 'react';
 import Button from 'react-bootstrap/Button';
 import { useAuth } from '../AuthContext';
+import { COLUMNAR_ACCEPT, fromColumnar } from '../planningFormat';
 
 function GenerateButton({ setPlanning, setStatus }) {
   const { token } = useAuth();
@@ -10,11 +11,11 @@ function GenerateButton({ setPlanning, setStatus }) {
     try {
   const res = await fetch(`${BASE_URL}/api/generate_planning`, {
         method: 'POST',
-        headers: { 'Authorization': `Bearer ${token}` },
+        headers: { 'Authorization': `Bearer ${token}`, 'Accept': COLUMNAR_ACCEPT },
       });
       if (!res.ok) throw new Error('Erreur réseau');
       const data = await res.json();
-      setPlanning(data);
+      setPlanning(fromColumnar(data));
       setStatus({ type: 'success', text: 'Planning généré avec succès !' });
     } catch (error) {
       setStatus({
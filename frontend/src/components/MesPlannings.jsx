@@ -6,6 +6,8 @@ import { useAuth } from '../AuthContext';
 export default function MesPlannings() {
   const { token } = useAuth();
   const [items, setItems] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
 
@@ -30,20 +32,41 @@ export default function MesPlannings() {
     }
   };
 
+  // Page de plannings (pagination par curseur côté serveur)
+  const fetchPage = useCallback(async (cursor) => {
+    const params = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+    const res = await fetch(`${BASE_URL}/api/plannings${params}`, { headers: { 'Authorization': `Bearer ${token}` } });
+    if (!res.ok) throw new Error('Erreur serveur');
+    return res.json();
+  }, [token]);
+
   const load = useCallback(async () => {
     setLoading(true);
     setError('');
     try {
-      const res = await fetch(`${BASE_URL}/api/plannings`, { headers: { 'Authorization': `Bearer ${token}` } });
-      if (!res.ok) throw new Error('Erreur serveur');
-      const data = await res.json();
+      const data = await fetchPage(null);
       setItems(data.items || []);
+      setNextCursor(data.next_cursor || null);
     } catch (e) {
       setError(e.message || 'Erreur');
     } finally {
       setLoading(false);
     }
-  }, [token]);
+  }, [fetchPage]);
+
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const data = await fetchPage(nextCursor);
+      setItems(prev => [...prev, ...(data.items || [])]);
+      setNextCursor(data.next_cursor || null);
+    } catch (e) {
+      setError(e.message || 'Erreur');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
 
   useEffect(() => { load(); }, [load]);
 
@@ -60,6 +83,7 @@ export default function MesPlannings() {
               <th>Nom</th>
               <th>Créé le</th>
               <th>Auteur</th>
+              <th>Qualité</th>
               <th>Télécharger</th>
             </tr>
           </thead>
@@ -69,6 +93,11 @@ export default function MesPlannings() {
                 <td>{it.name}</td>
                 <td>{it.created_at}</td>
                 <td>{it.user}</td>
+                <td>
+                  {it.summary
+                    ? `${it.summary.resume.total_erreurs} erreur(s) · ${it.summary.globales.taux_utilisation}% utilisés`
+                    : '—'}
+                </td>
                 <td>
                   <button className="btn btn-sm btn-outline-primary me-2" onClick={() => handleDownload(it.id, 'csv')}>CSV</button>
                   <button className="btn btn-sm btn-outline-success" onClick={() => handleDownload(it.id, 'excel')}>Excel</button>
@@ -78,6 +107,11 @@ export default function MesPlannings() {
           </tbody>
         </table>
       )}
+      {nextCursor && (
+        <button className="btn btn-outline-secondary" onClick={loadMore} disabled={loadingMore}>
+          {loadingMore ? 'Chargement…' : 'Afficher plus'}
+        </button>
+      )}
     </div>
   );
 }
@@ -1,28 +1,50 @@
-import React from 'react';
+import React, { useState } from 'react';
+
+// Au-delà de ce nombre de lignes, seules les lignes visibles sont rendues
+const VIRTUALIZE_THRESHOLD = 100;
+const ROW_HEIGHT = 33;
+const VIEWPORT_HEIGHT = 600;
+const OVERSCAN = 10;
 
 function PlanningTable({ planning, title }) {
+  const [scrollTop, setScrollTop] = useState(0);
   if (!planning) return null;
+
+  const rows = planning.rows || planning.preview;
+  const virtual = rows.length > VIRTUALIZE_THRESHOLD;
+  const first = virtual ? Math.max(0, Math.floor(scrollTop / ROW_HEIGHT) - OVERSCAN) : 0;
+  const last = virtual
+    ? Math.min(rows.length, Math.ceil((scrollTop + VIEWPORT_HEIGHT) / ROW_HEIGHT) + OVERSCAN)
+    : rows.length;
+
   return (
     <div className="table-container">
       <h2>{title}</h2>
-      <table>
-        <thead>
-          <tr>
-            {planning.header.map((col, idx) => (
-              <th key={idx}>{col}</th>
-            ))}
-          </tr>
-        </thead>
-        <tbody>
-          {(planning.rows || planning.preview).map((row, i) => (
-            <tr key={i}>
-              {row.map((cell, j) => (
-                <td key={j}>{cell}</td>
+      <div
+        style={virtual ? { maxHeight: VIEWPORT_HEIGHT, overflowY: 'auto' } : undefined}
+        onScroll={virtual ? e => setScrollTop(e.currentTarget.scrollTop) : undefined}
+      >
+        <table>
+          <thead>
+            <tr>
+              {planning.header.map((col, idx) => (
+                <th key={idx}>{col}</th>
               ))}
             </tr>
-          ))}
-        </tbody>
-      </table>
+          </thead>
+          <tbody>
+            {first > 0 && <tr style={{ height: first * ROW_HEIGHT }} />}
+            {rows.slice(first, last).map((row, i) => (
+              <tr key={first + i} style={virtual ? { height: ROW_HEIGHT } : undefined}>
+                {row.map((cell, j) => (
+                  <td key={j}>{cell}</td>
+                ))}
+              </tr>
+            ))}
+            {last < rows.length && <tr style={{ height: (rows.length - last) * ROW_HEIGHT }} />}
+          </tbody>
+        </table>
+      </div>
     </div>
   );
 }
@@ -157,7 +157,12 @@ export default function SaisiePage() {
       });
 
       if (!response.ok) {
-        throw new Error(`Erreur ${response.status}`);
+        // Erreurs par champ renvoyées par le backend (422)
+        const data = await response.json().catch(() => null);
+        if (data && Array.isArray(data.detail)) {
+          throw new Error(data.detail.map(d => `${d.loc.slice(1).join('.')}: ${d.msg}`).join(' | '));
+        }
+        throw new Error((data && data.error) || `Erreur ${response.status}`);
       }
 
       const _result = await response.json();
@@ -0,0 +1,18 @@
+// Format colonnaire renvoyé par l'API (Accept: application/vnd.planning.columnar+json)
+// -> { header, rows } attendu par PlanningTable.
+export const COLUMNAR_ACCEPT = 'application/vnd.planning.columnar+json';
+
+export function fromColumnar(data) {
+  if (!data || data.format !== 'columnar') return data;
+  const { header, n_rows: nRows, columns, weeks, groups, ...rest } = data;
+  const rows = Array.from({ length: nRows }, () => new Array(header.length).fill(''));
+  Object.entries(columns).forEach(([name, { values, codes }]) => {
+    const j = header.indexOf(name);
+    codes.forEach((code, i) => { rows[i][j] = values[code]; });
+  });
+  weeks.forEach((week, k) => {
+    const j = header.indexOf(week);
+    groups[k].forEach((g, i) => { rows[i][j] = g ? String(g) : ''; });
+  });
+  return { ...rest, header, rows };
+}